@@ -0,0 +1,506 @@
+#! /usr/bin/env python3
+
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+import zipfile
+
+# --column layouts of the may 2022 offshore leaks release
+fileLayouts = {
+    "nodes-entities.csv": [
+        "node_id",
+        "name",
+        "original_name",
+        "former_name",
+        "jurisdiction",
+        "jurisdiction_description",
+        "company_type",
+        "address",
+        "internal_id",
+        "incorporation_date",
+        "inactivation_date",
+        "struck_off_date",
+        "dorm_date",
+        "status",
+        "service_provider",
+        "ibcRUC",
+        "country_codes",
+        "countries",
+        "sourceID",
+        "valid_until",
+        "note",
+    ],
+    "nodes-intermediaries.csv": [
+        "node_id",
+        "name",
+        "status",
+        "internal_id",
+        "address",
+        "countries",
+        "country_codes",
+        "sourceID",
+        "valid_until",
+        "note",
+    ],
+    "nodes-officers.csv": [
+        "node_id",
+        "name",
+        "countries",
+        "country_codes",
+        "sourceID",
+        "valid_until",
+        "note",
+    ],
+    "nodes-addresses.csv": [
+        "node_id",
+        "address",
+        "name",
+        "countries",
+        "country_codes",
+        "sourceID",
+        "valid_until",
+        "note",
+    ],
+    "nodes-others.csv": [
+        "node_id",
+        "name",
+        "type",
+        "incorporation_date",
+        "struck_off_date",
+        "closed_date",
+        "jurisdiction",
+        "jurisdiction_description",
+        "countries",
+        "country_codes",
+        "sourceID",
+        "valid_until",
+        "note",
+    ],
+    "relationships.csv": [
+        "node_id_start",
+        "node_id_end",
+        "rel_type",
+        "link",
+        "status",
+        "start_date",
+        "end_date",
+        "sourceID",
+    ],
+}
+
+# --approximate share of each node type in the real release
+nodeShares = {
+    "entity": 0.40,
+    "officer": 0.38,
+    "intermediary": 0.013,
+    "address": 0.20,
+    "other": 0.007,
+}
+
+sourceIDs = [
+    "Panama Papers",
+    "Paradise Papers - Appleby",
+    "Paradise Papers - Malta corporate registry",
+    "Pandora Papers - Alemán, Cordero, Galindo & Lee (Alcogal)",
+    "Pandora Papers - Trident Trust",
+    "Offshore Leaks",
+    "Bahamas Leaks",
+]
+jurisdictions = [
+    ("BVI", "British Virgin Islands"),
+    ("PMA", "Panama"),
+    ("SAM", "Samoa"),
+    ("SEY", "Seychelles"),
+    ("BAH", "Bahamas"),
+    ("NIUE", "Niue"),
+    ("MLT", "Malta"),
+]
+countries = [
+    ("HKG", "Hong Kong"),
+    ("CHE", "Switzerland"),
+    ("GBR", "United Kingdom"),
+    ("PAN", "Panama"),
+    ("RUS", "Russia"),
+    ("CHN", "China"),
+    ("VGB", "British Virgin Islands"),
+    ("USA", "United States"),
+    ("BRA", "Brazil"),
+    ("ARE", "United Arab Emirates"),
+]
+firstNames = [
+    "JOHN",
+    "MARIA",
+    "WEI",
+    "ANNA",
+    "JOSÉ",
+    "OLGA",
+    "AHMED",
+    "LI",
+    "PETER",
+    "SOFÍA",
+    "DMITRY",
+    "CHEN",
+]
+lastNames = [
+    "SMITH",
+    "GARCÍA",
+    "WANG",
+    "IVANOV",
+    "MÜLLER",
+    "ZHANG",
+    "SILVA",
+    "KHAN",
+    "NGUYEN",
+    "ROSSI",
+    "PETROV",
+    "LEE",
+]
+companyWords = [
+    "GLOBAL",
+    "PACIFIC",
+    "ATLANTIC",
+    "GOLDEN",
+    "DRAGON",
+    "ORION",
+    "SUMMIT",
+    "HARBOUR",
+    "CAPITAL",
+    "VENTURES",
+    "STAR",
+    "EAGLE",
+]
+companySuffixes = ["LIMITED", "LTD.", "INC.", "S.A.", "CORP.", "HOLDINGS LTD", "LLC"]
+streets = [
+    "QUEEN'S ROAD CENTRAL",
+    "BAHNHOFSTRASSE",
+    "CALLE 50",
+    "ROAD TOWN",
+    "NATHAN ROAD",
+    "VIA NASSA",
+    "AVENIDA PAULISTA",
+]
+shortLinks = [
+    "shareholder of",
+    "director of",
+    "beneficiary of",
+    "intermediary of",
+    "secretary of",
+    "nominee shareholder of",
+    "protector of",
+]
+longLinks = [
+    "Ultimate Beneficial Owner and authorised signatory of the company",
+    "shareholder of;director of;secretary of;beneficial owner of",
+    "Power of attorney granted for the management of the registered company assets",
+]
+addressLinks = ["registered address", "business address", "residential address"]
+months = [
+    "JAN",
+    "FEB",
+    "MAR",
+    "APR",
+    "MAY",
+    "JUN",
+    "JUL",
+    "AUG",
+    "SEP",
+    "OCT",
+    "NOV",
+    "DEC",
+]
+
+
+# ----------------------------------------
+def randomDate(rng):
+    return "%02d-%s-%04d" % (
+        rng.randint(1, 28),
+        rng.choice(months),
+        rng.randint(1980, 2021),
+    )
+
+
+# ----------------------------------------
+def randomCountries(rng):
+    picked = rng.sample(countries, rng.choice([1, 1, 1, 2, 3]))
+    return ";".join(c[0] for c in picked), ";".join(c[1] for c in picked)
+
+
+# ----------------------------------------
+def personName(rng):
+    return "%s %s" % (rng.choice(firstNames), rng.choice(lastNames))
+
+
+# ----------------------------------------
+def companyName(rng):
+    return "%s %s %s" % (
+        rng.choice(companyWords),
+        rng.choice(companyWords),
+        rng.choice(companySuffixes),
+    )
+
+
+# ----------------------------------------
+def addressText(rng):
+    return "%s %s, %s" % (
+        rng.randint(1, 999),
+        rng.choice(streets),
+        rng.choice(countries)[1].upper(),
+    )
+
+
+# ----------------------------------------
+def skewedPick(rng, population, alpha):
+    """pick from a list with a heavy tail towards the front (a few hub nodes)"""
+    index = int(rng.paretovariate(alpha)) - 1
+    if index >= len(population):
+        index = rng.randrange(len(population))
+    return population[index]
+
+
+# ----------------------------------------
+def nodeRow(rng, nodeType, nodeId):
+    countryCodes, countryNames = randomCountries(rng)
+    source = rng.choice(sourceIDs)
+    note = "" if rng.random() < 0.9 else "Record refers to a closed company"
+    if nodeType == "entity":
+        jurisdiction = rng.choice(jurisdictions)
+        return [
+            nodeId,
+            companyName(rng),
+            "",
+            "",
+            jurisdiction[0],
+            jurisdiction[1],
+            rng.choice(["", "", "Standard International Company", "Business Company"]),
+            addressText(rng) if rng.random() < 0.3 else "",
+            rng.randint(1000, 999999),
+            randomDate(rng),
+            randomDate(rng) if rng.random() < 0.3 else "",
+            randomDate(rng) if rng.random() < 0.4 else "",
+            "",
+            rng.choice(["Active", "Defaulted", "Dissolved", "Changed agent", ""]),
+            rng.choice(["Mossack Fonseca", "Appleby", "Portcullis Trustnet"]),
+            "",
+            countryCodes,
+            countryNames,
+            source,
+            "The Panama Papers data is current through 2015",
+            note,
+        ]
+    if nodeType == "intermediary":
+        return [
+            nodeId,
+            companyName(rng) if rng.random() < 0.7 else personName(rng),
+            rng.choice(["ACTIVE", "SUSPENDED", "UNRECOVERABLE ACCOUNTS", ""]),
+            rng.randint(1000, 999999),
+            addressText(rng) if rng.random() < 0.5 else "",
+            countryNames,
+            countryCodes,
+            source,
+            "The Panama Papers data is current through 2015",
+            note,
+        ]
+    if nodeType == "officer":
+        return [
+            nodeId,
+            personName(rng) if rng.random() < 0.75 else companyName(rng),
+            countryNames,
+            countryCodes,
+            source,
+            "The Panama Papers data is current through 2015",
+            note,
+        ]
+    if nodeType == "address":
+        text = addressText(rng)
+        return [
+            nodeId,
+            "" if rng.random() < 0.05 else text,
+            text if rng.random() < 0.05 else "",
+            countryNames,
+            countryCodes,
+            source,
+            "The Panama Papers data is current through 2015",
+            note,
+        ]
+    jurisdiction = rng.choice(jurisdictions)
+    return [
+        nodeId,
+        companyName(rng),
+        rng.choice(["LIMITED LIABILITY COMPANY", "SOLE OWNERSHIP", "FOUNDATION"]),
+        randomDate(rng),
+        randomDate(rng) if rng.random() < 0.3 else "",
+        "",
+        jurisdiction[0],
+        jurisdiction[1],
+        countryNames,
+        countryCodes,
+        source,
+        "Aruba corporate registry data is current through 2019",
+        note,
+    ]
+
+
+# ----------------------------------------
+def edgeRow(rng, startId, endId, endType):
+    if endType == "address":
+        relType = "registered_address"
+        link = rng.choice(addressLinks)
+    elif rng.random() < 0.02:
+        relType = "officer_of"
+        link = rng.choice(longLinks)
+    else:
+        relType = rng.choice(["officer_of", "intermediary_of", "similar"])
+        link = rng.choice(shortLinks)
+    return [
+        startId,
+        endId,
+        relType,
+        link,
+        "",
+        randomDate(rng) if rng.random() < 0.3 else "",
+        randomDate(rng) if rng.random() < 0.1 else "",
+        rng.choice(sourceIDs),
+    ]
+
+
+# ----------------------------------------
+def generate(outputPath, nodeCount, edgeFactor, seed):
+    rng = random.Random(seed)
+
+    # --unique node ids in the same range as the real release
+    allIds = rng.sample(range(10000000, 240000000), nodeCount)
+    nodeIds = {}
+    offset = 0
+    for nodeType, share in nodeShares.items():
+        count = max(1, int(nodeCount * share))
+        nodeIds[nodeType] = allIds[offset : offset + count]
+        offset += count
+
+    # --the real data has node_ids that appear in more than one node file
+    for nodeType in ("intermediary", "other"):
+        dupCount = len(nodeIds[nodeType]) // 20
+        for i in range(dupCount):
+            nodeIds[nodeType][i] = rng.choice(
+                nodeIds["officer"] if i % 2 else nodeIds["entity"]
+            )
+
+    fileNames = {
+        "entity": "nodes-entities.csv",
+        "intermediary": "nodes-intermediaries.csv",
+        "officer": "nodes-officers.csv",
+        "address": "nodes-addresses.csv",
+        "other": "nodes-others.csv",
+    }
+    for nodeType, fileName in fileNames.items():
+        with open(
+            os.path.join(outputPath, fileName), "w", encoding="utf-8", newline=""
+        ) as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(fileLayouts[fileName])
+            for nodeId in nodeIds[nodeType]:
+                writer.writerow(nodeRow(rng, nodeType, nodeId))
+        print(" %s %s rows" % (len(nodeIds[nodeType]), fileName))
+
+    # --relationships with a heavy degree skew: a few intermediaries and
+    # --registered agent addresses are shared by a large number of nodes
+    edgeCount = int(nodeCount * edgeFactor)
+    hubEntities = nodeIds["entity"]
+    sharedAddresses = nodeIds["address"]
+    with open(
+        os.path.join(outputPath, "relationships.csv"),
+        "w",
+        encoding="utf-8",
+        newline="",
+    ) as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(fileLayouts["relationships.csv"])
+        for _ in range(edgeCount):
+            roll = rng.random()
+            if roll < 0.45:
+                startId = rng.choice(nodeIds["officer"])
+                endId, endType = rng.choice(hubEntities), "entity"
+            elif roll < 0.60:
+                startId = skewedPick(rng, nodeIds["intermediary"], 1.2)
+                endId, endType = rng.choice(hubEntities), "entity"
+            elif roll < 0.85:
+                startId = rng.choice(
+                    nodeIds["entity"] if rng.random() < 0.5 else nodeIds["officer"]
+                )
+                endId = skewedPick(rng, sharedAddresses, 1.1)
+                endType = "address"
+            elif roll < 0.88:
+                startId = rng.choice(nodeIds["other"])
+                endId, endType = rng.choice(hubEntities), "entity"
+            elif roll < 0.995:
+                startId = rng.choice(nodeIds["entity"])
+                endId, endType = rng.choice(nodeIds["officer"]), "officer"
+            else:
+                # --a few edges point at nodes that are not in any file
+                startId = rng.choice(nodeIds["officer"])
+                endId, endType = rng.randint(300000000, 310000000), "missing"
+            writer.writerow(edgeRow(rng, startId, endId, endType))
+    print(" %s relationships.csv rows" % edgeCount)
+
+
+# ----------------------------------------
+def addNodeCountArgument(argparser):
+    """the -n --node_count argument, shared with run_benchmark.py"""
+    argparser.add_argument(
+        "-n",
+        "--node_count",
+        type=int,
+        default=100000,
+        help="total number of nodes across all node files, default=100000",
+    )
+
+
+# ----------------------------------------
+if __name__ == "__main__":
+    procStartTime = time.time()
+
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        "-o",
+        "--output_path",
+        type=str,
+        help="directory to write the synthetic ICIJ csv files to",
+    )
+    addNodeCountArgument(argparser)
+    argparser.add_argument(
+        "-e",
+        "--edge_factor",
+        type=float,
+        default=1.7,
+        help="relationships per node, default=1.7 (like the 2022 release)",
+    )
+    argparser.add_argument(
+        "-s", "--seed", type=int, default=20220503, help="random seed"
+    )
+    argparser.add_argument(
+        "-z",
+        "--zip_file",
+        type=str,
+        help="optionally also package the csv files into a release style zip",
+    )
+    args = argparser.parse_args()
+
+    if not args.output_path:
+        print("")
+        print("Please supply an output path for the csv files.")
+        print("")
+        sys.exit(1)
+    os.makedirs(args.output_path, exist_ok=True)
+
+    print("generating %s nodes ..." % args.node_count)
+    generate(args.output_path, args.node_count, args.edge_factor, args.seed)
+
+    if args.zip_file:
+        with zipfile.ZipFile(args.zip_file, "w", zipfile.ZIP_DEFLATED) as zipFile:
+            for fileName in fileLayouts:
+                zipFile.write(os.path.join(args.output_path, fileName), fileName)
+        print("packaged %s" % args.zip_file)
+
+    print("done in %s seconds" % round(time.time() - procStartTime, 1))
@@ -0,0 +1,266 @@
+#! /usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+benchmarkPath = os.path.dirname(os.path.abspath(__file__))
+mapperPath = os.path.join(os.path.dirname(benchmarkPath), "src")
+mapperFile = os.path.join(mapperPath, "icij_mapper.py")
+generatorFile = os.path.join(benchmarkPath, "generate_icij_data.py")
+baselineFile = os.path.join(benchmarkPath, "baselines.json")
+
+# --the stand-in base_mapper in this directory is imported ahead of any other
+sys.path[0:0] = [benchmarkPath, mapperPath]
+import generate_icij_data  # noqa: E402 pylint: disable=wrong-import-position
+import icij_mapper  # noqa: E402 pylint: disable=wrong-import-position
+
+# --runs the mapper as __main__ and prints its peak memory when it exits
+launcherCode = """
+import runpy, sys
+try:
+    sys.argv = sys.argv[1:]
+    runpy.run_path(sys.argv[0], run_name="__main__")
+finally:
+    try:
+        import resource
+        maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            maxRss = maxRss / 1024
+        print("PEAK_RSS_KB %s" % maxRss, flush=True)
+    except ImportError:
+        pass
+"""
+
+# --the direction each comparable metric improves in, seconds follow from the rates
+metricDirections = {
+    "rows_per_sec": 1,
+    "records_per_sec": 1,
+    "peak_rss_mb": -1,
+}
+
+
+# ----------------------------------------
+def runMapper(mapperArgs):
+    """run the mapper once, returns the load and mapping seconds and peak rss"""
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [benchmarkPath, environment.get("PYTHONPATH", "")]
+    )
+    # --a piped stdout is block buffered, the phase marker has to arrive when it is printed
+    environment["PYTHONUNBUFFERED"] = "1"
+    startTime = time.perf_counter()
+    mapStartTime = None
+    peakRssMB = None
+    with subprocess.Popen(
+        [sys.executable, "-c", launcherCode, mapperFile] + mapperArgs,
+        stdout=subprocess.PIPE,
+        env=environment,
+        text=True,
+    ) as mapperProcess:
+        for line in mapperProcess.stdout:
+            if mapStartTime is None and line.startswith(("processing", "mapping ")):
+                mapStartTime = time.perf_counter()
+            elif line.startswith("PEAK_RSS_KB"):
+                peakRssMB = round(float(line.split()[1]) / 1024, 1)
+    endTime = time.perf_counter()
+    if mapperProcess.returncode != 0 or mapStartTime is None:
+        print("")
+        print("The mapper failed: %s" % " ".join(mapperArgs))
+        print("")
+        sys.exit(1)
+    return mapStartTime - startTime, endTime - mapStartTime, peakRssMB
+
+
+# ----------------------------------------
+def countLines(fileName, skipHeader=False):
+    with open(fileName, "rb") as fileHandle:
+        lineCount = sum(1 for _ in fileHandle)
+    return lineCount - 1 if skipHeader and lineCount else lineCount
+
+
+# ----------------------------------------
+def timeSerializers(outputFileName, rounds):
+    """encode the mapped records again with each serializer the mapper offers"""
+    with open(outputFileName, "rb") as outputFile:
+        records = [json.loads(line) for line in outputFile]
+    results = {}
+    for serializerName in ("json", "orjson"):
+        try:
+            serializer = icij_mapper.getSerializer(serializerName)
+        except ImportError:
+            continue
+        best = None
+        for _ in range(rounds):
+            startTime = time.perf_counter()
+            for jsonData in records:
+                serializer(jsonData)
+            elapsed = time.perf_counter() - startTime
+            best = elapsed if best is None else min(best, elapsed)
+        results["serialize_" + serializerName] = {
+            "seconds": round(best, 2),
+            "records_per_sec": int(len(records) / best),
+        }
+    return results
+
+
+# ----------------------------------------
+def runBenchmark(dataPath, nodeCount, rounds):
+    """load and map a synthetic data set, best of rounds for each phase"""
+    if not os.path.exists(os.path.join(dataPath, "relationships.csv")):
+        print("generating %s nodes in %s ..." % (nodeCount, dataPath))
+        subprocess.run(
+            [sys.executable, generatorFile, "-o", dataPath, "-n", str(nodeCount)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+    csvRows = sum(
+        countLines(os.path.join(dataPath, x), True)
+        for x in os.listdir(dataPath)
+        if x.endswith(".csv")
+    )
+    outputFileName = os.path.join(dataPath, "benchmark_output.json")
+
+    # --a rebuild times the csv load, a rerun reuses the staging database so
+    # --times the mapping on its own
+    loadTimes, mapTimes, loadRss, mapRss = [], [], [], []
+    for roundNumber in range(rounds):
+        print("round %s of %s ..." % (roundNumber + 1, rounds))
+        loadSeconds, _, peakRssMB = runMapper(
+            ["-i", dataPath, "-o", outputFileName, "-r"]
+        )
+        loadTimes.append(loadSeconds)
+        loadRss.append(peakRssMB or 0)
+        _, mapSeconds, peakRssMB = runMapper(["-i", dataPath, "-o", outputFileName])
+        mapTimes.append(mapSeconds)
+        mapRss.append(peakRssMB or 0)
+    recordCount = countLines(outputFileName)
+
+    results = {
+        "load": {
+            "seconds": round(min(loadTimes), 2),
+            "rows_per_sec": int(csvRows / min(loadTimes)),
+            "peak_rss_mb": max(loadRss),
+        },
+        "map": {
+            "seconds": round(min(mapTimes), 2),
+            "records_per_sec": int(recordCount / min(mapTimes)),
+            "peak_rss_mb": max(mapRss),
+        },
+    }
+    results.update(timeSerializers(outputFileName, rounds))
+    os.remove(outputFileName)
+    return results, csvRows, recordCount
+
+
+# ----------------------------------------
+def compareResults(results, baseline, tolerance):
+    """print each metric against the baseline, returns the regressed ones"""
+    regressions = []
+    print("")
+    print(
+        "%-18s %-16s %14s %14s %9s"
+        % ("phase", "metric", "current", "baseline", "change")
+    )
+    for phaseName, phaseResults in results.items():
+        for metricName, currentValue in phaseResults.items():
+            baselineValue = baseline.get(phaseName, {}).get(metricName)
+            change = ""
+            if baselineValue:
+                changeRatio = (currentValue - baselineValue) / baselineValue
+                change = "%+.0f%%" % (changeRatio * 100)
+                direction = metricDirections.get(metricName)
+                if direction and changeRatio * direction < -tolerance:
+                    regressions.append("%s %s" % (phaseName, metricName))
+                    change += " !"
+            print(
+                "%-18s %-16s %14s %14s %9s"
+                % (
+                    phaseName,
+                    metricName,
+                    currentValue,
+                    "" if baselineValue is None else baselineValue,
+                    change,
+                )
+            )
+    return regressions
+
+
+# ----------------------------------------
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    generate_icij_data.addNodeCountArgument(argparser)
+    argparser.add_argument(
+        "-d",
+        "--data_path",
+        type=str,
+        help="optional directory to generate the data set in and reuse it from, default is a temporary directory",
+    )
+    argparser.add_argument(
+        "-r", "--rounds", type=int, default=3, help="best of this many, default=3"
+    )
+    argparser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fraction a metric may be worse than its baseline, default=0.2",
+    )
+    argparser.add_argument(
+        "-s",
+        "--save_baseline",
+        action="store_true",
+        default=False,
+        help="store these results as the baseline for this data set size",
+    )
+    args = argparser.parse_args()
+
+    if args.data_path:
+        os.makedirs(args.data_path, exist_ok=True)
+        benchmarkResults, rowCount, outputCount = runBenchmark(
+            args.data_path, args.node_count, args.rounds
+        )
+    else:
+        with tempfile.TemporaryDirectory() as tempDir:
+            benchmarkResults, rowCount, outputCount = runBenchmark(
+                tempDir, args.node_count, args.rounds
+            )
+    print("")
+    print("%s csv rows, %s records mapped" % (rowCount, outputCount))
+
+    # --baselines are kept per data set size, they only mean something on the
+    # --machine they were saved on
+    baselines = {}
+    if os.path.exists(baselineFile):
+        with open(baselineFile, "r", encoding="utf-8") as baselineHandle:
+            baselines = json.load(baselineHandle)
+    baselineKey = str(args.node_count)
+    regressedMetrics = compareResults(
+        benchmarkResults,
+        baselines.get(baselineKey, {}).get("results", {}),
+        args.tolerance,
+    )
+
+    if args.save_baseline:
+        baselines[baselineKey] = {
+            "saved": time.strftime("%Y-%m-%d"),
+            "machine": "%s, %s cpus, python %s"
+            % (platform.platform(), os.cpu_count(), platform.python_version()),
+            "results": benchmarkResults,
+        }
+        with open(baselineFile, "w", encoding="utf-8") as baselineHandle:
+            json.dump(baselines, baselineHandle, indent=4, sort_keys=True)
+        print("")
+        print("Baseline saved to %s" % baselineFile)
+    elif regressedMetrics:
+        print("")
+        print(
+            "Regressed beyond %s%%: %s"
+            % (int(args.tolerance * 100), ", ".join(regressedMetrics))
+        )
+        sys.exit(1)
@@ -0,0 +1,164 @@
+#! /usr/bin/env python3
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+benchmarkPath = os.path.dirname(os.path.abspath(__file__))
+mapperPath = os.path.join(os.path.dirname(benchmarkPath), "src")
+
+# --the mapper's own serializers and writer are timed, not copies of them
+sys.path[0:0] = [benchmarkPath, mapperPath]
+import icij_mapper  # noqa: E402 pylint: disable=wrong-import-position
+
+
+# ----------------------------------------
+def sampleRecords(recordCount, seed):
+    """records shaped like the mapper's output: entities with addresses and
+    relationships, officers with group associations, some non-ascii names"""
+    rng = random.Random(seed)
+    names = [
+        "GOLDEN DRAGON LTD.",
+        "JOSÉ GARCÍA",
+        "MÜLLER HOLDINGS S.A.",
+        "李伟",
+        "OLGA IVANOVA",
+    ]
+    countries = ["VGB", "PAN", "HKG", "CHE", "GBR", "RUS"]
+    records = []
+    for i in range(recordCount):
+        recordId = str(rng.randint(10000000, 240000000))
+        isPerson = i % 2 == 1
+        jsonData = {
+            "DATA_SOURCE": "ICIJ",
+            "RECORD_ID": recordId,
+            "RECORD_TYPE": "PERSON" if isPerson else "ORGANIZATION",
+        }
+        if isPerson:
+            jsonData["PRIMARY_NAME_FULL"] = rng.choice(names)
+        else:
+            jsonData["PRIMARY_NAME_ORG"] = rng.choice(names)
+        jsonData["ICIJ_SOURCE"] = "Panama Papers"
+        jsonData["NODE_TYPE"] = "OFFICER" if isPerson else "ENTITY"
+        jsonData["COUNTRIES"] = [
+            {"COUNTRY_OF_ASSOCIATION": x} for x in rng.sample(countries, 2)
+        ]
+        if not isPerson:
+            jsonData["Jurisdiction"] = "BVI"
+            jsonData["Status"] = "Active"
+            jsonData["INCORPORATED"] = "23-MAR-2006"
+        jsonData["REL_ANCHOR_DOMAIN"] = "ICIJ_ID"
+        jsonData["REL_ANCHOR_KEY"] = recordId
+        jsonData["ADDRESSES"] = [
+            {
+                "ADDR_TYPE": "BUSINESS",
+                "ADDR_FULL": "%s QUEEN'S ROAD CENTRAL, HONG KONG" % rng.randint(1, 999),
+            }
+        ]
+        if isPerson:
+            jsonData["GROUP_ASSOCIATIONS"] = [
+                {"GROUP_ASSOCIATION_ORG_NAME": rng.choice(names)}
+                for _ in range(rng.randint(1, 3))
+            ]
+        jsonData["RELATIONSHIPS"] = [
+            {
+                "REL_POINTER_DOMAIN": "ICIJ_ID",
+                "REL_POINTER_KEY": rng.randint(10000000, 240000000),
+                "REL_POINTER_ROLE": "shareholder of",
+                "REL_POINTER_FROM_DATE": "01-JAN-2010",
+            }
+            for _ in range(rng.randint(1, 4))
+        ]
+        records.append(jsonData)
+    return records
+
+
+# ----------------------------------------
+def timeSerializer(records, encode, rounds):
+    best = None
+    byteCount = 0
+    for _ in range(rounds):
+        startTime = time.perf_counter()
+        byteCount = 0
+        for jsonData in records:
+            byteCount += len(encode(jsonData))
+        elapsed = time.perf_counter() - startTime
+        best = elapsed if best is None else min(best, elapsed)
+    return best, byteCount
+
+
+# ----------------------------------------
+def timeWriter(records, encode, batched, rounds):
+    """the mapper's OutputWriter writing each line as it comes vs in 4MB batches"""
+    best = None
+    with tempfile.TemporaryDirectory() as tempDir:
+        fileName = os.path.join(tempDir, "output.json")
+        for _ in range(rounds):
+            startTime = time.perf_counter()
+            outputWriter = icij_mapper.OutputWriter(fileName, encode)
+            if not batched:
+                outputWriter.batchBytes = 1
+            for jsonData in records:
+                outputWriter.write(jsonData)
+            outputWriter.close()
+            elapsed = time.perf_counter() - startTime
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# ----------------------------------------
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        "-n", "--record_count", type=int, default=200000, help="default=200000"
+    )
+    argparser.add_argument(
+        "-r", "--rounds", type=int, default=3, help="best of this many, default=3"
+    )
+    args = argparser.parse_args()
+
+    records = sampleRecords(args.record_count, 20220503)
+    serializers = []
+    for serializerName in ("json", "orjson"):
+        try:
+            serializers.append(
+                (serializerName, icij_mapper.getSerializer(serializerName))
+            )
+        except ImportError:
+            print("orjson is not installed, only timing the json module")
+
+    print("%s records, best of %s rounds" % (args.record_count, args.rounds))
+    print("")
+    print(
+        "%-8s %12s %10s %14s %14s"
+        % ("encoder", "records/sec", "MB", "unbatched sec", "batched sec")
+    )
+    for serializerName, encode in serializers:
+        elapsed, byteCount = timeSerializer(records, encode, args.rounds)
+        print(
+            "%-8s %12s %10s %14s %14s"
+            % (
+                serializerName,
+                int(args.record_count / elapsed),
+                round(byteCount / 1048576, 1),
+                round(timeWriter(records, encode, False, args.rounds), 2),
+                round(timeWriter(records, encode, True, args.rounds), 2),
+            )
+        )
+
+    # --orjson's lines must be the json module's, compact and not \\u escaped,
+    # --byte for byte so the keys are in the same order too
+    if len(serializers) > 1:
+        encode = dict(serializers)["orjson"]
+        for jsonData in records[0:1000]:
+            compactLine = json.dumps(
+                jsonData, ensure_ascii=False, separators=(",", ":")
+            )
+            if encode(jsonData) != (compactLine + "\n").encode("utf-8"):
+                print("")
+                print("orjson and json disagree on record %s" % jsonData["RECORD_ID"])
+                sys.exit(1)
@@ -0,0 +1,204 @@
+#! /usr/bin/env python3
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+
+try:
+    import zstandard
+except ImportError:  # --optional, only needed for zstd compressed files
+    zstandard = None
+
+
+# ----------------------------------------
+def openMapperOutput(fileName):
+    """binary line stream of a mapper output file, compressed or not"""
+    if fileName.endswith(".gz"):
+        return gzip.open(fileName, "rb")
+    if fileName.endswith(".zst"):
+        if not zstandard:
+            raise IOError("reading %s requires zstandard" % fileName)
+        return zstandard.open(fileName, "rb")
+    return open(fileName, "rb")
+
+
+# ----------------------------------------
+def readRecords(fileName):
+    """(RECORD_ID, record, line) for each record in a file, worker part files
+    with a RECORD_ID and a tab in front of each line are read as well"""
+    with openMapperOutput(fileName) as fileHandle:
+        for lineNumber, line in enumerate(fileHandle, 1):
+            if not line.strip():
+                continue
+            if line[0:1] != b"{":
+                if b"\t" not in line:
+                    raise ValueError(
+                        "%s line %s is neither a json record nor a keyed one"
+                        % (fileName, lineNumber)
+                    )
+                line = line.split(b"\t", 1)[1]
+            jsonData = json.loads(line)
+            yield str(jsonData.get("RECORD_ID")), jsonData, line.rstrip(b"\r\n")
+
+
+# ----------------------------------------
+def keyedRecords(fileName):
+    """readRecords() keyed by RECORD_ID, a repeated RECORD_ID is keyed by which
+    occurrence it is so the second is compared with the second and so on"""
+    occurrences = {}
+    for recordId, jsonData, line in readRecords(fileName):
+        occurrence = occurrences.get(recordId, 0) + 1
+        occurrences[recordId] = occurrence
+        if occurrence > 1:
+            recordId = "%s (occurrence %s)" % (recordId, occurrence)
+        yield recordId, jsonData, line
+
+
+# ----------------------------------------
+def recordHash(jsonData):
+    """the same for the same record however it was encoded"""
+    canonical = json.dumps(jsonData, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+
+# ----------------------------------------
+def describeDifference(expected, actual):
+    """the top level keys that differ, with both values"""
+    lines = []
+    for key in list(expected) + [x for x in actual if x not in expected]:
+        if key not in actual:
+            lines.append("  %s only expected: %s" % (key, json.dumps(expected[key])))
+        elif key not in expected:
+            lines.append("  %s only actual: %s" % (key, json.dumps(actual[key])))
+        elif expected[key] != actual[key]:
+            lines.append("  %s expected: %s" % (key, json.dumps(expected[key])))
+            lines.append("  %s actual:   %s" % (key, json.dumps(actual[key])))
+    if not lines and list(expected) != list(actual):
+        lines.append("  key order expected: %s" % ", ".join(expected))
+        lines.append("  key order actual:   %s" % ", ".join(actual))
+    return lines
+
+
+# ----------------------------------------
+def compareOutputs(expectedFile, actualFile, showCount):
+    """compare two outputs record for record, keyed by RECORD_ID, returns the
+    counts of each outcome"""
+
+    # --only a hash and position of each expected record is held in memory
+    expectedRecords = {}
+    expectedLines = {}
+    for position, (recordId, jsonData, line) in enumerate(keyedRecords(expectedFile)):
+        expectedRecords[recordId] = (position, recordHash(jsonData))
+        expectedLines[recordId] = hashlib.blake2b(line, digest_size=16).digest()
+
+    counts = {
+        "identical": 0,
+        "same_content": 0,
+        "different": 0,
+        "only_expected": 0,
+        "only_actual": 0,
+        "out_of_order": 0,
+    }
+    seenIds = set()
+    shownDiffs = {}
+    for position, (recordId, jsonData, line) in enumerate(keyedRecords(actualFile)):
+        seenIds.add(recordId)
+        expected = expectedRecords.get(recordId)
+        if not expected:
+            counts["only_actual"] += 1
+            if len(shownDiffs) < showCount:
+                shownDiffs[recordId] = None
+            continue
+        if expected[0] != position:
+            counts["out_of_order"] += 1
+        if expectedLines[recordId] == hashlib.blake2b(line, digest_size=16).digest():
+            counts["identical"] += 1
+        elif expected[1] == recordHash(jsonData):
+            counts["same_content"] += 1
+        else:
+            counts["different"] += 1
+            if len(shownDiffs) < showCount:
+                shownDiffs[recordId] = jsonData
+    onlyExpected = [x for x in expectedRecords if x not in seenIds]
+    counts["only_expected"] = len(onlyExpected)
+
+    # --look the shown ones up again rather than keeping every expected record
+    if shownDiffs:
+        for recordId, jsonData, _ in keyedRecords(expectedFile):
+            if recordId in shownDiffs:
+                print("")
+                print("RECORD_ID %s" % recordId)
+                if shownDiffs[recordId] is None:
+                    print("  only in %s" % actualFile)
+                else:
+                    for diffLine in describeDifference(jsonData, shownDiffs[recordId]):
+                        print(diffLine)
+        for recordId in [x for x in shownDiffs if x not in expectedRecords]:
+            print("")
+            print("RECORD_ID %s" % recordId)
+            print("  only in %s" % actualFile)
+    for recordId in onlyExpected[0 : max(0, showCount - len(shownDiffs))]:
+        print("")
+        print("RECORD_ID %s" % recordId)
+        print("  only in %s" % expectedFile)
+    return counts
+
+
+# ----------------------------------------
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(
+        description="compare two icij_mapper outputs record for record"
+    )
+    argparser.add_argument("expected_file", help="output of the reference run")
+    argparser.add_argument("actual_file", help="output to check against it")
+    argparser.add_argument(
+        "-n",
+        "--show",
+        type=int,
+        default=10,
+        help="how many differing records to describe, default=10",
+    )
+    argparser.add_argument(
+        "-o",
+        "--ignore_order",
+        action="store_true",
+        default=False,
+        help="don't count records written in a different order as a difference",
+    )
+    argparser.add_argument(
+        "-e",
+        "--ignore_encoding",
+        action="store_true",
+        default=False,
+        help="don't count the same record encoded differently (e.g. json vs orjson) as a difference",
+    )
+    args = argparser.parse_args()
+
+    try:
+        compareCounts = compareOutputs(args.expected_file, args.actual_file, args.show)
+    except (IOError, ValueError) as err:
+        print("")
+        print("Could not compare %s with %s" % (args.expected_file, args.actual_file))
+        print(" %s" % err)
+        print("")
+        sys.exit(2)
+
+    print("")
+    for countName, countValue in compareCounts.items():
+        print("%-14s %s" % (countName, countValue))
+    differences = (
+        compareCounts["different"]
+        + compareCounts["only_expected"]
+        + compareCounts["only_actual"]
+    )
+    if not args.ignore_order:
+        differences += compareCounts["out_of_order"]
+    if not args.ignore_encoding:
+        differences += compareCounts["same_content"]
+    print("")
+    if differences:
+        print("The outputs differ")
+        sys.exit(1)
+    print("The outputs match record for record")
@@ -1,30 +1,136 @@
 #! /usr/bin/env python3
 
+# --the mapper is run as a single script, copied alongside mapper-base and the
+# --Senzing tools without being installed, so it is kept in one module
+# pylint: disable=too-many-lines
+
 import sys
 import os
 import argparse
 import signal
 import time
 import json
-import pandas
+import csv
+import io
+import hashlib
 import sqlite3
 import random
+import math
+import collections
+import gzip
+import queue
+import threading
+import array
+import bisect
+import stat
+import importlib.util
 
-# --try to import the base mapper library and variants
 try:
-    import base_mapper
-except:
-    print("")
-    print("Please export PYTHONPATH=$PYTHONPATH:<path to mapper-base project>")
-    print("")
-    sys.exit(1)
-baseLibrary = base_mapper.base_library(
-    os.path.abspath(base_mapper.__file__).replace(
+    import resource
+except ImportError:  # --not available on windows
+    resource = None
+
+try:
+    import orjson
+except ImportError:  # --optional, the standard json module is used without it
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # --optional, only needed for zstd compressed output
+    zstandard = None
+
+# --the base mapper library and variants are loaded once a run is going ahead,
+# --not for --help, argument errors or --check (see loadBaseLibrary)
+baseLibrary = None
+baseVariantsFile = None
+
+# --set from --max_memory, None runs without a memory budget
+memoryBudget = None
+
+# --worker part files prefix each line with its RECORD_ID for a delta merge
+keyedLines = False
+
+
+# --edge endpoints resolve to the first node type their node_id is found in
+nodeTypePrecedence = ["entity", "intermediary", "officer", "address", "other"]
+
+# --bump when the staging tables change shape so older staging databases get reloaded
+stagingSchemaVersion = 2
+
+# --bump when the node directory or resolved edges are built differently so
+# --they are rebuilt from the staged tables
+lookupTablesVersion = 2
+
+# --csv rows are inserted this many at a time, or fewer under a memory budget
+loadChunkSize = 50000
+
+# --the columnar engine's peak memory as a multiple of the csv bytes it reads
+columnarMemoryFactor = 4
+
+# --the csv columns node2Json reads, all the columnar engine loads
+columnarNodeColumns = {
+    "node_id",
+    "name",
+    "address",
+    "sourceID",
+    "jurisdiction",
+    "country_codes",
+    "status",
+    "company_type",
+    "incorporation_date",
+    "inactivation_date",
+    "struck_off_date",
+    "note",
+}
+columnarEdgeColumns = {"node_id_start", "node_id_end", "link", "start_date", "end_date"}
+
+# --node id columns are stored as integers, everything else as text
+integerColumns = {"node_id", "node_id_start", "node_id_end"}
+
+# --the values pandas.read_csv treated as null, kept so the staged data doesn't change
+nullValues = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+}
+
+
+# ----------------------------------------
+def loadBaseLibrary():
+    """import and initialize the base mapper library, exiting if it is missing"""
+    global baseLibrary, baseVariantsFile
+    if baseLibrary:
+        return
+    try:
+        import base_mapper  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        print("")
+        print("Please export PYTHONPATH=$PYTHONPATH:<path to mapper-base project>")
+        print("")
+        sys.exit(1)
+    baseVariantsFile = os.path.abspath(base_mapper.__file__).replace(
         "base_mapper.py", "base_variants.json"
     )
-)
-if not baseLibrary.initialized:
-    sys.exit(1)
+    baseLibrary = base_mapper.base_library(baseVariantsFile)
+    if not baseLibrary.initialized:
+        sys.exit(1)
 
 
 # ----------------------------------------
@@ -35,217 +141,2988 @@ def signal_handler(signal, frame):
 
 
 # ----------------------------------------
-def updateStat(cat1, cat2, example=None):
-    if cat1 not in statPack:
-        statPack[cat1] = {}
-    if cat2 not in statPack[cat1]:
-        statPack[cat1][cat2] = {}
-        statPack[cat1][cat2]["count"] = 0
+class HashingReader(io.RawIOBase):
+    """binary file wrapper that hashes the bytes as they are read"""
+
+    def __init__(self, fileHandle):
+        self.fileHandle = fileHandle
+        self.hasher = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        byteCount = self.fileHandle.readinto(buffer)
+        if byteCount:
+            self.hasher.update(memoryview(buffer)[0:byteCount])
+        return byteCount
+
+    def close(self):
+        self.fileHandle.close()
+        super().close()
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+# ----------------------------------------
+# --one list per field indexed by stat id rather than an object per stat keeps add() cheap
+class MappingStats:  # pylint: disable=too-many-instance-attributes
+    """attribute counts and examples for the -l log file
+
+    Each (category, attribute) pair gets a compact integer id the first time it
+    is seen and its count lives in a flat list. Up to 5 distinct examples are
+    kept per attribute by reservoir sampling (algorithm L), which only draws a
+    random number when the next example to keep comes up rather than on every
+    call. The level is "off", "counts" (no examples) or "full".
+    """
+
+    exampleLimit = 5
+
+    def __init__(self, statsLevel="full"):
+        self.statsLevel = statsLevel
+        self.keepExamples = statsLevel == "full"
+        self.statIds = {}
+        self.statKeys = []
+        self.counts = []
+        self.offered = []
+        self.examples = []
+        self.nextSample = []
+        self.sampleWeight = []
+
+    def newStat(self, statKey):
+        statId = len(self.statKeys)
+        self.statIds[statKey] = statId
+        self.statKeys.append(statKey)
+        self.counts.append(0)
+        self.offered.append(0)
+        self.examples.append([])
+        self.nextSample.append(0)
+        self.sampleWeight.append(1.0)
+        return statId
+
+    def add(self, cat1, cat2, example=None):
+        statId = self.statIds.get((cat1, cat2))
+        if statId is None:
+            statId = self.newStat((cat1, cat2))
+        self.counts[statId] += 1
+        if example and self.keepExamples:
+            self.offered[statId] += 1
+            if self.offered[statId] >= self.nextSample[statId]:
+                self.sample(statId, example)
 
-    statPack[cat1][cat2]["count"] += 1
-    if example:
-        if "examples" not in statPack[cat1][cat2]:
-            statPack[cat1][cat2]["examples"] = []
-        if example not in statPack[cat1][cat2]["examples"]:
-            if len(statPack[cat1][cat2]["examples"]) < 5:
-                statPack[cat1][cat2]["examples"].append(example)
+    def addRecord(self, jsonData):
+        """count every attribute of a mapped record, including list sub-records"""
+        statIds = self.statIds
+        counts = self.counts
+        offered = self.offered
+        nextSample = self.nextSample
+        keepExamples = self.keepExamples
+        nodeType = jsonData.get("NODE_TYPE", "UNKNOWN")
+        for key1, value1 in jsonData.items():
+            if isinstance(value1, list):
+                attributes = [x for subrecord in value1 for x in subrecord.items()]
             else:
-                randomSampleI = random.randint(2, 4)
-                statPack[cat1][cat2]["examples"][randomSampleI] = example
+                attributes = [(key1, value1)]
+            for key2, example in attributes:
+                statId = statIds.get((nodeType, key2))
+                if statId is None:
+                    statId = self.newStat((nodeType, key2))
+                counts[statId] += 1
+                if example and keepExamples:
+                    offered[statId] += 1
+                    if offered[statId] >= nextSample[statId]:
+                        self.sample(statId, example)
+
+    def sample(self, statId, example):
+        """called while the reservoir fills and then only for the examples picked"""
+        examples = self.examples[statId]
+        if len(examples) < self.exampleLimit:
+            if example not in examples:
+                examples.append(example)
+                if len(examples) == self.exampleLimit:
+                    self.skipAhead(statId, self.offered[statId])
+        else:
+            if example not in examples:
+                examples[random.randrange(self.exampleLimit)] = example
+            self.skipAhead(statId, self.offered[statId])
+
+    def skipAhead(self, statId, offered):
+        """pick which upcoming example will be kept next"""
+        weight = self.sampleWeight[statId] * math.exp(
+            math.log(1.0 - random.random()) / self.exampleLimit
+        )
+        self.sampleWeight[statId] = weight
+        skip = (
+            math.log(1.0 - random.random()) / math.log1p(-weight) if weight < 1 else 0
+        )
+        self.nextSample[statId] = offered + int(skip) + 1
+
+    def merge(self, otherStats):
+        """fold in another process's statistics, re-sampling the examples in
+        proportion to how many each side saw"""
+        for otherId, statKey in enumerate(otherStats.statKeys):
+            statId = self.statIds.get(statKey)
+            if statId is None:
+                statId = self.newStat(statKey)
+            self.counts[statId] += otherStats.counts[otherId]
+            candidates = []
+            for offered, examples in [
+                (self.offered[statId], self.examples[statId]),
+                (otherStats.offered[otherId], otherStats.examples[otherId]),
+            ]:
+                for example in examples:
+                    if example not in [x[1] for x in candidates]:
+                        weight = offered / len(examples)
+                        candidates.append((random.random() ** (1.0 / weight), example))
+            candidates.sort(key=lambda x: x[0], reverse=True)
+            self.examples[statId] = [x[1] for x in candidates[0 : self.exampleLimit]]
+            self.offered[statId] += otherStats.offered[otherId]
+            if len(self.examples[statId]) == self.exampleLimit:
+                self.skipAhead(statId, self.offered[statId])
+
+    def snapshot(self):
+        """everything needed to carry on counting after a resume, json friendly"""
+        return {
+            "statsLevel": self.statsLevel,
+            "statKeys": [list(x) for x in self.statKeys],
+            "counts": self.counts,
+            "offered": self.offered,
+            "examples": self.examples,
+            "nextSample": self.nextSample,
+            "sampleWeight": self.sampleWeight,
+        }
+
+    def restore(self, snapshot):
+        for statKey in snapshot["statKeys"]:
+            self.newStat(tuple(statKey))
+        self.counts = snapshot["counts"]
+        self.offered = snapshot["offered"]
+        self.examples = snapshot["examples"]
+        self.nextSample = snapshot["nextSample"]
+        self.sampleWeight = snapshot["sampleWeight"]
+
+    def toStatPack(self):
+        """the nested {category: {attribute: {count, examples}}} log file layout"""
+        statPack = {}
+        for statId, (cat1, cat2) in enumerate(self.statKeys):
+            statPack.setdefault(cat1, {})[cat2] = {"count": self.counts[statId]}
+            if self.examples[statId]:
+                statPack[cat1][cat2]["examples"] = list(self.examples[statId])
+        return statPack
 
 
 # ----------------------------------------
-def csv2db():
-    """load database"""
-    for fileDict in inputFiles:
-        dbObj = conn.cursor()
-        dbCursor = dbObj.execute(
-            "select name from sqlite_master where type='table' AND name='%s'"
-            % fileDict["tableName"]
+class PerformanceStats:
+    """where the time goes, for the PERFORMANCE section of the -l log file
+
+    Phases are wall clock seconds. Each node table's mapping time is added up
+    across the calls that mapped it, so with several workers its throughput is
+    per worker. Edge lookups, advancing the edge stream to each node, are
+    counted into power of 2 microsecond buckets.
+    """
+
+    bucketCount = 16
+
+    def __init__(self):
+        self.loadFiles = {}
+        self.phases = {}
+        self.tables = {}
+        self.edgeLookups = [0] * self.bucketCount
+        self.edgeLookupNanoseconds = 0
+        self.output = {
+            "records": 0,
+            "bytes": 0,
+            "serialize_seconds": 0.0,
+            "write_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+        }
+
+    def addLoad(self, tableName, fileName, rowCount, seconds):
+        """a csv file loaded, or reused when rowCount is None"""
+        self.loadFiles[tableName] = {
+            "file": fileName,
+            "reused": rowCount is None,
+            "rows": rowCount,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": int(rowCount / seconds) if rowCount and seconds else None,
+        }
+
+    def addPhase(self, phaseName, seconds):
+        self.phases[phaseName] = self.phases.get(phaseName, 0.0) + seconds
+
+    def addTable(self, tableName, rowCount, seconds):
+        tableStats = self.tables.setdefault(tableName, [0, 0.0])
+        tableStats[0] += rowCount
+        tableStats[1] += seconds
+
+    def addEdgeLookup(self, nanoseconds):
+        self.edgeLookups[
+            min(self.bucketCount - 1, (nanoseconds // 1000).bit_length())
+        ] += 1
+        self.edgeLookupNanoseconds += nanoseconds
+
+    def addWriter(self, outputWriter, partFiles=False):
+        """a worker's part files are merged into the output, so only their
+        serialization counts towards it"""
+        self.output["serialize_seconds"] += outputWriter.serializeSeconds
+        if partFiles:
+            self.output["part_write_seconds"] = (
+                self.output.get("part_write_seconds", 0.0) + outputWriter.writeSeconds
+            )
+            return
+        self.output["records"] += outputWriter.recordCount
+        self.output["bytes"] += outputWriter.byteCount
+        self.output["write_seconds"] += outputWriter.writeSeconds
+        self.output["queue_wait_seconds"] += outputWriter.queueWaitSeconds
+        if outputWriter.queuedWrites:
+            self.output["queue_max_depth"] = outputWriter.queueMaxDepth
+            self.output["queue_mean_depth"] = round(
+                outputWriter.queueDepthTotal / outputWriter.queuedWrites, 2
+            )
+            self.output["queue_full_stalls"] = outputWriter.queueStalls
+
+    def merge(self, otherStats):
+        """fold in a worker's statistics, its phases and load times are not kept"""
+        for tableName, (rowCount, seconds) in otherStats.tables.items():
+            self.addTable(tableName, rowCount, seconds)
+        for bucket, lookupCount in enumerate(otherStats.edgeLookups):
+            self.edgeLookups[bucket] += lookupCount
+        self.edgeLookupNanoseconds += otherStats.edgeLookupNanoseconds
+        for statKey, statValue in otherStats.output.items():
+            self.output[statKey] = self.output.get(statKey, 0) + statValue
+
+    def bucketLabel(self, bucket):
+        if bucket == 0:
+            return "under 1us"
+        if bucket == self.bucketCount - 1:
+            return "%sus and over" % 2 ** (bucket - 1)
+        return "%s-%sus" % (2 ** (bucket - 1), 2**bucket)
+
+    def toStatPack(self):
+        lookupCount = sum(self.edgeLookups)
+        return {
+            "LOAD": self.loadFiles,
+            "PHASES": {x: round(self.phases[x], 3) for x in self.phases},
+            "TABLES": {
+                tableName: {
+                    "records": rowCount,
+                    "seconds": round(seconds, 3),
+                    "records_per_sec": int(rowCount / seconds) if seconds else None,
+                }
+                for tableName, (rowCount, seconds) in self.tables.items()
+            },
+            "EDGE_LOOKUPS": {
+                "count": lookupCount,
+                "seconds": round(self.edgeLookupNanoseconds / 1e9, 3),
+                "histogram": [
+                    [self.bucketLabel(bucket), lookupCount]
+                    for bucket, lookupCount in enumerate(self.edgeLookups)
+                    if lookupCount
+                ],
+            },
+            "OUTPUT": {
+                x: round(y, 3) if isinstance(y, float) else y
+                for x, y in self.output.items()
+            },
+            "PEAK_RSS_MB": peakRssMB(),
+            "WORKER_PEAK_RSS_MB": peakRssMB(True) if workerCount > 1 else None,
+            "MEMORY_BUDGET": memoryBudget.statPack() if memoryBudget else None,
+        }
+
+
+# ----------------------------------------
+class CompanyNameCache:
+    """bounded LRU memo of baseLibrary.isCompanyName()
+
+    The same nominee names and corporate officers appear thousands of times, so
+    each name is only classified once while it stays among the most recently
+    used. The cache can be saved to a file and used to prewarm the next run.
+    A worker process sets keepNewNames to hand the names it classified back to
+    the parent with drain().
+    """
+
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.names = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.keepNewNames = False
+        self.newNames = []
+
+    def isCompanyName(self, name):
+        isCompany = self.names.get(name)
+        if isCompany is not None:
+            self.hits += 1
+            self.names.move_to_end(name)
+            return isCompany
+        self.misses += 1
+        isCompany = bool(baseLibrary.isCompanyName(name))
+        if self.maxSize > 0:
+            self.evictions += self.store(name, isCompany)
+            if self.keepNewNames:
+                self.newNames.append((name, isCompany))
+        return isCompany
+
+    def store(self, name, isCompany):
+        """add a name, returning how many least recently used ones were evicted"""
+        self.names[name] = isCompany
+        self.names.move_to_end(name)
+        if len(self.names) > self.maxSize:
+            self.names.popitem(last=False)
+            return 1
+        return 0
+
+    def trim(self, maxSize):
+        """shrink to the maxSize most recently used names"""
+        self.maxSize = maxSize
+        while len(self.names) > maxSize:
+            self.names.popitem(last=False)
+            self.evictions += 1
+        del self.newNames[: max(0, len(self.newNames) - maxSize)]
+
+    def drain(self):
+        """counters and names classified since the last drain, for a worker to
+        hand back to the parent process"""
+        drained = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "newNames": self.newNames,
+        }
+        self.hits, self.misses, self.evictions, self.newNames = 0, 0, 0, []
+        return drained
+
+    def merge(self, drained):
+        self.hits += drained["hits"]
+        self.misses += drained["misses"]
+        self.evictions += drained["evictions"]
+        for name, isCompany in drained["newNames"]:
+            if name not in self.names:
+                self.store(name, isCompany)
+
+    def statPack(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.names),
+            "max_size": self.maxSize,
+        }
+
+    def load(self, fileName):
+        """prewarm from a file saved by an earlier run with the same base variants"""
+        if self.maxSize <= 0:
+            return 0
+        try:
+            with open(fileName, "r", encoding="utf-8") as cacheFile:
+                cacheData = json.load(cacheFile)
+        except (IOError, ValueError) as err:
+            print("Could not read name cache %s, starting empty (%s)" % (fileName, err))
+            return 0
+        if cacheData.get("base_variants") != baseVariantsFingerprint():
+            print(
+                "Name cache %s is from other base variants, starting empty" % fileName
+            )
+            return 0
+        for name, isCompany in cacheData.get("names", [])[-self.maxSize :]:
+            self.store(name, isCompany)
+        return len(self.names)
+
+    def save(self, fileName):
+        cacheData = {
+            "base_variants": baseVariantsFingerprint(),
+            "names": list(self.names.items()),
+        }
+        with open(fileName, "w", encoding="utf-8") as cacheFile:
+            json.dump(cacheData, cacheFile, ensure_ascii=False)
+
+
+# ----------------------------------------
+class NodeIdTracker:
+    """the node_ids mapped so far, for the -1, -2 ... suffixes of a node_id that
+    is in more than one node file
+
+    Integer node_ids are split into pages of 65536 by their high bits. A page
+    keeps the low 16 bits of its node_ids in a sorted array of 2 byte values
+    and becomes an 8KB bitmap once it holds more than 4096, so a release's ~2M
+    node_ids take a few MB rather than a dict entry each. The few node_ids
+    mapped more than once are counted in a dict, and any node_id that isn't a
+    non-negative integer, or a string of one, is kept as the string it is
+    written out as.
+    """
+
+    def __init__(self, nodeCounts=None):
+        self.pages = {}
+        self.repeatCounts = {}
+        self.otherIds = set()
+        self.recordCounts(nodeCounts or [])
+
+    def recordCounts(self, nodeCounts):
+        """mark node_ids mapped from (node_id, times mapped) pairs, the rows of a
+        count query are read straight in rather than held in a dict first"""
+        for nodeId, mappedCount in nodeCounts:
+            for _ in range(mappedCount):
+                self.recordId(nodeId)
+
+    def recordId(self, nodeId):
+        """mark a node_id mapped, returns its RECORD_ID, suffixed with how many
+        times it was mapped before if it was"""
+        if isinstance(nodeId, int) and nodeId >= 0:
+            lowBits = nodeId & 0xFFFF
+            page = self.pages.get(nodeId >> 16)
+            if page is None:
+                self.pages[nodeId >> 16] = array.array("H", [lowBits])
+                return str(nodeId)
+            if isinstance(page, bytearray):
+                bitMask = 1 << (lowBits & 7)
+                if not page[lowBits >> 3] & bitMask:
+                    page[lowBits >> 3] |= bitMask
+                    return str(nodeId)
+
+            # --node_ids mostly come in order, so a new one is usually appended
+            elif (
+                page[-1] < lowBits or page[bisect.bisect_left(page, lowBits)] != lowBits
+            ):
+                if page[-1] < lowBits:
+                    page.append(lowBits)
+                else:
+                    bisect.insort(page, lowBits)
+                if len(page) > 4096:
+                    self.pages[nodeId >> 16] = self.toBitmap(page)
+                return str(nodeId)
+        else:
+            nodeId = str(nodeId)
+            if nodeId.isascii() and nodeId.isdigit() and str(int(nodeId)) == nodeId:
+                return self.recordId(int(nodeId))  # --"5" is the same node_id as 5
+            if nodeId not in self.otherIds:
+                self.otherIds.add(nodeId)
+                return nodeId
+        repeatCount = self.repeatCounts.get(nodeId, 0) + 1
+        self.repeatCounts[nodeId] = repeatCount
+        return f"{nodeId}-{repeatCount}"
+
+    def toBitmap(self, page):
+        bitmap = bytearray(8192)
+        for lowBits in page:
+            bitmap[lowBits >> 3] |= 1 << (lowBits & 7)
+        return bitmap
+
+
+# ----------------------------------------
+# --one attribute per share of the budget, each read where that cache or buffer is sized
+class MemoryBudget:  # pylint: disable=too-many-instance-attributes
+    """how the --max_memory budget is shared out
+
+    The budget covers the main process and any worker processes together, each
+    gets an equal share of it. The loading and the mapping are shared out
+    separately (see share) as each runs in its own number of processes. What a
+    process holds before the run starts is its
+    base, the rest of its share is split between the sqlite page cache, the csv
+    rows inserted at a time, the name cache, the output batches and the edges
+    held for a node, leaving the remainder for the record being mapped. Sorts
+    and temporary tables that outgrow the page cache spill to temporary files,
+    the edges of a node with more than edgeRowLimit are read back from the
+    database as it is mapped, and a process found over its share while mapping
+    trims its name cache and sqlite memory.
+    """
+
+    minShareMB = 64
+    nameEntryBytes = 200
+    edgeRowBytes = 500
+
+    def __init__(self, maxMemoryMB, baseMB, processCount):
+        self.maxMemoryMB = maxMemoryMB
+        self.baseMB = baseMB
+        self.processCount = processCount
+        self.share(processCount)
+        self.trimCount = 0
+
+    def share(self, processCount):
+        """split the budget between this many processes, returns the count it
+        was split between before"""
+        priorCount = self.processCount
+        self.processCount = processCount
+        self.shareMB = self.maxMemoryMB / processCount - self.baseMB
+        shareBytes = max(0, int(self.shareMB * 1048576))
+        self.cacheKB = max(2000, shareBytes // 8 // 1024)
+        self.heapLimit = shareBytes // 2
+        self.loadChunkBytes = shareBytes // 4
+        self.nameCacheSize = shareBytes // 10 // self.nameEntryBytes
+        self.edgeRowLimit = max(1000, shareBytes // 10 // self.edgeRowBytes)
+        self.batchBytes = max(65536, min(OutputWriter.batchBytes, shareBytes // 20))
+        self.queueDepth = max(
+            1, min(OutputWriter.queueDepth, shareBytes // 10 // self.batchBytes)
         )
-        dbRow = dbCursor.fetchone()
-        if not dbRow:
+        return priorCount
 
-            # note: in dec 2020, ICIJ released the Pandora Papers and went to a single database - 1 set of csv files for all
-            #  the _start and _end fields in the edges table used to refer to the node_id in the node tables
-            #  now they refer to the _id field in the node tables
+    @classmethod
+    def processLimit(cls, maxMemoryMB, baseMB):
+        """how many processes the budget leaves a useful share for"""
+        return int(maxMemoryMB // (baseMB + cls.minShareMB))
 
-            # note: in may 2022, ICIJ released new data and changed format again
-            # Now all edges contain the sourceID value related to the project they belong to.
-            # We removed the _id columns, and kept only node_id columns to link between nodes and relationships.
-            # Example to merge Officers and Entities nodes:
-            # nodes-officers.csv node_id column <-> relationships.csv node_id_start column <-> relationships.csv node_id_end column <-> nodes-entities.csv node_id column
+    def configure(self, dbConn):
+        """size a connection's page cache to the budget, anything sqlite sorts
+        or keeps in temporary tables beyond it goes to disk"""
+        dbConn.execute("pragma cache_size = -%s" % self.cacheKB)
+        dbConn.execute("pragma temp_store = file")
+        dbConn.execute("pragma soft_heap_limit = %s" % self.heapLimit)
 
-            fileDict["fileName"] = (
-                inputPath
-                + (os.path.sep if inputPath[-1:] != os.path.sep else "")
-                + fileDict["fileName"]
+    def chunkRows(self, sampleRows):
+        """how many rows like these fit the load chunk"""
+        rowBytes = sum(
+            sys.getsizeof(x) + sum(sys.getsizeof(y) for y in x) for x in sampleRows
+        ) / len(sampleRows)
+        return max(1000, min(loadChunkSize, int(self.loadChunkBytes / rowBytes)))
+
+    def check(self, dbConn):
+        """trim the caches when this process has grown past its share"""
+        rssMB = currentRssMB()
+        if rssMB is None or rssMB <= self.baseMB + self.shareMB:
+            return
+        self.trimCount += 1
+        if self.trimCount == 1:
+            print(" over the memory budget at %s MB, trimming caches" % rssMB)
+        nameCache.trim(nameCache.maxSize // 2)
+        dbConn.execute("pragma shrink_memory")
+
+    def statPack(self):
+        return {
+            "max_memory_mb": self.maxMemoryMB,
+            "processes": self.processCount,
+            "base_mb": self.baseMB,
+            "share_mb": round(self.shareMB, 1),
+            "sqlite_cache_kb": self.cacheKB,
+            "load_chunk_bytes": self.loadChunkBytes,
+            "name_cache_size": self.nameCacheSize,
+            "node_edge_limit": self.edgeRowLimit,
+            "output_batch_bytes": self.batchBytes,
+            "output_queue_depth": self.queueDepth,
+            "trims": self.trimCount,
+        }
+
+
+# ----------------------------------------
+def getSerializer(serializerName):
+    """returns a function that encodes a record as one utf-8 json line
+
+    json writes exactly what earlier versions did. orjson is opt-in, its lines
+    are compact and not \\u escaped, but hold the same keys in the same order.
+    """
+    if serializerName == "auto":
+        serializerName = "orjson" if orjson else "json"
+    if serializerName == "orjson":
+        if not orjson:
+            raise ImportError("orjson is not installed (pip3 install orjson)")
+        return lambda jsonData: orjson.dumps(jsonData) + b"\n"
+    return lambda jsonData: (json.dumps(jsonData) + "\n").encode("utf-8")
+
+
+# ----------------------------------------
+class HashingWriter(io.RawIOBase):
+    """binary file wrapper that hashes the bytes as they are written"""
+
+    def __init__(self, fileHandle):
+        self.fileHandle = fileHandle
+        self.hasher = hashlib.sha256()
+        self.byteCount = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.hasher.update(data)
+        self.byteCount += len(data)
+        return self.fileHandle.write(data)
+
+    def flush(self):
+        self.fileHandle.flush()
+
+    def close(self):
+        if not self.closed:
+            super().close()  # --flushes, so the inner file must still be open
+            self.fileHandle.close()
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+# ----------------------------------------
+class OutputFile:
+    """one output file, compressed or not, with a checksum of what lands on disk"""
+
+    def __init__(self, fileName, compression, append=False):
+        self.fileName = fileName
+        self.compression = compression
+        self.recordCount = 0
+        if fileName == "-":  # --a duplicate of stdout, so closing it leaves stdout open
+            self.hashedHandle = HashingWriter(os.fdopen(os.dup(1), "wb"))
+        else:
+            self.hashedHandle = HashingWriter(open(fileName, "ab" if append else "wb"))
+        if compression == "gzip":
+            self.fileHandle = gzip.GzipFile(
+                filename="", mode="wb", compresslevel=6, fileobj=self.hashedHandle
             )
-            print("loading %s ..." % fileDict["fileName"])
-            df = pandas.read_csv(
-                fileDict["fileName"], low_memory=False, encoding="utf-8", quotechar='"'
+        elif compression == "zstd":
+            self.fileHandle = zstandard.ZstdCompressor(level=3).stream_writer(
+                self.hashedHandle
             )
-            df.to_sql(fileDict["tableName"], conn, if_exists="replace")
-            if fileDict["nodeType"] != "edges":
-                conn.cursor().execute(
-                    "create index ix_%s on %s (node_id)"
-                    % (fileDict["tableName"], fileDict["tableName"])
-                )
-            else:
+        else:
+            self.fileHandle = self.hashedHandle
 
-                conn.cursor().execute(
-                    "create index ix_%s1 on %s (node_id_start)"
-                    % (fileDict["tableName"], fileDict["tableName"])
-                )
+    def write(self, data):
+        self.fileHandle.write(data)
 
-                sql = "create view %s_view as " % (fileDict["nodeDatabase"] + "_edges",)
-                sql += "select  "
-                sql += " a.node_id_start, "
-                sql += " case when b.node_id is null then "
-                sql += "  case when c.node_id is null then "
-                sql += "   case when d.node_id is null then "
-                sql += "    case when e.node_id is null then null "
-                sql += "     else e.node_id end "
-                sql += "    else d.node_id end "
-                sql += "   else c.node_id end "
-                sql += "  else b.node_id end as node1_id, "
-                sql += " case when b.node_id is null then "
-                sql += "  case when c.node_id is null then "
-                sql += "   case when d.node_id is null then "
-                sql += "    case when e.node_id is null then null "
-                sql += "     else 'address' end "
-                sql += "    else 'officer' end "
-                sql += "   else 'intermediary' end "
-                sql += "  else 'entity' end as node1_type, "
-                sql += " case when b.node_id is null then "
-                sql += "  case when c.node_id is null then "
-                sql += "   case when d.node_id is null then "
-                sql += "    case when e.node_id is null then null "
-                sql += "     else case when e.name is null then e.address else e.name end end "
-                sql += "    else d.name end "
-                sql += "   else c.name end "
-                sql += "  else b.name end as node1_desc, "
-                sql += " a.rel_type, "
-                sql += " a.link, "
-                sql += " a.node_id_end, "
-                sql += " case when f.node_id is null then "
-                sql += "  case when g.node_id is null then "
-                sql += "   case when h.node_id is null then "
-                sql += "    case when i.node_id is null then null "
-                sql += "     else i.node_id end "
-                sql += "    else h.node_id end "
-                sql += "   else g.node_id end "
-                sql += "  else f.node_id end as node2_id, "
-                sql += " case when f.node_id is null then "
-                sql += "  case when g.node_id is null then "
-                sql += "   case when h.node_id is null then "
-                sql += "    case when i.node_id is null then null "
-                sql += "     else 'address' end "
-                sql += "    else 'officer' end "
-                sql += "   else 'intermediary' end "
-                sql += "  else 'entity' end as node2_type, "
-                sql += " case when f.node_id is null then "
-                sql += "  case when g.node_id is null then "
-                sql += "   case when h.node_id is null then "
-                sql += "    case when i.node_id is null then null "
-                sql += "     else case when i.name is null then i.address else i.name end end "
-                sql += "    else h.name end "
-                sql += "   else g.name end "
-                sql += "  else f.name end as node2_desc, "
-                sql += " a.start_date, "
-                sql += " a.end_date "
-                sql += "from %s a " % (fileDict["nodeDatabase"] + "_edges",)
-                sql += "left join %s b on b.node_id = a.node_id_start " % (
-                    fileDict["nodeDatabase"] + "_entity",
-                )
-                sql += "left join %s c on c.node_id = a.node_id_start " % (
-                    fileDict["nodeDatabase"] + "_intermediary",
-                )
-                sql += "left join %s d on d.node_id = a.node_id_start " % (
-                    fileDict["nodeDatabase"] + "_officer",
-                )
-                sql += "left join %s e on e.node_id = a.node_id_start " % (
-                    fileDict["nodeDatabase"] + "_address",
-                )
-                sql += "left join %s f on f.node_id = a.node_id_end " % (
-                    fileDict["nodeDatabase"] + "_entity",
-                )
-                sql += "left join %s g on g.node_id = a.node_id_end " % (
-                    fileDict["nodeDatabase"] + "_intermediary",
-                )
-                sql += "left join %s h on h.node_id = a.node_id_end " % (
-                    fileDict["nodeDatabase"] + "_officer",
+    def flush(self):
+        self.fileHandle.flush()
+
+    def sync(self):
+        """flush all the way to disk"""
+        self.fileHandle.flush()
+        os.fsync(self.hashedHandle.fileHandle.fileno())
+
+    def close(self):
+        self.fileHandle.close()
+        self.hashedHandle.close()
+
+    def manifestEntry(self):
+        return {
+            "file": os.path.basename(self.fileName),
+            "records": self.recordCount,
+            "bytes": self.hashedHandle.byteCount,
+            "sha256": self.hashedHandle.hexdigest(),
+        }
+
+
+# ----------------------------------------
+# --the timings and queue counts are kept as plain attributes for the statistics file
+class OutputWriter:  # pylint: disable=too-many-instance-attributes
+    """encodes records and collects the lines into large buffered writes
+
+    Lines are written when the batch reaches batchBytes or, if a flush interval
+    is set, when that many seconds have passed since the last write. Compressed
+    or streamed output is handed to a background thread through a bounded queue
+    so the compression, or a slow reader of a pipe, runs alongside the mapping.
+    When the queue is full the mapping waits, which is reported as the queue
+    wait and stalls. A memory budget sets smaller batches and a shorter queue.
+    With splitRecords or splitBytes the output rolls over to numbered files.
+    Write errors, including those from the background thread, are raised as
+    IOError from write(), flush() or close().
+
+    With a recordIndex only the records it reports as added or changed are
+    written, a batch at a time. With resumeAt, a (bytes, records) pair from a
+    checkpoint, an uncompressed single file is cut back to that many bytes and
+    appended to. Worker part files are written with keyedLines, each line prefixed
+    with its RECORD_ID and a tab, so the merge can check them without decoding.
+    """
+
+    batchBytes = 4194304
+    queueDepth = 8
+
+    # --every way the output can be written is an option of the one writer, they are keyword only
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        fileName,
+        serializer,
+        compression=None,
+        *,
+        splitRecords=None,
+        splitBytes=None,
+        flushInterval=None,
+        recordIndex=None,
+        keyedLines=False,
+        resumeAt=None,
+        streaming=False,
+    ):
+        self.fileName = fileName
+        self.serializer = serializer
+        self.compression = compression
+        self.splitRecords = splitRecords
+        self.splitBytes = splitBytes
+        self.flushInterval = flushInterval
+        self.recordIndex = recordIndex
+        self.keyedLines = keyedLines
+        if memoryBudget:  # --smaller batches and fewer of them queued
+            self.batchBytes = memoryBudget.batchBytes
+            self.queueDepth = memoryBudget.queueDepth
+        self.batch = []
+        self.batchSize = 0
+        self.lastFlush = time.time()
+        self.recordCount = 0
+        self.byteCount = 0
+        self.fileBytes = 0
+        self.serializeSeconds = 0.0
+        self.writeSeconds = 0.0
+        self.queueWaitSeconds = 0.0
+        self.queuedWrites = 0
+        self.queueDepthTotal = 0
+        self.queueMaxDepth = 0
+        self.queueStalls = 0
+        self.outputFiles = []
+        self.outputFile = None
+        self.backgroundError = None
+        self.writeQueue = None
+        if compression or streaming:
+            self.writeQueue = queue.Queue(self.queueDepth)
+            self.writeThread = threading.Thread(target=self.backgroundWrite)
+            self.writeThread.daemon = True
+            self.writeThread.start()
+        if resumeAt:
+            self.byteCount, self.recordCount = resumeAt
+            with open(fileName, "r+b") as outputFile:
+                outputFile.truncate(self.byteCount)
+        self.openNext(bool(resumeAt))
+
+    def openNext(self, append=False):
+        if self.splitRecords or self.splitBytes:
+            fileName = shardFileName(self.fileName, len(self.outputFiles) + 1)
+        else:
+            fileName = self.fileName
+        self.outputFile = OutputFile(fileName, self.compression, append)
+        self.outputFiles.append(self.outputFile)
+        self.fileBytes = 0
+
+    def write(self, jsonData):
+        startTime = time.perf_counter()
+        line = self.serializer(jsonData)
+        self.serializeSeconds += time.perf_counter() - startTime
+        if self.keyedLines:
+            line = jsonData["RECORD_ID"].encode("utf-8") + b"\t" + line
+        elif self.recordIndex:
+            self.writeChanged(jsonData["RECORD_ID"], line)
+            return
+        self.writeEncoded(line)
+
+    def writeChanged(self, recordId, line):
+        for changedLine in self.recordIndex.add(recordId, line):
+            self.writeEncoded(changedLine)
+
+    def writeEncoded(self, line):
+        if self.outputFile.recordCount and (
+            (self.splitRecords and self.outputFile.recordCount >= self.splitRecords)
+            or (self.splitBytes and self.fileBytes + len(line) > self.splitBytes)
+        ):
+            self.rollOver()
+        if len(line) >= self.batchBytes and self.batch:
+            self.flush()  # --written on its own rather than copied into a batch
+        self.batch.append(line)
+        self.batchSize += len(line)
+        self.byteCount += len(line)
+        self.fileBytes += len(line)
+        self.outputFile.recordCount += 1
+        self.recordCount += 1
+        if self.batchSize >= self.batchBytes or (
+            self.flushInterval and time.time() - self.lastFlush >= self.flushInterval
+        ):
+            self.flush()
+
+    def writeLines(self, sourceHandle, keyedLines=False):
+        """append already encoded lines, such as a worker's shard file"""
+        for line in sourceHandle:
+            if keyedLines:
+                recordId, line = line.split(b"\t", 1)
+                if self.recordIndex:
+                    self.writeChanged(recordId.decode("utf-8"), line)
+                    continue
+            self.writeEncoded(line)
+
+    def flush(self):
+        if self.batch:
+            batch = b"".join(self.batch)
+            self.batch = []
+            self.batchSize = 0
+            self.submit(self.outputFile.write, batch)
+        if self.flushInterval:
+            self.submit(self.outputFile.flush)
+        self.lastFlush = time.time()
+
+    def rollOver(self):
+        self.flush()
+        self.submit(self.outputFile.close)
+        self.openNext()
+
+    def close(self):
+        try:
+            if self.recordIndex:
+                for changedLine in self.recordIndex.release():
+                    self.writeEncoded(changedLine)
+            self.flush()
+            self.submit(self.outputFile.close)
+        finally:
+            if self.writeQueue:
+                self.writeQueue.put(None)
+                self.writeThread.join()
+                self.writeQueue = None
+        self.checkBackground()
+
+    def submit(self, fileFunction, *args):
+        """run a file operation here, or on the background thread if compressing
+        or streaming"""
+        self.checkBackground()
+        if self.writeQueue:
+            queueDepth = self.writeQueue.qsize()
+            self.queuedWrites += 1
+            self.queueDepthTotal += queueDepth
+            self.queueMaxDepth = max(self.queueMaxDepth, queueDepth)
+            if queueDepth >= self.queueDepth:
+                self.queueStalls += 1
+            startTime = time.perf_counter()
+            self.writeQueue.put((fileFunction, args))
+            self.queueWaitSeconds += time.perf_counter() - startTime
+        else:
+            self.timedWrite(fileFunction, args)
+
+    def timedWrite(self, fileFunction, args):
+        startTime = time.perf_counter()
+        fileFunction(*args)
+        self.writeSeconds += time.perf_counter() - startTime
+
+    def checkBackground(self):
+        if self.backgroundError:
+            backgroundError, self.backgroundError = self.backgroundError, None
+            raise IOError(backgroundError)
+
+    def backgroundWrite(self):
+        while True:
+            queueItem = self.writeQueue.get()
+            if queueItem is None:
+                break
+            if self.backgroundError:  # --keep draining so the mapper can't block
+                continue
+            fileFunction, args = queueItem
+            try:
+                self.timedWrite(fileFunction, args)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                self.backgroundError = err  # --raised on the mapping thread
+
+    def manifest(self):
+        return [x.manifestEntry() for x in self.outputFiles]
+
+
+# ----------------------------------------
+def outputCompression(fileName, compression):
+    """the compression flag wins, otherwise the file extension decides"""
+    if compression:
+        return None if compression == "none" else compression
+    if fileName.endswith(".gz"):
+        return "gzip"
+    if fileName.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+# ----------------------------------------
+def isStreamOutput(fileName):
+    """stdout (-) or a named pipe, read by something else as it is written"""
+    if fileName == "-":
+        return True
+    return os.path.exists(fileName) and stat.S_ISFIFO(os.stat(fileName).st_mode)
+
+
+# ----------------------------------------
+def writeManifest(fileName, outputFiles):
+    """lists each output file with its record count and checksum"""
+    manifestName = manifestFileName(fileName)
+    manifestData = {
+        "records": sum(x["records"] for x in outputFiles),
+        "files": outputFiles,
+    }
+    with open(manifestName, "w", encoding="utf-8") as manifestFile:
+        json.dump(manifestData, manifestFile, indent=4)
+    return manifestName
+
+
+# ----------------------------------------
+class MappingCheckpoint:
+    """restart points for a single process run into one uncompressed file
+
+    Checkpoints are only taken between node_ids, once the output is on disk.
+    Each records the table and node_id to carry on from, how much output is
+    complete and the statistics so far. mappedNodeIds isn't kept, it is rebuilt
+    from the staging database on resume (see resumedNodeCounts). The file is
+    written under a temporary name and renamed so it is never half written.
+    """
+
+    checkpointVersion = 1
+
+    def __init__(self, fileName, interval, options):
+        self.fileName = fileName
+        self.interval = interval
+        self.options = options
+        self.sources = None
+        self.enabled = True
+        self.lastSave = time.time()
+
+    def isDue(self):
+        return (
+            self.enabled
+            and self.interval
+            and time.time() - self.lastSave >= self.interval
+        )
+
+    def save(self, tableName, nextNodeId, outputWriter):
+        """nextNodeId is the first node_id not yet mapped, None for the start of
+        the table"""
+        if not self.enabled:
+            return
+        if nextNodeId is not None and not isinstance(nextNodeId, int):
+            return  # --only whole number node_ids can be resumed from
+        checkpointData = {
+            "version": self.checkpointVersion,
+            "options": self.options,
+            "sources": self.sources,
+            "table": tableName,
+            "next_node_id": nextNodeId,
+            "output_bytes": outputWriter.byteCount,
+            "output_records": outputWriter.recordCount,
+            "mapping_stats": mappingStats.snapshot(),
+            "base_stats": baseLibrary.statPack,
+            "name_cache": nameCache.statPack(),
+        }
+        tempName = self.fileName + ".tmp"
+        try:
+            outputWriter.flush()
+            outputWriter.submit(outputWriter.outputFile.sync)
+            with open(tempName, "w", encoding="utf-8") as checkpointFile:
+                json.dump(checkpointData, checkpointFile)
+            os.replace(tempName, self.fileName)
+        except IOError as err:
+            print("")
+            print("Could not write checkpoint %s, carrying on without" % self.fileName)
+            print(" %s" % err)
+            print("")
+            self.enabled = False
+        self.lastSave = time.time()
+
+    def load(self):
+        """the saved checkpoint, if it was taken with the same options"""
+        with open(self.fileName, "r", encoding="utf-8") as checkpointFile:
+            checkpointData = json.load(checkpointFile)
+        if checkpointData.get("version") != self.checkpointVersion:
+            raise ValueError("it is from another version of this mapper")
+        for optionName, optionValue in self.options.items():
+            if checkpointData["options"].get(optionName) != optionValue:
+                raise ValueError(
+                    "it was taken with %s %s"
+                    % (optionName, checkpointData["options"].get(optionName))
                 )
-                sql += "left join %s i on i.node_id = a.node_id_end " % (
-                    fileDict["nodeDatabase"] + "_address",
+        return checkpointData
+
+    def remove(self):
+        if os.path.exists(self.fileName):
+            os.remove(self.fileName)
+
+
+# ----------------------------------------
+class RecordHashIndex:
+    """content hashes of the mapped records keyed by RECORD_ID, kept in sqlite
+    so a delta run never holds either release's output in memory
+
+    Records are queued and hashed a batch at a time. Each batch is written to a
+    new hash database, under a temporary name until close(), and joined to the
+    previous release's hash database, if there is one, to tell which records
+    were added, changed or are unchanged. Whatever is left over in the previous
+    release at the end was deleted.
+    """
+
+    batchSize = 10000
+
+    def __init__(self, fileName, serializerName, previousName=None):
+        self.fileName = fileName
+        self.tempName = fileName + ".tmp"
+        if os.path.exists(self.tempName):
+            os.remove(self.tempName)
+        self.conn = sqlite3.connect(self.tempName)
+        try:
+            self.conn.execute("pragma journal_mode = off")
+            self.conn.execute("pragma synchronous = off")
+            self.conn.execute("create table hash_info (serializer text)")
+            self.conn.execute("insert into hash_info values (?)", (serializerName,))
+            self.conn.execute(
+                "create table record_hashes (record_id text primary key, record_hash blob) without rowid"
+            )
+            self.conn.execute(
+                "create temp table pending_hashes (record_id text, record_hash blob)"
+            )
+            if previousName:
+                self.conn.execute("attach database ? as previous", (previousName,))
+                previousRow = self.conn.execute(
+                    "select serializer from previous.hash_info"
+                ).fetchone()
+                if previousRow and previousRow[0] != serializerName:
+                    raise ValueError(
+                        "%s was hashed from %s output, use -S %s to compare with it"
+                        % (previousName, previousRow[0], previousRow[0])
+                    )
+        except (ValueError, sqlite3.DatabaseError):
+            self.abort()
+            raise
+        self.hasPrevious = bool(previousName)
+        self.pending = []
+        self.counts = {"ADDED": 0, "CHANGED": 0, "UNCHANGED": 0, "DELETED": 0}
+
+    def add(self, recordId, line):
+        """queue a record, once the batch is full returns the lines to write"""
+        self.pending.append((recordId, line))
+        if len(self.pending) < self.batchSize:
+            return []
+        return self.release()
+
+    def release(self):
+        """hash the queued records and return the lines of those that were added
+        or changed, in the order they were queued"""
+        pending, self.pending = self.pending, []
+        if not pending:
+            return []
+        self.conn.executemany(
+            "insert into temp.pending_hashes values (?, ?)",
+            [(x[0], hashlib.blake2b(x[1], digest_size=16).digest()) for x in pending],
+        )
+        previousMatches = {}
+        if self.hasPrevious:
+            previousMatches = dict(
+                self.conn.execute(
+                    "select a.record_id, a.record_hash = b.record_hash "
+                    "from temp.pending_hashes a "
+                    "join previous.record_hashes b on b.record_id = a.record_id"
                 )
-                conn.cursor().execute(sql)
+            )
+        self.conn.execute(
+            "insert or replace into record_hashes select * from temp.pending_hashes"
+        )
+        self.conn.execute("delete from temp.pending_hashes")
+
+        changedLines = []
+        for recordId, line in pending:
+            isUnchanged = previousMatches.get(recordId)
+            if isUnchanged:
+                self.counts["UNCHANGED"] += 1
+                continue
+            self.counts["ADDED" if isUnchanged is None else "CHANGED"] += 1
+            changedLines.append(line)
+        return changedLines
+
+    def deletedIds(self):
+        """the previous release's records that were not seen in this one, call
+        once everything has been released"""
+        if not self.hasPrevious:
+            return
+        dbCursor = self.conn.cursor().execute(
+            "select record_id from previous.record_hashes where record_id not in "
+            "(select record_id from main.record_hashes) order by record_id"
+        )
+        for dbRow in dbCursor:
+            self.counts["DELETED"] += 1
+            yield dbRow[0]
+
+    def close(self):
+        self.release()
+        self.conn.commit()
+        self.conn.close()
+        os.replace(self.tempName, self.fileName)
+
+    def abort(self):
+        self.conn.close()
+        os.remove(self.tempName)
 
 
 # ----------------------------------------
-def processTable(fileDict):
+def openOutputFile(fileName):
+    """read back a previous run's output file, compressed or not"""
+    compression = outputCompression(fileName, None)
+    if compression == "gzip":
+        return gzip.open(fileName, "rb")
+    if compression == "zstd":
+        if not zstandard:
+            raise IOError("zstandard is not installed (pip3 install zstandard)")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(open(fileName, "rb"))
+        )
+    return open(fileName, "rb")
 
-    nodeDatabase = fileDict["nodeDatabase"]
-    nodeType = fileDict["nodeType"].upper()
-    tableName = fileDict["tableName"]
 
-    # --these aren't entities
-    if nodeType == "EDGES":
-        return 0
-    if nodeType == "ADDRESS" and not include_address_nodes:
-        return 0
+# ----------------------------------------
+def hashOutputFile(outputName, hashDbName, serializer, serializerName):
+    """build a hash database from a previous run's output file or manifest,
+    re-encoding each record with this run's serializer so the hashes compare"""
+    fileNames = [outputName]
+    if outputName.endswith(".manifest.json"):
+        with open(outputName, "r", encoding="utf-8") as manifestFile:
+            manifestData = json.load(manifestFile)
+        fileNames = [
+            os.path.join(os.path.dirname(outputName), x["file"])
+            for x in manifestData["files"]
+        ]
+    loadJson = orjson.loads if orjson else json.loads
+    hashIndex = RecordHashIndex(hashDbName, serializerName)
+    try:
+        for fileName in fileNames:
+            with openOutputFile(fileName) as fileHandle:
+                for line in fileHandle:
+                    if line.strip():
+                        jsonData = loadJson(line)
+                        hashIndex.add(jsonData["RECORD_ID"], serializer(jsonData))
+    except Exception:
+        hashIndex.abort()
+        raise
+    hashIndex.close()
+    return hashIndex.counts["ADDED"]
 
-    print("")
-    print("processing %s ..." % tableName)
 
-    # --process the records
-    dbObj = conn.cursor()
-    dbCursor = dbObj.execute("select * from " + tableName)
-    dbHeader = [col[0] for col in dbObj.description]
-    dbRow = dbCursor.fetchone()
-    rowCount = 0
-    while dbRow:
-        rowCount += 1
-        nodeRecord = dict(zip(dbHeader, dbRow))
-        jsonData = node2Json(nodeRecord, nodeDatabase, nodeType)
-        msg = json.dumps(jsonData)
+# ----------------------------------------
+def baseVariantsFingerprint():
+    """a saved name cache is only valid for the variants it was classified with"""
+    try:
+        fileStat = os.stat(baseVariantsFile)
+    except OSError:
+        return None
+    return "%s:%s" % (fileStat.st_size, int(fileStat.st_mtime))
+
+
+# ----------------------------------------
+def csv2db():
+    """load database, reusing any tables whose csv file hasn't changed"""
+    createManifest()
+    createExcludedTable()
+
+    # --rows are filtered as they are loaded, so other filters mean a reload
+    filterManifest = getManifestEntry("icij_filter")
+    if (filterManifest["file_hash"] if filterManifest else "") != filterSignature():
+        for fileDict in inputFiles:
+            dropManifestEntry(fileDict["tableName"])
+        updateManifest("icij_filter", None, filterSignature())
+    nodesReloaded = False
+
+    # --decide which tables to reuse before loading the others all at once
+    reusedFiles = {}
+    reloadFiles = []
+    locateInputFiles()
+    for fileDict in inputFiles:
+        tableName = fileDict["tableName"]
+
+        # note: in dec 2020, ICIJ released the Pandora Papers and went to a single database - 1 set of csv files for all
+        #  the _start and _end fields in the edges table used to refer to the node_id in the node tables
+        #  now they refer to the _id field in the node tables
+
+        # note: in may 2022, ICIJ released new data and changed format again
+        # Now all edges contain the sourceID value related to the project they belong to.
+        # We removed the _id columns, and kept only node_id columns to link between nodes and relationships.
+        # Example to merge Officers and Entities nodes:
+        # nodes-officers.csv node_id column <-> relationships.csv node_id_start column <-> relationships.csv node_id_end column <-> nodes-entities.csv node_id column
+
+        checkStartTime = time.time()
+        fileHash = stagedFileHash(tableName, fileDict["fileName"])
+        if fileHash and ingestFilter and fileDict["nodeType"] == "edges":
+            fileHash = None if nodesReloaded else fileHash  # --kept node_ids changed
+        if fileHash:
+            print("reusing %s for %s" % (tableName, fileDict["fileName"]))
+            reusedFiles[tableName] = (None, fileHash, 0, time.time() - checkStartTime)
+        else:
+            dropManifestEntry(tableName)
+            if fileDict["nodeType"] != "edges":
+                nodesReloaded = True
+            reloadFiles.append(fileDict)
+
+    # --only as many processes as there are files to load share the budget
+    loadWorkers = min(loadWorkerCount, len(reloadFiles))
+    mappingProcessCount = None
+    if memoryBudget and reloadFiles:
+        mappingProcessCount = memoryBudget.share(
+            loadWorkers + 1 if loadWorkers > 1 else 1
+        )
+        memoryBudget.configure(conn)
+    if loadWorkers > 1:
+        loadResults = loadCsvFilesInParallel(reloadFiles, loadWorkers)
+    else:
+        loadResults = {}
+        for fileDict in reloadFiles:
+            loadStartTime = time.time()
+            print("loading %s ..." % fileDict["fileName"])
+            rowCount, fileHash, filteredCount = loadCsvFile(
+                fileDict["fileName"], fileDict["tableName"], fileDict["nodeType"]
+            )
+            loadResults[fileDict["tableName"]] = (
+                rowCount,
+                fileHash,
+                filteredCount,
+                time.time() - loadStartTime,
+            )
+            printLoadResult(loadResults[fileDict["tableName"]], peakRssMB())
+    if mappingProcessCount:
+        memoryBudget.share(mappingProcessCount)
+        memoryBudget.configure(conn)
+    sourceHashes = []
+    for fileDict in inputFiles:
+        tableName = fileDict["tableName"]
+        rowCount, fileHash, _, loadSeconds = (
+            reusedFiles.get(tableName) or loadResults[tableName]
+        )
+        if tableName not in reusedFiles:
+            updateManifest(tableName, fileDict["fileName"], fileHash)
+        perfStats.addLoad(tableName, fileDict["fileName"], rowCount, loadSeconds)
+        sourceHashes.append(fileHash)
+
+    # --indexes are cheaper to build once all the rows are in
+    indexStartTime = time.time()
+    for fileDict in inputFiles:
+        if fileDict["nodeType"] != "edges":
+            conn.cursor().execute(
+                "create index if not exists ix_%s on %s (node_id)"
+                % (fileDict["tableName"], fileDict["tableName"])
+            )
+    conn.cursor().execute(
+        "create index if not exists ix_icij_excluded on icij_excluded (node_id)"
+    )
+    perfStats.addPhase("node_id indexes", time.time() - indexStartTime)
+
+    # --resolve every node_id to a type and description once, up front, unless
+    # --they were already resolved from these exact files and filters
+    sourcesHash = lookupSourcesHash(sourceHashes)
+    for nodeDatabase in sorted({x["nodeDatabase"] for x in inputFiles}):
+        for tableName, createFunction in [
+            (nodeDatabase + "_node_directory", createNodeDirectory),
+            (nodeDatabase + "_edges_resolved", createResolvedEdges),
+        ]:
+            manifestRow = getManifestEntry(tableName)
+            if manifestRow and manifestRow["file_hash"] == sourcesHash:
+                print("reusing %s" % tableName)
+                continue
+            createStartTime = time.time()
+            dropManifestEntry(tableName)
+            createFunction(nodeDatabase)
+            updateManifest(tableName, None, sourcesHash)
+            perfStats.addPhase(tableName, time.time() - createStartTime)
+
+
+# ----------------------------------------
+def lookupSourcesHash(fileHashes):
+    """what the node directory and resolved edges were built from: the staged
+    csv files, how the lookup tables are built and the filters"""
+    sourceHashes = list(fileHashes) + ["lookup tables %s" % lookupTablesVersion]
+    if ingestFilter:
+        sourceHashes += [filterSignature(), ingestFilter["excluded_links"]]
+    return hashlib.sha256("|".join(sourceHashes).encode()).hexdigest()
+
+
+# ----------------------------------------
+def locateInputFiles():
+    """point each fileDict at its csv file in the input directory or zip file"""
+    zipMembers = {}
+    if inputZip:
+        for zipInfo in inputZip.infolist():
+            if not zipInfo.is_dir():
+                zipMembers.setdefault(
+                    os.path.basename(zipInfo.filename), zipInfo.filename
+                )
+    for fileDict in inputFiles:
+        if inputZip:  # --members may sit in a folder inside the zip
+            if fileDict["fileName"] not in zipMembers:
+                print("")
+                print("Could not find %s in %s" % (fileDict["fileName"], inputPath))
+                print("")
+                sys.exit(1)
+            fileDict["fileName"] = zipMembers[fileDict["fileName"]]
+        else:
+            fileDict["fileName"] = (
+                inputPath
+                + (os.path.sep if inputPath[-1:] != os.path.sep else "")
+                + fileDict["fileName"]
+            )
+
+
+# ----------------------------------------
+def createManifest():
+    """the manifest records what each staging table was built from"""
+    conn.cursor().execute(
+        "create table if not exists staging_manifest ("
+        " table_name text primary key,"
+        " file_name text,"
+        " file_size integer,"
+        " file_mtime real,"
+        " file_hash text,"
+        " schema_version integer)"
+    )
+    conn.commit()
+
+
+# ----------------------------------------
+def getManifestEntry(tableName):
+    dbObj = conn.cursor()
+    dbCursor = dbObj.execute(
+        "select * from staging_manifest where table_name = ? and schema_version = ?",
+        (tableName, stagingSchemaVersion),
+    )
+    dbRow = dbCursor.fetchone()
+    if not dbRow:
+        return None
+    return dict(zip([col[0] for col in dbObj.description], dbRow))
+
+
+# ----------------------------------------
+def updateManifest(tableName, fileName, fileHash):
+    fileSize, fileMtime = None, None
+    if fileName:
+        fileSize, fileMtime = statInputFile(fileName)
+    conn.cursor().execute(
+        "insert or replace into staging_manifest values (?, ?, ?, ?, ?, ?)",
+        (tableName, fileName, fileSize, fileMtime, fileHash, stagingSchemaVersion),
+    )
+    conn.commit()
+
+
+# ----------------------------------------
+def dropManifestEntry(tableName):
+    conn.cursor().execute(
+        "delete from staging_manifest where table_name = ?", (tableName,)
+    )
+    conn.commit()
+
+
+# ----------------------------------------
+def createExcludedTable():
+    """node_ids left out by --sources/--node_types, with just enough to resolve
+    the relationships that point at them"""
+    conn.cursor().execute(
+        "create table if not exists icij_excluded (node_id integer, node_type text, node_desc text)"
+    )
+    conn.commit()
+
+
+# ----------------------------------------
+def filterSignature():
+    """what the staged rows were filtered on, empty when nothing was"""
+    if not ingestFilter:
+        return ""
+    return json.dumps(
+        {
+            "sources": ingestFilter["sources"],
+            "node_types": ingestFilter["node_types"],
+        },
+        sort_keys=True,
+    )
+
+
+# ----------------------------------------
+def nodeRowFilter(csvHeader, nodeType):
+    """returns a function telling whether a node csv row is kept, or None to
+    keep them all"""
+    if not ingestFilter:
+        return None
+    if ingestFilter["node_types"] and nodeType not in ingestFilter["node_types"]:
+        return lambda csvRow: False
+    sources = ingestFilter["sources"]
+    if not sources or "sourceID" not in csvHeader:
+        return None
+    sourceIndex = csvHeader.index("sourceID")
+
+    # --a source matches the start of a sourceID, so Paradise Papers takes in
+    # --every Paradise Papers - ... part of it
+    def isKept(csvRow):
+        sourceId = csvRow[sourceIndex].lower()
+        return any(sourceId.startswith(x) for x in sources)
+
+    return isKept
+
+
+# ----------------------------------------
+def edgeRowFilter(csvHeader, nodeConn):
+    """returns a function keeping the edges with at least one endpoint staged on
+    nodeConn, or None to keep them all"""
+    if not ingestFilter:
+        return None
+    keptNodeIds = set()
+    for fileDict in inputFiles:
+        if fileDict["nodeType"] != "edges":
+            keptNodeIds.update(
+                str(x[0])
+                for x in nodeConn.cursor().execute(
+                    "select node_id from %s" % fileDict["tableName"]
+                )
+            )
+    startIndex = csvHeader.index("node_id_start")
+    endIndex = csvHeader.index("node_id_end")
+    return lambda csvRow: (
+        csvRow[startIndex] in keptNodeIds or csvRow[endIndex] in keptNodeIds
+    )
+
+
+# ----------------------------------------
+def stagedFileHash(tableName, fileName):
+    """return the file's hash if its staged table can be reused, otherwise None"""
+    manifestRow = getManifestEntry(tableName)
+    if not manifestRow:
+        return None
+    try:
+        fileSize, fileMtime = statInputFile(fileName)
+    except (OSError, KeyError):
+        return None
+    if fileSize != manifestRow["file_size"]:
+        return None
+    if fileMtime == manifestRow["file_mtime"]:
+        return manifestRow["file_hash"]
+
+    # --same size but touched, only a content change means a reload
+    with openInputFile(fileName) as hashFile:
+        fileHash = hashlib.sha256()
+        for chunk in iter(lambda: hashFile.read(1048576), b""):
+            fileHash.update(chunk)
+    if fileHash.hexdigest() != manifestRow["file_hash"]:
+        return None
+    updateManifest(tableName, fileName, manifestRow["file_hash"])
+    return manifestRow["file_hash"]
+
+
+# ----------------------------------------
+def statInputFile(fileName):
+    """size and modified time of a csv file or of a member of the release zip"""
+    if inputZip:
+        zipInfo = inputZip.getinfo(fileName)
+        return zipInfo.file_size, time.mktime(zipInfo.date_time + (0, 0, -1))
+    fileStat = os.stat(fileName)
+    return fileStat.st_size, fileStat.st_mtime
+
+
+# ----------------------------------------
+def inputCsvBytes():
+    """total size of the csv files to be read, as they are before locating them"""
+    csvNames = {x["fileName"] for x in inputFiles}
+    if inputZip:
+        return sum(
+            x.file_size
+            for x in inputZip.infolist()
+            if os.path.basename(x.filename) in csvNames
+        )
+    return sum(
+        os.path.getsize(os.path.join(inputPath, x))
+        for x in csvNames
+        if os.path.exists(os.path.join(inputPath, x))
+    )
+
+
+# ----------------------------------------
+def openInputFile(fileName):
+    """binary stream of a csv file, zip members are decompressed as they are read"""
+    if inputZip:
+        return inputZip.open(fileName)
+    return open(fileName, "rb")
+
+
+# ----------------------------------------
+def stagedTableStates():
+    """whether csv2db would reuse or reload each table of the staging database
+    on conn, and reuse or rebuild the lookup tables, short of hashing a touched
+    file"""
+    filterManifest = getManifestEntry("icij_filter")
+    filtersChanged = (
+        filterManifest["file_hash"] if filterManifest else ""
+    ) != filterSignature()
+    nodesReloaded = False
+    tableStates = []
+    for fileDict in inputFiles:
+        tableState = "reload"
+        manifestRow = None
+        if not filtersChanged:
+            manifestRow = getManifestEntry(fileDict["tableName"])
+        try:
+            fileSize, fileMtime = statInputFile(fileDict["fileName"])
+        except (OSError, KeyError):
+            manifestRow = None
+        if manifestRow and fileSize == manifestRow["file_size"]:
+            tableState = "reuse"
+            if fileMtime != manifestRow["file_mtime"]:
+                tableState = "reuse if its contents are unchanged"
+        if fileDict["nodeType"] == "edges":
+            if ingestFilter and nodesReloaded:
+                tableState = "reload"
+        elif tableState == "reload":
+            nodesReloaded = True
+        tableStates.append((fileDict["tableName"], tableState))
+
+    # --the lookup tables are rebuilt unless every csv file's table is reused
+    # --and they were built from those same tables and filters
+    fileStates = [x[1] for x in tableStates]
+    sourcesHash = None
+    if "reload" not in fileStates:
+        sourcesHash = lookupSourcesHash(
+            getManifestEntry(x["tableName"])["file_hash"] for x in inputFiles
+        )
+    for nodeDatabase in sorted({x["nodeDatabase"] for x in inputFiles}):
+        for tableName in [
+            nodeDatabase + "_node_directory",
+            nodeDatabase + "_edges_resolved",
+        ]:
+            manifestRow = getManifestEntry(tableName)
+            tableState = "rebuild"
+            if sourcesHash and manifestRow and manifestRow["file_hash"] == sourcesHash:
+                tableState = "reuse"
+                if "reuse if its contents are unchanged" in fileStates:
+                    tableState = "reuse if the csv contents are unchanged"
+            tableStates.append((tableName, tableState))
+    return tableStates
+
+
+# ----------------------------------------
+def checkRun():
+    """confirm the csv files, the output location and what the staging database
+    would reuse without loading, mapping or writing anything, returns whether a
+    run could start"""
+    global conn
+    import pathlib  # pylint: disable=import-outside-toplevel
+
+    problems = []
+    print("")
+    print("input %s" % inputPath)
+    locateInputFiles()
+    for fileDict in inputFiles:
+        try:
+            fileSize = statInputFile(fileDict["fileName"])[0]
+            with openInputFile(fileDict["fileName"]) as csvHandle:
+                csvHeader = next(
+                    csv.reader(
+                        io.TextIOWrapper(csvHandle, encoding="utf-8-sig", newline="")
+                    ),
+                    [],
+                )
+        except (OSError, KeyError, ValueError, csv.Error) as err:
+            problems.append("%s could not be read: %s" % (fileDict["fileName"], err))
+            continue
+        print(" %s, %s MB" % (fileDict["fileName"], round(fileSize / 1048576, 1)))
+        idColumns = ["node_id"]
+        if fileDict["nodeType"] == "edges":
+            idColumns = ["node_id_start", "node_id_end"]
+        for columnName in idColumns:
+            if columnName not in csvHeader:
+                problems.append(
+                    "%s has no %s column" % (fileDict["fileName"], columnName)
+                )
+
+    print("")
+    print("output %s" % outputFileName)
+    if outputFileName == "-":
+        print(" written to stdout")
+    elif streamOutput:
+        print(" a named pipe, the run will wait for a reader")
+    else:
+        outputDir = os.path.dirname(os.path.abspath(outputFileName))
+        if not os.access(outputDir, os.W_OK):
+            problems.append("%s is not a writable directory" % outputDir)
+        elif os.path.exists(outputFileName):
+            if not os.access(outputFileName, os.W_OK):
+                problems.append("%s is not writable" % outputFileName)
+            elif checkpointData:
+                print(" resumed after %s records" % checkpointData["output_records"])
+            else:
+                print(" exists and will be replaced")
+
+    # --the same decisions csv2db makes
+    if engineName == "sqlite":
+        stagingName = os.path.join(workDir, "icij2.db")
+        print("")
+        print("staging database %s" % stagingName)
+        if not os.access(workDir, os.W_OK):
+            problems.append("%s is not a writable directory" % workDir)
+        if rebuildDatabase or not os.path.exists(stagingName):
+            print(
+                " will be %s from every csv file"
+                % ("rebuilt" if os.path.exists(stagingName) else "created")
+            )
+        else:
+            conn = sqlite3.connect(
+                pathlib.Path(os.path.abspath(stagingName)).as_uri() + "?mode=ro",
+                uri=True,
+            )
+            try:
+                for tableName, tableState in stagedTableStates():
+                    print(" %s: %s" % (tableName, tableState))
+            except sqlite3.DatabaseError as err:
+                print(" unreadable, will be rebuilt (%s)" % err)
+            finally:
+                conn.close()
+                conn = None
+
+    baseMapperSpec = importlib.util.find_spec("base_mapper")
+    if baseMapperSpec:
+        print("")
+        print("base_mapper %s" % baseMapperSpec.origin)
+    else:
+        problems.append(
+            "base_mapper was not found, please export PYTHONPATH=$PYTHONPATH:<path to mapper-base project>"
+        )
+
+    print("")
+    if problems:
+        print("Not ready to run")
+        for problem in problems:
+            print(" %s" % problem)
+        print("")
+        return False
+    print("Ready to run")
+    print("")
+    return True
+
+
+# ----------------------------------------
+def loadCsvFile(fileName, tableName, nodeType, nodeConn=None):
+    """stream a csv file into a new table in chunks so memory stays flat, returns
+    the row count, the hash of the file's contents and how many rows the
+    filters left out, node rows left out are listed in icij_excluded and edges
+    are filtered on the node tables of nodeConn, conn when not given"""
+    dbObj = conn.cursor()
+    rowCount = 0
+    filteredCount = 0
+    hashReader = HashingReader(openInputFile(fileName))
+    with io.TextIOWrapper(hashReader, encoding="utf-8-sig", newline="") as csvFile:
+        csvReader = csv.reader(csvFile, quotechar='"')
+        csvHeader = next(csvReader)
+        columnCount = len(csvHeader)
+
+        columnList = []
+        for columnName in csvHeader:
+            columnList.append(
+                '"%s" %s'
+                % (columnName, "integer" if columnName in integerColumns else "text")
+            )
+        dbObj.execute("drop table if exists %s" % tableName)
+        dbObj.execute("create table %s (%s)" % (tableName, ", ".join(columnList)))
+        insertSql = "insert into %s values (%s)" % (
+            tableName,
+            ", ".join(["?"] * columnCount),
+        )
+
+        idIndex, descIndexes = None, []
+        if nodeType == "edges":
+            rowFilter = edgeRowFilter(csvHeader, nodeConn or conn)
+        else:
+            rowFilter = nodeRowFilter(csvHeader, nodeType)
+            dbObj.execute("delete from icij_excluded where node_type = ?", (nodeType,))
+            idIndex = csvHeader.index("node_id")
+            descIndexes = [
+                csvHeader.index(x)
+                for x in (["name", "address"] if nodeType == "address" else ["name"])
+                if x in csvHeader
+            ]
+        excludeSql = "insert into icij_excluded values (?, ?, ?)"
+
+        chunkRows = loadChunkSize
+        rowChunk = []
+        excludedChunk = []
+        for csvRow in csvReader:
+            if not csvRow:  # --skip blank lines
+                continue
+            if len(csvRow) != columnCount:
+                csvRow = (csvRow + [""] * columnCount)[0:columnCount]
+            if rowFilter and not rowFilter(csvRow):
+                filteredCount += 1
+                if nodeType != "edges":
+                    nodeDesc = next(
+                        (csvRow[x] for x in descIndexes if csvRow[x] not in nullValues),
+                        None,
+                    )
+                    nodeId = None if csvRow[idIndex] in nullValues else csvRow[idIndex]
+                    excludedChunk.append((nodeId, nodeType, nodeDesc))
+                    if len(excludedChunk) >= chunkRows:
+                        dbObj.executemany(excludeSql, excludedChunk)
+                        excludedChunk = []
+                continue
+            rowChunk.append([None if x in nullValues else x for x in csvRow])
+
+            # --under a memory budget the chunk is sized from the first rows
+            if memoryBudget and rowCount == 0 and len(rowChunk) == 1000:
+                chunkRows = memoryBudget.chunkRows(rowChunk)
+            if len(rowChunk) >= chunkRows:
+                dbObj.executemany(insertSql, rowChunk)
+                rowCount += len(rowChunk)
+                rowChunk = []
+        if rowChunk:
+            dbObj.executemany(insertSql, rowChunk)
+            rowCount += len(rowChunk)
+        if excludedChunk:
+            dbObj.executemany(excludeSql, excludedChunk)
+    conn.commit()
+    return rowCount, hashReader.hexdigest(), filteredCount
+
+
+# ----------------------------------------
+def printLoadResult(loadResult, peakRss):
+    rowCount, _, filteredCount, loadSeconds = loadResult
+    print(
+        " %s rows loaded%s in %s seconds, peak rss %s MB"
+        % (
+            rowCount,
+            ", %s filtered out" % filteredCount if ingestFilter else "",
+            round(loadSeconds, 1),
+            peakRss,
+        )
+    )
+
+
+# ----------------------------------------
+def loadCsvFilesInParallel(reloadFiles, workerCount):
+    """load each csv file into a database of its own in a pool of worker
+    processes and merge them into the staging database as they finish, a
+    filtered relationships file waits for the node tables it is filtered on"""
+    import multiprocessing  # pylint: disable=import-outside-toplevel
+
+    partNames = {
+        x["tableName"]: "%s.%s.db" % (os.path.splitext(dbname)[0], x["tableName"])
+        for x in reloadFiles
+    }
+    fileDicts = {x["tableName"]: x for x in reloadFiles}
+
+    # --the largest files go first so the longest load starts right away, a
+    # --filtered relationships file is only loaded once the node tables are
+    # --merged so its worker can leave out the edges it would drop
+    loadTasks = [
+        (x, partNames[x["tableName"]], dbname)
+        for x in sorted(reloadFiles, key=lambda x: -statInputFile(x["fileName"])[0])
+    ]
+    taskBatches = [loadTasks]
+    if ingestFilter and any(x["nodeType"] != "edges" for x in reloadFiles):
+        taskBatches = [
+            [x for x in loadTasks if x[0]["nodeType"] != "edges"],
+            [x for x in loadTasks if x[0]["nodeType"] == "edges"],
+        ]
+    print(
+        "loading %s csv files with %s worker processes ..."
+        % (len(loadTasks), workerCount)
+    )
+    loadResults = {}
+    try:
+        with multiprocessing.Pool(
+            workerCount, initLoadWorker, (inputPath, ingestFilter, memoryBudget)
+        ) as workerPool:
+            for taskBatch in taskBatches:
+                for tableName, loadResult, workerRss in workerPool.imap_unordered(
+                    loadCsvPart, taskBatch
+                ):
+                    fileDict = fileDicts[tableName]
+                    loadResults[tableName] = mergeStagedPart(
+                        fileDict, partNames[tableName], loadResult
+                    )
+                    print("loaded %s" % fileDict["fileName"])
+                    printLoadResult(loadResults[tableName], workerRss)
+    finally:
+        for partDbName in partNames.values():  # --left behind by a failed load
+            if os.path.exists(partDbName):
+                os.remove(partDbName)
+    return loadResults
+
+
+# ----------------------------------------
+def initLoadWorker(workerInputPath, workerIngestFilter, workerMemoryBudget):
+    """each load worker reads the input on its own, a zip file handle can't be
+    shared between processes"""
+    global inputZip, ingestFilter, memoryBudget, conn
+    import zipfile  # pylint: disable=import-outside-toplevel
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # --the parent handles interrupts
+    csv.field_size_limit(2**31 - 1)
+    inputZip = None
+    if os.path.isfile(workerInputPath):
+        inputZip = zipfile.ZipFile(workerInputPath)
+    ingestFilter = workerIngestFilter
+    memoryBudget = workerMemoryBudget
+    conn = None
+
+
+# ----------------------------------------
+def loadCsvPart(loadTask):
+    """worker task: load one csv file into a database of its own, relationships
+    are filtered on the node tables of the staging database"""
+    global conn
+    fileDict, partDbName, stagingDbName = loadTask
+    loadStartTime = time.time()
+    if os.path.exists(partDbName):
+        os.remove(partDbName)
+    conn = sqlite3.connect(partDbName)
+    nodeConn = None
+    try:
+        conn.execute("pragma journal_mode = off")
+        conn.execute("pragma synchronous = off")
+        if memoryBudget:
+            memoryBudget.configure(conn)
+        createExcludedTable()
+
+        # --the node tables are merged by now, they are only read from here
+        if fileDict["nodeType"] == "edges" and ingestFilter:
+            nodeConn = sqlite3.connect(stagingDbName)
+        rowCount, fileHash, filteredCount = loadCsvFile(
+            fileDict["fileName"],
+            fileDict["tableName"],
+            fileDict["nodeType"],
+            nodeConn,
+        )
+    finally:
+        if nodeConn:
+            nodeConn.close()
+        conn.close()
+    return (
+        fileDict["tableName"],
+        (rowCount, fileHash, filteredCount, time.time() - loadStartTime),
+        peakRssMB(),
+    )
+
+
+# ----------------------------------------
+def mergeStagedPart(fileDict, partDbName, loadResult):
+    """copy a table a worker loaded into the staging database, returns the load
+    result with the merge included"""
+    rowCount, fileHash, filteredCount, loadSeconds = loadResult
+    mergeStartTime = time.time()
+    tableName = fileDict["tableName"]
+    dbObj = conn.cursor()
+    dbObj.execute("attach database ? as staged_part", (partDbName,))
+    createSql = dbObj.execute(
+        "select sql from staged_part.sqlite_master where type = 'table' and name = ?",
+        (tableName,),
+    ).fetchone()[0]
+    dbObj.execute("drop table if exists main.%s" % tableName)
+    dbObj.execute(createSql)
+
+    # --a plain insert select copies the rows without decoding them
+    insertSql = "insert into main.%s select * from staged_part.%s" % (
+        tableName,
+        tableName,
+    )
+    dbObj.execute(insertSql)
+    if fileDict["nodeType"] != "edges":
+        dbObj.execute(
+            "delete from main.icij_excluded where node_type = ?",
+            (fileDict["nodeType"],),
+        )
+        dbObj.execute(
+            "insert into main.icij_excluded select * from staged_part.icij_excluded"
+        )
+    conn.commit()
+    dbObj.execute("detach database staged_part")
+    os.remove(partDbName)
+    return rowCount, fileHash, filteredCount, loadSeconds + time.time() - mergeStartTime
+
+
+# ----------------------------------------
+def currentRssMB():
+    """resident memory of this process now, where /proc tells it"""
+    try:
+        with open("/proc/self/statm", "rb") as statmFile:
+            residentPages = int(statmFile.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(residentPages * os.sysconf("SC_PAGE_SIZE") / 1048576, 1)
+
+
+# ----------------------------------------
+def peakRssMB(ofChildren=False):
+    """peak resident memory of this process so far, or of its largest child"""
+    # --the rusage peak carries over the peak of the process that started this
+    # --one, /proc tells this process's own where it can
+    if not ofChildren:
+        try:
+            with open("/proc/self/status", "rb") as statusFile:
+                for statusLine in statusFile:
+                    if statusLine.startswith(b"VmHWM:"):
+                        return round(int(statusLine.split()[1]) / 1024, 1)
+        except (OSError, ValueError, IndexError):
+            pass
+    if not resource:
+        return None
+    maxRss = resource.getrusage(
+        resource.RUSAGE_CHILDREN if ofChildren else resource.RUSAGE_SELF
+    ).ru_maxrss
+    if sys.platform == "darwin":  # --reported in bytes rather than kilobytes
+        maxRss = maxRss / 1024
+    return round(maxRss / 1024, 1)
+
+
+# ----------------------------------------
+def createNodeDirectory(nodeDatabase):
+    """build the node_id -> type/description lookup used to resolve edge endpoints"""
+    directoryTable = nodeDatabase + "_node_directory"
+    print("creating %s ..." % directoryTable)
+    dbObj = conn.cursor()
+    dbObj.execute("drop table if exists %s" % directoryTable)
+    dbObj.execute(
+        "create table %s (node_id integer, node_type text, node_desc text)"
+        % directoryTable
+    )
+
+    # --a node_id found in more than one node file resolves to the first type in
+    # --nodeTypePrecedence, so each type only adds the node_ids not already there.
+    # --Blank node_ids are left out, a null in the list makes every not in null.
+    # --Filtered out nodes still resolve when their relationships are kept, left
+    # --dangling they resolve without the name or address to map from them
+    excludedDesc = None
+    if ingestFilter and ingestFilter["excluded_links"] != "drop":
+        excludedDesc = (
+            "node_desc" if ingestFilter["excluded_links"] == "keep" else "null"
+        )
+    for nodeType in nodeTypePrecedence:
+        tableName = nodeDatabase + "_" + nodeType
+        if not any(x["tableName"] == tableName for x in inputFiles):
+            continue
+        if nodeType == "address":  # --address nodes sometimes only have an address
+            nodeDesc = "case when name is null then address else name end"
+        else:
+            nodeDesc = "name"
+        sql = "insert into %s " % directoryTable
+        sql += "select node_id, '%s', %s from %s " % (nodeType, nodeDesc, tableName)
+        sql += "where node_id is not null "
+        sql += "and node_id not in (select node_id from %s)" % directoryTable
+        dbObj.execute(sql)
+        if excludedDesc:
+            sql = "insert into %s " % directoryTable
+            sql += "select node_id, node_type, %s from icij_excluded " % excludedDesc
+            sql += "where node_type = ? and node_id is not null "
+            sql += "and node_id not in (select node_id from %s)" % directoryTable
+            dbObj.execute(sql, (nodeType,))
+    dbObj.execute(
+        "create index ix_%s on %s (node_id, node_type, node_desc)"
+        % (directoryTable, directoryTable)
+    )
+    conn.commit()
+
+
+# ----------------------------------------
+def createResolvedEdges(nodeDatabase):
+    """materialize the edges with both endpoints resolved, keyed on node_id_start"""
+    edgesTable = nodeDatabase + "_edges"
+    resolvedTable = nodeDatabase + "_edges_resolved"
+    directoryTable = nodeDatabase + "_node_directory"
+    print("creating %s ..." % resolvedTable)
+    dbObj = conn.cursor()
+    dbObj.execute("drop table if exists %s" % resolvedTable)
+    sql = "create table %s as " % resolvedTable
+    sql += "select "
+    sql += " a.node_id_start, "
+    sql += " b.node_id as node1_id, "
+    sql += " b.node_type as node1_type, "
+    sql += " b.node_desc as node1_desc, "
+    sql += " a.rel_type, "
+    sql += " a.link, "
+    sql += " a.node_id_end, "
+    sql += " c.node_id as node2_id, "
+    sql += " c.node_type as node2_type, "
+    sql += " c.node_desc as node2_desc, "
+    sql += " a.start_date, "
+    sql += " a.end_date "
+    if ingestFilter and ingestFilter["excluded_links"] == "dangling":
+        sql += ", c.node_desc is null and exists (select 1 from icij_excluded x "
+        sql += " where x.node_id = c.node_id) as node2_dangling "
+    sql += "from %s a " % edgesTable
+    sql += "left join %s b on b.node_id = a.node_id_start " % directoryTable
+    sql += "left join %s c on c.node_id = a.node_id_end " % directoryTable
+    if ingestFilter and ingestFilter["excluded_links"] == "drop":
+        sql += "where c.node_id is not null "
+        sql += " or a.node_id_end not in (select node_id from icij_excluded where node_id is not null) "
+    sql += "order by a.node_id_start, a.rowid"
+    dbObj.execute(sql)
+    dbObj.execute(
+        "create index ix_%s on %s (node_id_start)" % (resolvedTable, resolvedTable)
+    )
+    conn.commit()
+
+
+# ----------------------------------------
+def isMappable(fileDict):
+    """edges aren't entities and address nodes are optional"""
+    if fileDict["nodeType"] == "edges":
+        return False
+    if fileDict["nodeType"] == "address" and not include_address_nodes:
+        return False
+    return True
+
+
+# ----------------------------------------
+def processTable(fileDict, nodeRange=None):
+
+    tableName = fileDict["tableName"]
+
+    # --these aren't entities
+    if not isMappable(fileDict):
+        return 0
+
+    print("")
+    print("processing %s ..." % tableName)
+    if nodeRange:
+        print(" resuming from node_id %s" % nodeRange[0])
+
+    _, mappedToEnd = mapNodeRows(fileDict, outputWriter, outputFileName, nodeRange)
+
+    # --return error if not complete
+    return not mappedToEnd
+
+
+# ----------------------------------------
+def rangeClause(columnName, nodeRange):
+    """sql condition limiting a node_id column to a [low, high) range"""
+    if not nodeRange:
+        return "1 = 1"
+    lowId, highId = nodeRange
+    conditions = []
+    if lowId is not None:
+        conditions.append("%s >= %s" % (columnName, lowId))
+    if highId is not None:
+        conditions.append("%s < %s" % (columnName, highId))
+    if lowId is None:  # --nulls sort first so belong to the first range
+        return "(%s is null or %s)" % (
+            columnName,
+            " and ".join(conditions or ["1 = 1"]),
+        )
+    return " and ".join(conditions)
+
+
+# ----------------------------------------
+def readNodeEdges(edgeCursor, edgeRow, edgeStartIndex, nodeId):
+    """advance the node_id ordered edge stream past nodeId, returns its edge
+    rows and the next edge row"""
+    edgeRows = []
+    while edgeRow and edgeRow[edgeStartIndex] < nodeId:
+        edgeRow = edgeCursor.fetchone()
+    while edgeRow and edgeRow[edgeStartIndex] == nodeId:
+        if edgeRows is not None:
+            edgeRows.append(edgeRow)
+
+            # --under a memory budget a node with more edges than it allows
+            # --has None here and them read again from the database when mapped
+            if memoryBudget and len(edgeRows) > memoryBudget.edgeRowLimit:
+                edgeRows = None
+        edgeRow = edgeCursor.fetchone()
+    return edgeRows, edgeRow
+
+
+# ----------------------------------------
+def mapNodeRows(fileDict, outputWriter, outputName, nodeRange=None, showProgress=True):
+    """map a node table, or a node_id range of it, writing json lines to
+    outputWriter, returns the rows mapped and whether it got to the end"""
+    global shutDown
+
+    nodeDatabase = fileDict["nodeDatabase"]
+    nodeType = fileDict["nodeType"].upper()
+    tableName = fileDict["tableName"]
+    tableStartTime = time.time()
+
+    # --process the records in node_id order so their edges can be merged in
+    dbObj = conn.cursor()
+    dbCursor = dbObj.execute(
+        "select * from %s where %s order by node_id, rowid"
+        % (tableName, rangeClause("node_id", nodeRange))
+    )
+    dbHeader = [col[0] for col in dbObj.description]
+    dbRow = dbCursor.fetchone()
+
+    # --stream the edges of this table's nodes once, in the same node_id order,
+    # --rather than querying the edges view separately for every node
+    edgeObj = conn.cursor()
+    edgeSql = f"select * from {nodeDatabase}_edges_resolved "
+    edgeSql += f"where node_id_start in (select node_id from {tableName} "
+    edgeSql += f"where {rangeClause('node_id', nodeRange)}) "
+    edgeSql += "order by node_id_start, rowid"
+    edgeCursor = edgeObj.execute(edgeSql)
+    edgeHeader = [col[0] for col in edgeObj.description]
+    edgeStartIndex = edgeHeader.index("node_id_start")
+    edgeRow = edgeCursor.fetchone()
+    edgeNodeId = None
+    edgeRows = []
+
+    rowCount = 0
+    while dbRow:
+        nodeRecord = dict(zip(dbHeader, dbRow))
+
+        # --advance the edge stream to this node (duplicate node rows reuse it)
+        nodeId = nodeRecord["node_id"]
+        if nodeId != edgeNodeId or rowCount == 0:
+
+            # --an interrupt stops between node_ids, where a checkpoint can be taken
+            if checkpoint and (shutDown or checkpoint.isDue()):
+                checkpoint.save(tableName, nodeId, outputWriter)
+            if shutDown:
+                break
+
+            lookupStartTime = time.perf_counter_ns()
+            edgeNodeId = nodeId
+            edgeRows = []
+            if nodeId is not None:
+                edgeRows, edgeRow = readNodeEdges(
+                    edgeCursor, edgeRow, edgeStartIndex, nodeId
+                )
+            perfStats.addEdgeLookup(time.perf_counter_ns() - lookupStartTime)
+        rowCount += 1
+
+        # --each edge becomes a dict only as node2Json gets to it, a node with
+        # --many thousands of edges would otherwise hold them all twice
+        nodeEdgeRows = edgeRows
+        if nodeEdgeRows is None:
+            nodeEdgeRows = conn.cursor().execute(
+                f"select * from {nodeDatabase}_edges_resolved where node_id_start = ? order by rowid",
+                (nodeId,),
+            )
+        edgeList = (dict(zip(edgeHeader, row)) for row in nodeEdgeRows)
+
+        jsonData = node2Json(nodeRecord, nodeDatabase, nodeType, edgeList)
+
+        try:
+            outputWriter.write(jsonData)
+        except IOError as err:
+            print("")
+            print("Could not write to %s" % outputName)
+            print(" %s" % err)
+            print("")
+            shutDown = True
+            if checkpoint:  # --the output is no longer consistent
+                checkpoint.enabled = False
+            break
+
+        dbRow = dbCursor.fetchone()
+        if memoryBudget and rowCount % progressInterval == 0:
+            memoryBudget.check(conn)
+        if showProgress and (rowCount % progressInterval == 0 or not dbRow):
+            print(
+                " %s %s written%s"
+                % (rowCount, tableName, ", complete!" if not dbRow else "")
+            )
+
+    perfStats.addTable(tableName, rowCount, time.time() - tableStartTime)
+    return rowCount, not dbRow
+
+
+# ----------------------------------------
+def inRange(nodeId, nodeRange):
+    """python side of rangeClause()"""
+    lowId, highId = nodeRange
+    if nodeId is None:
+        return lowId is None
+    return (lowId is None or nodeId >= lowId) and (highId is None or nodeId < highId)
+
+
+# ----------------------------------------
+def planNodeRanges(fileDict, rangeCount):
+    """split a node table into node_id ranges of about the same number of rows,
+    never splitting the rows of one node_id across ranges"""
+    tableName = fileDict["tableName"]
+    dbObj = conn.cursor()
+    rowCount = dbObj.execute("select count(*) from %s" % tableName).fetchone()[0]
+    boundaries = []
+    for i in range(1, rangeCount):
+        dbRow = dbObj.execute(
+            "select node_id from %s where node_id is not null "
+            "order by node_id limit 1 offset %s"
+            % (tableName, (rowCount * i) // rangeCount)
+        ).fetchone()
+        if dbRow and (not boundaries or dbRow[0] > boundaries[-1]):
+            boundaries.append(dbRow[0])
+    lowIds = [None] + boundaries
+    highIds = boundaries + [None]
+    return list(zip(lowIds, highIds))
+
+
+# ----------------------------------------
+def priorNodeCounts(fileDict):
+    """(node_id, count) rows of how many times this table's node_ids were
+    already mapped from the tables before it, so a worker can continue the
+    duplicate node suffixes, a node_id can be in more than one row"""
+    priorTables = []
+    priorTypes = []
+    for priorDict in inputFiles:
+        if priorDict is fileDict:
+            break
+        if isMappable(priorDict):
+            priorTables.append(priorDict["tableName"])
+            priorTypes.append(priorDict["nodeType"])
+    if not priorTables:
+        return
+    sql = "select node_id, count(*) from ("
+    sql += " union all ".join("select node_id from %s" % x for x in priorTables)
+    sql += ") where node_id in (select node_id from %s)" % fileDict["tableName"]
+    # --a missing node_id is mapped as None, so those repeat each other too
+    sql += " or (node_id is null and exists"
+    sql += " (select 1 from %s where node_id is null))" % fileDict["tableName"]
+    sql += " group by node_id"
+    yield from conn.cursor().execute(sql)
+    yield from excludedNodeCounts(priorTypes, [fileDict["tableName"]])
+
+
+# ----------------------------------------
+def excludedNodeCounts(nodeTypes, tableNames):
+    """(node_id, count) rows of how many rows of these node types the filters
+    left out for each node_id in these tables, a full run would have mapped them
+    first and numbered the duplicate node suffixes on from them"""
+    if not ingestFilter or not nodeTypes or not tableNames:
+        return []
+    tableIds = " union all ".join("select node_id from %s" % x for x in tableNames)
+    sql = "select node_id, count(*) from icij_excluded "
+    sql += "where node_type in (%s) " % ", ".join(["?"] * len(nodeTypes))
+    sql += "and (node_id in (%s) " % tableIds
+    sql += (
+        "or (node_id is null and exists (select 1 from (%s) where node_id is null))) "
+        % tableIds
+    )
+    sql += "group by node_id"
+    return conn.cursor().execute(sql, nodeTypes)
+
+
+# ----------------------------------------
+def laterMappableTables(fileDict):
+    """the tables mapped after this one"""
+    laterTables = []
+    isLater = False
+    for laterDict in inputFiles:
+        if isLater and isMappable(laterDict):
+            laterTables.append(laterDict["tableName"])
+        isLater = isLater or laterDict is fileDict
+    return laterTables
+
+
+# ----------------------------------------
+def resumedNodeCounts(fileDict, nextNodeId):
+    """mappedNodeIds as it stood at a checkpoint: (node_id, count) rows of how
+    many times each node_id was mapped by the tables before this one and by
+    this one up to nextNodeId"""
+    mappedRows = []
+    priorTypes = []
+    for priorDict in inputFiles:
+        if priorDict is fileDict:
+            break
+        if isMappable(priorDict):
+            mappedRows.append("select node_id from %s" % priorDict["tableName"])
+            priorTypes.append(priorDict["nodeType"])
+    if nextNodeId is not None:
+        mappedRows.append(
+            "select node_id from %s where node_id is null or node_id < %s"
+            % (fileDict["tableName"], nextNodeId)
+        )
+    if not mappedRows:
+        return
+    sql = "select node_id, count(*) from ("
+    sql += " union all ".join(mappedRows)
+    sql += ") group by node_id"
+    yield from conn.cursor().execute(sql)
+
+    # --the rows left out of the tables before are counted for this table and
+    # --the ones after it, which the main loop would otherwise have added
+    yield from excludedNodeCounts(
+        priorTypes, [fileDict["tableName"]] + laterMappableTables(fileDict)
+    )
+
+
+# ----------------------------------------
+# --a pool initializer takes its arguments positionally, one per global a worker needs
+def initMappingWorker(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    workerDbName,
+    workerIncludeAddressNodes,
+    workerStatsLevel,
+    workerNameCache,
+    workerSerializerName,
+    workerShardOutput,
+    workerCompressionName,
+    workerKeyedLines,
+    workerMemoryBudget,
+):
+    """each worker process gets its own database connection, statistics and a
+    copy of the prewarmed name cache"""
+    global conn, include_address_nodes, shutDown, progressInterval, mappingStats
+    global nameCache, serializerName, shardOutput, compressionName, keyedLines
+    global perfStats, checkpoint, memoryBudget
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # --the parent handles interrupts
+    loadBaseLibrary()  # --already there unless the workers are spawned
+    conn = sqlite3.connect(workerDbName)
+    memoryBudget = workerMemoryBudget
+    if memoryBudget:
+        memoryBudget.configure(conn)
+    include_address_nodes = workerIncludeAddressNodes
+    mappingStats = MappingStats(workerStatsLevel)
+    perfStats = PerformanceStats()
+    checkpoint = None
+    nameCache = workerNameCache
+    nameCache.keepNewNames = True
+    serializerName = workerSerializerName
+    shardOutput = workerShardOutput
+    compressionName = workerCompressionName
+    keyedLines = workerKeyedLines
+    shutDown = False
+    progressInterval = 10000
+
+
+# ----------------------------------------
+def mapNodeRange(mappingTask):
+    """worker task: map one node_id range of a table into its own shard file"""
+    global mappingStats, perfStats, mappedNodeIds, shutDown
+    fileDict, nodeRange, priorCounts, shardName = mappingTask
+
+    # --the duplicate node suffixes continue from the counts of earlier tables
+    mappingStats = MappingStats(mappingStats.statsLevel)
+    perfStats = PerformanceStats()
+    mappedNodeIds = NodeIdTracker(priorCounts)
+    baseLibrary.statPack = {}
+
+    # --kept shards get the output's compression, parts to be merged don't
+    rowCount = 0
+    shardWriter = None
+    try:
+        shardWriter = OutputWriter(
+            shardName,
+            getSerializer(serializerName),
+            compressionName if shardOutput else None,
+            keyedLines=keyedLines,
+        )
+        rowCount, _ = mapNodeRows(
+            fileDict, shardWriter, shardName, nodeRange, showProgress=False
+        )
+        shardWriter.close()
+        perfStats.addWriter(shardWriter, not shardOutput)
+    except IOError as err:
+        print("")
+        print("Could not write output file %s" % shardName)
+        print(" %s" % err)
+        print("")
+        shutDown = True
+    return {
+        "rowCount": rowCount,
+        "outputFiles": shardWriter.manifest() if shardWriter else [],
+        "mappingStats": mappingStats,
+        "perfStats": perfStats,
+        "baseStats": baseLibrary.statPack,
+        "nameCache": nameCache.drain(),
+        "shutDown": shutDown,
+    }
+
+
+# ----------------------------------------
+def splitFileName(fileName):
+    """root and extension, keeping a compression extension with the one before it"""
+    compressionExt = ""
+    for fileExt in (".gz", ".zst"):
+        if fileName.endswith(fileExt):
+            fileName, compressionExt = fileName[0 : -len(fileExt)], fileExt
+    fileRoot, fileExt = os.path.splitext(fileName)
+    return fileRoot, fileExt + compressionExt
+
+
+# ----------------------------------------
+def shardFileName(fileName, shardNumber):
+    """numbered file name, icij.json.gz becomes icij-00001.json.gz"""
+    fileRoot, fileExt = splitFileName(fileName)
+    return "%s-%05d%s" % (fileRoot, shardNumber, fileExt)
+
+
+# ----------------------------------------
+def manifestFileName(fileName):
+    """icij.json.gz is described by icij.manifest.json"""
+    return splitFileName(fileName)[0] + ".manifest.json"
+
+
+# ----------------------------------------
+def checkpointFileName(fileName):
+    """icij.json is checkpointed in icij.checkpoint.json"""
+    return splitFileName(fileName)[0] + ".checkpoint.json"
+
+
+# ----------------------------------------
+def hashFileName(fileName):
+    """icij.json.gz keeps its record hashes in icij.hashes.db"""
+    return splitFileName(fileName)[0] + ".hashes.db"
+
+
+# ----------------------------------------
+def deleteFileName(fileName):
+    """icij.json.gz lists the records to delete in icij.deletes.json.gz"""
+    fileRoot, fileExt = splitFileName(fileName)
+    return fileRoot + ".deletes" + fileExt
+
+
+# ----------------------------------------
+def processTablesInParallel(workerCount):
+    """map the node tables in node_id ranges across a pool of worker processes,
+    then merge the shards (or keep them) in table and node_id order"""
+    global shutDown
+    import multiprocessing  # pylint: disable=import-outside-toplevel
+
+    mappingTasks = []
+    for fileDict in inputFiles:
+        if not isMappable(fileDict):
+            continue
+        nodeRanges = planNodeRanges(fileDict, workerCount * 4)
+        rangeCounts = [[] for _ in nodeRanges]
+        for nodeId, mappedCount in priorNodeCounts(fileDict):
+            for rangeNumber, nodeRange in enumerate(nodeRanges):
+                if inRange(nodeId, nodeRange):
+                    rangeCounts[rangeNumber].append((nodeId, mappedCount))
+                    break
+        for nodeRange, priorCounts in zip(nodeRanges, rangeCounts):
+            shardName = (
+                shardFileName(outputFileName, len(mappingTasks) + 1)
+                if shardOutput
+                else "%s.part%05d"
+                % (splitFileName(outputFileName)[0], len(mappingTasks) + 1)
+            )
+            mappingTasks.append((fileDict, nodeRange, priorCounts, shardName))
+
+    print("")
+    print(
+        "mapping %s node_id ranges with %s worker processes ..."
+        % (len(mappingTasks), workerCount)
+    )
+    tableCounts = {}
+    with multiprocessing.Pool(
+        workerCount,
+        initMappingWorker,
+        (
+            dbname,
+            include_address_nodes,
+            mappingStats.statsLevel,
+            nameCache,
+            serializerName,
+            shardOutput,
+            compressionName,
+            recordIndex is not None,
+            memoryBudget,
+        ),
+    ) as workerPool:
+        taskResults = workerPool.imap(mapNodeRange, mappingTasks)
+        for taskNumber, taskResult in enumerate(taskResults):
+            mappingTask = mappingTasks[taskNumber]
+            fileDict, nodeRange, priorCounts, shardName = mappingTask
+            rowCount = taskResult["rowCount"]
+            mappingStats.merge(taskResult["mappingStats"])
+            perfStats.merge(taskResult["perfStats"])
+            mergeStats(baseLibrary.statPack, taskResult["baseStats"])
+            nameCache.merge(taskResult["nameCache"])
+            if shardOutput:  # --merged parts are gone by the end
+                shardManifest.extend(taskResult["outputFiles"])
+            if taskResult["shutDown"]:
+                shutDown = True
+
+            # --append the shard to the merged output in task order
+            if not shardOutput:
+                try:
+                    with open(shardName, "rb") as shardHandle:
+                        outputWriter.writeLines(shardHandle, recordIndex is not None)
+                    os.remove(shardName)
+                except IOError as err:
+                    print("")
+                    print("Could not write to %s" % outputFileName)
+                    print(" %s" % err)
+                    print("")
+                    shutDown = True
+
+            tableName = fileDict["tableName"]
+            tableCounts[tableName] = tableCounts.get(tableName, 0) + rowCount
+            tableComplete = (
+                taskNumber + 1 == len(mappingTasks)
+                or mappingTasks[taskNumber + 1][0] is not fileDict
+            )
+            print(
+                " %s %s written%s"
+                % (
+                    tableCounts[tableName],
+                    tableName,
+                    ", complete!" if tableComplete else "",
+                )
+            )
+            if shutDown:
+                workerPool.terminate()
+                break
+
+    return shutDown
+
+
+# ----------------------------------------
+def mergeStats(targetStats, sourceStats):
+    """fold one worker's base library statistics into another's: counts add up
+    and example lists are topped up to 5 distinct values"""
+    for statKey, sourceValue in sourceStats.items():
+        targetValue = targetStats.get(statKey)
+        if isinstance(sourceValue, dict):
+            if not isinstance(targetValue, dict):
+                targetValue = targetStats[statKey] = {}
+            mergeStats(targetValue, sourceValue)
+        elif isinstance(sourceValue, list):
+            if not isinstance(targetValue, list):
+                targetValue = targetStats[statKey] = []
+            for example in sourceValue:
+                if len(targetValue) < 5 and example not in targetValue:
+                    targetValue.append(example)
+        elif isinstance(sourceValue, (int, float)) and not isinstance(
+            sourceValue, bool
+        ):
+            targetStats[statKey] = (targetValue or 0) + sourceValue
+        else:
+            targetStats[statKey] = sourceValue
+
+
+# ----------------------------------------
+def readCsvFrame(fileName, columnNames):
+    """the wanted columns of a csv file as strings, with the same nulls and
+    integer node_ids as the staging database"""
+    import pandas  # pylint: disable=import-outside-toplevel
+
+    with openInputFile(fileName) as csvHandle:
+        csvFrame = pandas.read_csv(
+            csvHandle,
+            dtype=str,
+            encoding="utf-8-sig",
+            keep_default_na=False,
+            na_values=sorted(nullValues),
+            usecols=lambda x: x in columnNames,
+        )
+    for columnName in integerColumns.intersection(csvFrame.columns):
+        csvFrame[columnName] = pandas.to_numeric(csvFrame[columnName]).astype("Int64")
+    return csvFrame
+
+
+# ----------------------------------------
+def columnValues(csvFrame, columnName):
+    """a column as a list of python values, None for nulls"""
+    column = csvFrame[columnName]
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+# ----------------------------------------
+def nodeDescColumn(nodeFrame, nodeType):
+    """what an edge shows of the node it points to, as in createNodeDirectory"""
+    if nodeType == "address":  # --address nodes sometimes only have an address
+        return nodeFrame["name"].where(nodeFrame["name"].notna(), nodeFrame["address"])
+    return nodeFrame["name"]
+
+
+# ----------------------------------------
+def loadColumnarTables():
+    """the columnar engine's equivalent of csv2db: reads the csv files into
+    pandas frames, filters them and resolves every edge with joins against a
+    node_id -> type/description frame, no staging database involved"""
+    import pandas  # pylint: disable=import-outside-toplevel
+
+    locateInputFiles()
+    nodeFrames = {}
+    excludedFrames = []
+    edgeFrame = None
+    for fileDict in inputFiles:
+        loadStartTime = time.time()
+        print("reading %s ..." % fileDict["fileName"])
+        nodeType = fileDict["nodeType"]
+        if nodeType == "edges":
+            edgeFrame = readCsvFrame(fileDict["fileName"], columnarEdgeColumns)
+            rowCount = len(edgeFrame)
+        else:
+            nodeFrame = readCsvFrame(fileDict["fileName"], columnarNodeColumns)
+            for columnName in ("name", "address"):  # --as nodeRecord.get(x, "")
+                if columnName not in nodeFrame:
+                    nodeFrame[columnName] = ""
+            nodeFrame["node_desc"] = nodeDescColumn(nodeFrame, nodeType)
+
+            # --rows the filters leave out only keep what resolves an edge to them
+            if ingestFilter:
+                if (
+                    ingestFilter["node_types"]
+                    and nodeType not in ingestFilter["node_types"]
+                ):
+                    isKept = pandas.Series(False, index=nodeFrame.index)
+                elif ingestFilter["sources"] and "sourceID" in nodeFrame:
+                    isKept = (
+                        nodeFrame["sourceID"]
+                        .str.lower()
+                        .str.startswith(tuple(ingestFilter["sources"]))
+                        .fillna(False)
+                        .astype(bool)
+                    )
+                else:
+                    isKept = pandas.Series(True, index=nodeFrame.index)
+                excludedFrames.append(
+                    nodeFrame.loc[~isKept, ["node_id", "node_desc"]].assign(
+                        node_type=nodeType
+                    )
+                )
+                nodeFrame = nodeFrame[isKept]
+            nodeFrames[fileDict["tableName"]] = nodeFrame
+            rowCount = len(nodeFrame)
+        print(
+            " %s rows read in %s seconds, peak rss %s MB"
+            % (rowCount, round(time.time() - loadStartTime, 1), peakRssMB())
+        )
+        perfStats.addLoad(
+            fileDict["tableName"],
+            fileDict["fileName"],
+            rowCount,
+            time.time() - loadStartTime,
+        )
+    excludedFrame = pandas.concat(
+        excludedFrames
+        or [pandas.DataFrame({"node_id": pandas.Series([], dtype="Int64")})],
+        ignore_index=True,
+    )
+
+    # --edges are kept when at least one of their nodes was
+    if ingestFilter:
+        keptNodeIds = pandas.concat([x["node_id"] for x in nodeFrames.values()])
+        edgeFrame = edgeFrame[
+            edgeFrame["node_id_start"].isin(keptNodeIds)
+            | edgeFrame["node_id_end"].isin(keptNodeIds)
+        ]
+
+    # --a node_id found in more than one node file resolves to the first type in
+    # --nodeTypePrecedence, filtered out nodes resolve as --excluded_links says
+    resolveStartTime = time.time()
+    excludedLinks = ingestFilter["excluded_links"] if ingestFilter else None
+    directoryFrames = []
+    directoryIds = pandas.Series([], dtype="Int64")
+    for nodeType in nodeTypePrecedence:
+        typeFrames = []
+        for fileDict in inputFiles:
+            if fileDict["nodeType"] == nodeType:
+                typeFrames.append(
+                    nodeFrames[fileDict["tableName"]][["node_id", "node_desc"]]
+                )
+        if excludedLinks in ("keep", "dangling"):
+            typeFrame = excludedFrame[excludedFrame["node_type"] == nodeType]
+            typeFrame = typeFrame[["node_id", "node_desc"]]
+            if excludedLinks == "dangling":
+                typeFrame = typeFrame.assign(node_desc=None)
+            typeFrames.append(typeFrame)
+        for typeFrame in typeFrames:
+            typeFrame = typeFrame[
+                typeFrame["node_id"].notna() & ~typeFrame["node_id"].isin(directoryIds)
+            ]
+            directoryFrames.append(typeFrame.assign(node_type=nodeType))
+            directoryIds = pandas.concat([directoryIds, typeFrame["node_id"]])
+    directoryFrame = pandas.concat(directoryFrames, ignore_index=True)
+
+    # --like the staging engine's join on node_id_start, a node_id that is in the
+    # --directory more than once (repeated in its node file) repeats its edges,
+    # --then every edge takes the type and description of the node it points to
+    edgeFrame = edgeFrame.merge(
+        directoryFrame[["node_id"]].rename(columns={"node_id": "node1_id"}),
+        how="left",
+        left_on="node_id_start",
+        right_on="node1_id",
+    )
+    edgeFrame = edgeFrame.merge(
+        directoryFrame.rename(
+            columns={
+                "node_id": "node2_id",
+                "node_type": "node2_type",
+                "node_desc": "node2_desc",
+            }
+        ),
+        how="left",
+        left_on="node_id_end",
+        right_on="node2_id",
+    )
+    if excludedLinks == "drop":
+        edgeFrame = edgeFrame[
+            edgeFrame["node2_id"].notna()
+            | ~edgeFrame["node_id_end"].isin(excludedFrame["node_id"])
+        ]
+    edgeFrame = edgeFrame.sort_values("node_id_start", kind="stable")
+    perfStats.addPhase("resolving edges", time.time() - resolveStartTime)
+    print("%s edges resolved" % len(edgeFrame))
+
+    return {
+        "nodeFrames": nodeFrames,
+        "edgeColumns": mapEdgeColumns(edgeFrame, excludedFrame, excludedLinks),
+        "excludedFrame": excludedFrame,
+        "excludedCounts": (
+            excludedFrame.groupby("node_type").size().to_dict()
+            if len(excludedFrame)
+            else {}
+        ),
+    }
+
+
+# ----------------------------------------
+def mapEdgeColumns(edgeFrame, excludedFrame, excludedLinks):
+    """what node2Json takes from each edge, worked out a column at a time, with
+    the range of rows belonging to each node_id_start"""
+    import pandas  # pylint: disable=import-outside-toplevel
+
+    link = edgeFrame["link"]
+    isLong = link.str.len().fillna(0) > 50
+    mappedLink = link.str.slice(0, 50).where(
+        ~link.str.contains(";", regex=False).fillna(False), "MULTIPLE USE"
+    )
+    mappedLink = mappedLink.where(isLong, link)
+    addrType = (
+        mappedLink.str.upper()
+        .str.replace(" ADDRESS", "", regex=False)
+        .str.slice(0, 50)
+        .fillna("ADDRESS")
+    )
+    isDangling = pandas.Series(False, index=edgeFrame.index)
+    if excludedLinks == "dangling":
+        isDangling = edgeFrame["node2_desc"].isna() & edgeFrame["node2_id"].isin(
+            excludedFrame["node_id"]
+        )
+    node2Type = edgeFrame["node2_type"]
+    edgeColumns = {
+        "link": columnValues(edgeFrame.assign(x=mappedLink), "x"),
+        "longLink": columnValues(edgeFrame.assign(x=link.where(isLong)), "x"),
+        "isPointer": (node2Type.ne("address") | include_address_nodes).tolist(),
+        "node2_id": columnValues(edgeFrame, "node2_id"),
+        "start_date": columnValues(edgeFrame, "start_date"),
+        "end_date": columnValues(edgeFrame, "end_date"),
+        "hasAddress": (node2Type.eq("address").fillna(False) & ~isDangling).tolist(),
+        "addrType": addrType.tolist(),
+        "isBusiness": (
+            addrType.str.contains("REGISTERED", regex=False)
+            | addrType.str.contains("BUSINESS", regex=False)
+        ).tolist(),
+        "isGroup": (node2Type.eq("entity").fillna(False) & ~isDangling).tolist(),
+        "node2_desc": columnValues(edgeFrame, "node2_desc"),
+    }
+
+    # --the edges are sorted by node_id_start, so each node's are one slice
+    edgeRanges = {}
+    for rowIndex, startId in enumerate(columnValues(edgeFrame, "node_id_start")):
+        edgeRange = edgeRanges.get(startId)
+        if edgeRange:
+            edgeRange[1] = rowIndex + 1
+        else:
+            edgeRanges[startId] = [rowIndex, rowIndex + 1]
+    edgeColumns["ranges"] = edgeRanges
+    return edgeColumns
+
+
+# ----------------------------------------
+def mapColumnarTables(columnarTables):
+    """map the node frames loaded by loadColumnarTables in batches of rows,
+    returns the number of records written"""
+    import pandas  # pylint: disable=import-outside-toplevel
+
+    recordCount = 0
+    for fileDict in inputFiles:
+        if not isMappable(fileDict):
+            continue
+        tableName = fileDict["tableName"]
+        tableStartTime = time.time()
+        print("")
+        print("processing %s ..." % tableName)
+
+        # --in node_id order, as the sqlite engine maps them
+        nodeFrame = columnarTables["nodeFrames"][tableName].sort_values(
+            "node_id", kind="stable", na_position="first"
+        )
+        rowCount = 0
+        for batchStart in range(0, len(nodeFrame), loadChunkSize):
+            rowCount += mapColumnarBatch(
+                nodeFrame.iloc[batchStart : batchStart + loadChunkSize],
+                fileDict,
+                columnarTables["edgeColumns"],
+            )
+            if shutDown:
+                break
+            print(
+                " %s %s written%s"
+                % (
+                    rowCount,
+                    tableName,
+                    ", complete!" if rowCount == len(nodeFrame) else "",
+                )
+            )
+        perfStats.addTable(tableName, rowCount, time.time() - tableStartTime)
+        recordCount += rowCount
+        if shutDown:
+            break
+
+        # --as excludedNodeCounts does for the sqlite engine
+        laterTables = laterMappableTables(fileDict)
+        excludedFrame = columnarTables["excludedFrame"]
+        if laterTables and "node_type" in excludedFrame:
+            laterIds = pandas.concat(
+                [columnarTables["nodeFrames"][x]["node_id"] for x in laterTables]
+            )
+            excludedIds = excludedFrame.loc[
+                excludedFrame["node_type"] == fileDict["nodeType"], "node_id"
+            ]
+            excludedIds = excludedIds[
+                excludedIds.isin(laterIds)
+                | (excludedIds.isna() & laterIds.isna().any())
+            ]
+            for nodeId in columnValues(excludedIds.to_frame(), "node_id"):
+                mappedNodeIds.recordId(nodeId)
+    return recordCount
+
+
+# ----------------------------------------
+def mapColumnarBatch(nodeFrame, fileDict, edgeColumns):
+    """node2Json for a batch of rows: the scalar fields are worked out a column at
+    a time, then each record is put together with its edges' pointers,
+    addresses and group associations"""
+    global shutDown
+
+    nodeDatabase = fileDict["nodeDatabase"]
+    nodeType = fileDict["nodeType"].upper()
+    batchSize = len(nodeFrame)
+
+    def optionalColumn(columnName):
+        if columnName in nodeFrame:
+            return columnValues(nodeFrame, columnName)
+        return [None] * batchSize
+
+    nodeIds = columnValues(nodeFrame, "node_id")
+    names = columnValues(nodeFrame, "name")
+
+    # --not all officers are actually people, each distinct name is asked once
+    if nodeType == "OFFICER":
+        isCompany = {x: nameCache.isCompanyName(x) for x in dict.fromkeys(names)}
+        recordTypes = ["ORGANIZATION" if isCompany[x] else "PERSON" for x in names]
+    elif nodeType == "ADDRESS":
+        recordTypes = ["ADDRESS"] * batchSize
+    else:
+        recordTypes = ["ORGANIZATION"] * batchSize
+
+    # --address nodes sometimes have the address in the name field
+    address = nodeFrame["address"]
+    if nodeType == "ADDRESS":
+        address = address.where(
+            address.notna() | nodeFrame["name"].isna(), nodeFrame["name"]
+        )
+    addresses = columnValues(nodeFrame.assign(address=address), "address")
+
+    sources = (
+        columnValues(nodeFrame, "sourceID")
+        if "sourceID" in nodeFrame
+        else [nodeDatabase] * batchSize
+    )
+    jurisdictions = optionalColumn("jurisdiction")
+    countryCodes = (
+        nodeFrame["country_codes"].str.split(";")
+        if "country_codes" in nodeFrame
+        else None
+    )
+    countryLists = [
+        ([{"COUNTRY_OF_ASSOCIATION": x}] if x else [])
+        + ([{"COUNTRY_OF_ASSOCIATION": y} for y in z] if isinstance(z, list) else [])
+        for x, z in zip(
+            jurisdictions,
+            countryCodes.tolist() if countryCodes is not None else [None] * batchSize,
+        )
+    ]
+    scalarColumns = [
+        ("Status", optionalColumn("status")),
+        ("COMPANY_TYPE", optionalColumn("company_type")),
+        ("INCORPORATED", optionalColumn("incorporation_date")),
+        ("INACTIVATED", optionalColumn("inactivation_date")),
+        ("STRUCK_OFF", optionalColumn("struck_off_date")),
+        ("NOTES", optionalColumn("note")),
+    ]
+    scalarRows = list(zip(*[x[1] for x in scalarColumns]))
+    scalarKeys = [x[0] for x in scalarColumns]
+
+    edgeRanges = edgeColumns["ranges"]
+    links = edgeColumns["link"]
+    longLinks = edgeColumns["longLink"]
+    isPointer = edgeColumns["isPointer"]
+    node2Ids = edgeColumns["node2_id"]
+    startDates = edgeColumns["start_date"]
+    endDates = edgeColumns["end_date"]
+    hasAddress = edgeColumns["hasAddress"]
+    addrTypes = edgeColumns["addrType"]
+    isBusiness = edgeColumns["isBusiness"]
+    isGroup = edgeColumns["isGroup"]
+    node2Descs = edgeColumns["node2_desc"]
+    keepStats = mappingStats.statsLevel != "off"
+
+    rowCount = 0
+    for rowIndex in range(batchSize):
+        rowCount += 1
+        nodeId = nodeIds[rowIndex]
+        recordType = recordTypes[rowIndex]
+
+        # support for duplicate nodes
+        node_id = mappedNodeIds.recordId(nodeId)
+
+        jsonData = {"DATA_SOURCE": "ICIJ", "RECORD_ID": node_id}
+        jsonData["RECORD_TYPE"] = recordType
+        if recordType == "PERSON":
+            jsonData["PRIMARY_NAME_FULL"] = names[rowIndex]
+        elif recordType == "ORGANIZATION":
+            jsonData["PRIMARY_NAME_ORG"] = names[rowIndex]
+        jsonData["ICIJ_SOURCE"] = sources[rowIndex]
+        jsonData["NODE_TYPE"] = nodeType
+        if keepStats:
+            mappingStats.add("SOURCE", sources[rowIndex])
+            mappingStats.add("NODE_TYPE", nodeType)
+
+        if jurisdictions[rowIndex]:
+            jsonData["Jurisdiction"] = jurisdictions[rowIndex]
+        if countryLists[rowIndex]:
+            jsonData["COUNTRIES"] = countryLists[rowIndex]
+        for scalarKey, scalarValue in zip(scalarKeys, scalarRows[rowIndex]):
+            if scalarValue:
+                jsonData[scalarKey] = scalarValue
+
+        jsonData["REL_ANCHOR_DOMAIN"] = "ICIJ_ID"
+        jsonData["REL_ANCHOR_KEY"] = node_id
+
+        relPointerList = []
+        groupAssociationList = []
+        addressList = []
+        if addresses[rowIndex]:
+            addressList.append(
+                {
+                    "ADDR_TYPE": "PRIMARY" if recordType == "PERSON" else "BUSINESS",
+                    "ADDR_FULL": addresses[rowIndex],
+                }
+            )
+        edgeRange = edgeRanges.get(nodeId) if nodeId is not None else None
+        for edgeIndex in range(*edgeRange) if edgeRange else []:
+            if keepStats and longLinks[edgeIndex]:
+                mappingStats.add("TRUNCATED_LINKS", longLinks[edgeIndex])
+            if isPointer[edgeIndex]:
+                relPointerRecord = {
+                    "REL_POINTER_DOMAIN": "ICIJ_ID",
+                    "REL_POINTER_KEY": node2Ids[edgeIndex],
+                    "REL_POINTER_ROLE": links[edgeIndex],
+                }
+                if startDates[edgeIndex]:
+                    relPointerRecord["REL_POINTER_FROM_DATE"] = startDates[edgeIndex]
+                if endDates[edgeIndex]:
+                    relPointerRecord["REL_POINTER_THRU_DATE"] = endDates[edgeIndex]
+                relPointerList.append(relPointerRecord)
+            if hasAddress[edgeIndex]:
+                addressRecord = {
+                    "ADDR_TYPE": (
+                        "BUSINESS"
+                        if recordType == "ORGANIZATION" and isBusiness[edgeIndex]
+                        else addrTypes[edgeIndex]
+                    ),
+                    "ADDR_FULL": node2Descs[edgeIndex],
+                }
+                if addressRecord not in addressList:
+                    addressList.append(addressRecord)
+            if recordType == "PERSON" and isGroup[edgeIndex]:
+                groupAssociationRecord = {
+                    "GROUP_ASSOCIATION_ORG_NAME": node2Descs[edgeIndex]
+                }
+                if groupAssociationRecord not in groupAssociationList:
+                    groupAssociationList.append(groupAssociationRecord)
+
+        if addressList:
+            jsonData["ADDRESSES"] = addressList
+        if groupAssociationList:
+            jsonData["GROUP_ASSOCIATIONS"] = groupAssociationList
+        if relPointerList:
+            jsonData["RELATIONSHIPS"] = relPointerList
+        if keepStats:
+            mappingStats.addRecord(jsonData)
 
         try:
-            outputFileHandle.write(msg + "\n")
+            outputWriter.write(jsonData)
         except IOError as err:
             print("")
             print("Could not write to %s" % outputFileName)
             print(" %s" % err)
             print("")
-            global shutDown
             shutDown = True
-
-        if shutDown:
             break
-
-        dbRow = dbCursor.fetchone()
-        if rowCount % progressInterval == 0 or not dbRow:
-            print(
-                " %s %s written%s"
-                % (rowCount, tableName, ", complete!" if not dbRow else "")
-            )
-
-    # --return error if dd not complete
-    return shutDown
+    return rowCount
 
 
 # ----------------------------------------
-def node2Json(nodeRecord, nodeDatabase, nodeType):
-    """map node to json structure"""
+def node2Json(nodeRecord, nodeDatabase, nodeType, edgeList):
+    """map node and its outbound edges to json structure"""
 
     # support for duplicate nodes
     # they are the same real entity, just of a different type as in entity vs intermediary
-    node_id = str(nodeRecord["node_id"])
-    if node_id in node_cache:
-        node_cache[node_id] += 1
-        node_id = f"{node_id}-{node_cache[node_id]}"
-    else:
-        node_cache[node_id] = 0
+    node_id = mappedNodeIds.recordId(nodeRecord["node_id"])
 
     # --set the data source
     jsonData = {}
@@ -259,7 +3136,7 @@ def node2Json(nodeRecord, nodeDatabase, nodeType):
     node_source = nodeRecord.get("sourceID", nodeDatabase)
 
     # --not all officers are actually people!
-    if nodeType.upper() == "OFFICER" and not baseLibrary.isCompanyName(entityName):
+    if nodeType.upper() == "OFFICER" and not nameCache.isCompanyName(entityName):
         jsonData["RECORD_TYPE"] = "PERSON"
         jsonData["PRIMARY_NAME_FULL"] = entityName
     elif nodeType.upper() == "ADDRESS":
@@ -274,8 +3151,9 @@ def node2Json(nodeRecord, nodeDatabase, nodeType):
     jsonData["ICIJ_SOURCE"] = node_source
     jsonData["NODE_TYPE"] = nodeType
 
-    updateStat("SOURCE", node_source)
-    updateStat("NODE_TYPE", nodeType.upper())
+    if mappingStats.statsLevel != "off":
+        mappingStats.add("SOURCE", node_source)
+        mappingStats.add("NODE_TYPE", nodeType.upper())
 
     countryList = []
     if "jurisdiction" in nodeRecord and nodeRecord["jurisdiction"]:
@@ -319,17 +3197,12 @@ def node2Json(nodeRecord, nodeDatabase, nodeType):
         else:
             addressList.append({"ADDR_TYPE": "BUSINESS", "ADDR_FULL": entityAddress})
 
-    edgeObj = conn.cursor()
-    edgeSql = f"select * from {nodeDatabase}_edges_view where node_id_start = {nodeRecord['node_id']}"
-    edgeCursor = edgeObj.execute(edgeSql)
-    edgeHeader = [col[0] for col in edgeObj.description]
-    edgeRow = edgeCursor.fetchone()
-    while edgeRow:
-        edgeRecord = dict(zip(edgeHeader, edgeRow))
+    for edgeRecord in edgeList:
 
         if edgeRecord["link"]:  # --fix long usage types
             if len(edgeRecord["link"]) > 50:
-                updateStat("TRUNCATED_LINKS", edgeRecord["link"])
+                if mappingStats.statsLevel != "off":
+                    mappingStats.add("TRUNCATED_LINKS", edgeRecord["link"])
                 if ";" in edgeRecord["link"]:
                     edgeRecord["link"] = "MULTIPLE USE"
                 else:
@@ -347,8 +3220,10 @@ def node2Json(nodeRecord, nodeDatabase, nodeType):
                 relPointerRecord["REL_POINTER_THRU_DATE"] = edgeRecord["end_date"]
             relPointerList.append(relPointerRecord)
 
-        # --map the related node as an address if it is one
-        if edgeRecord["node2_type"] == "address":
+        # --map the related node as an address if it is one, a dangling one (filtered
+        # --out, see --excluded_links) has no address to map
+        isDangling = edgeRecord.get("node2_dangling")
+        if edgeRecord["node2_type"] == "address" and not isDangling:
             if edgeRecord["node2_desc"] not in addressList:
                 addrType = (
                     edgeRecord["link"].upper().replace(" ADDRESS", "")[0:50]
@@ -367,7 +3242,11 @@ def node2Json(nodeRecord, nodeDatabase, nodeType):
                     addressList.append(addressRecord)
 
         # --map the related node as a group name so can be used for matching if its an officer pointing to an entity
-        if jsonData["RECORD_TYPE"] == "PERSON" and edgeRecord["node2_type"] == "entity":
+        if (
+            jsonData["RECORD_TYPE"] == "PERSON"
+            and edgeRecord["node2_type"] == "entity"
+            and not isDangling
+        ):
             if edgeRecord["node2_type"] == "entity":  # --should always be true
                 groupAssociationRecord = {
                     "GROUP_ASSOCIATION_ORG_NAME": edgeRecord["node2_desc"]
@@ -375,8 +3254,6 @@ def node2Json(nodeRecord, nodeDatabase, nodeType):
                 if groupAssociationRecord not in groupAssociationList:
                     groupAssociationList.append(groupAssociationRecord)
 
-        edgeRow = edgeCursor.fetchone()
-
     if addressList:
         jsonData["ADDRESSES"] = addressList
 
@@ -386,14 +3263,8 @@ def node2Json(nodeRecord, nodeDatabase, nodeType):
     if relPointerList:
         jsonData["RELATIONSHIPS"] = relPointerList
 
-    node_type = jsonData.get("NODE_TYPE", "UNKNOWN")
-    for key1 in jsonData.keys():
-        if isinstance(jsonData[key1], list):
-            for subrecord in jsonData[key1]:
-                for key2 in subrecord.keys():
-                    updateStat(node_type, key2, subrecord[key2])
-        else:
-            updateStat(node_type, key1, jsonData[key1])
+    if mappingStats.statsLevel != "off":
+        mappingStats.addRecord(jsonData)
 
     return jsonData
 
@@ -414,14 +3285,14 @@ if __name__ == "__main__":
         "--input_path",
         default=os.getenv("input_path".upper(), None),
         type=str,
-        help="path to the downloaded ICIJ csv files",
+        help="path to the downloaded ICIJ csv files or to the zip file they came in",
     )
     argparser.add_argument(
         "-o",
         "--output_file",
         default=os.getenv("output_file".upper(), None),
         type=str,
-        help="path and file name for the json output",
+        help="path and file name for the json output, - or a named pipe to stream it to another program",
     )
     argparser.add_argument(
         "-l",
@@ -430,6 +3301,13 @@ if __name__ == "__main__":
         type=str,
         help="optional statistics filename (json format)",
     )
+    argparser.add_argument(
+        "-L",
+        "--stats_level",
+        choices=["off", "counts", "full"],
+        default=None,
+        help="mapping statistics to collect, full (counts and examples) when a log file is requested, otherwise off",
+    )
     argparser.add_argument(
         "-a",
         "--include_address_nodes",
@@ -438,11 +3316,211 @@ if __name__ == "__main__":
         default=False,
         help="include address nodes",
     )
+    argparser.add_argument(
+        "--sources",
+        type=str,
+        default=None,
+        help='optional comma separated leaks to load, each matching the start of the sourceID, e.g. "Panama Papers,Pandora Papers"',
+    )
+    argparser.add_argument(
+        "--node_types",
+        type=str,
+        default=None,
+        help="optional comma separated node types to load from entity, intermediary, officer, address and other, list address to keep the others' addresses",
+    )
+    argparser.add_argument(
+        "--excluded_links",
+        choices=["keep", "drop", "dangling"],
+        default="keep",
+        help="relationships to filtered out nodes: keep them as they were, drop them, or keep the pointer without the node's name or address, default=keep",
+    )
+    argparser.add_argument(
+        "--engine",
+        choices=["sqlite", "columnar"],
+        default="sqlite",
+        help="sqlite stages the csv files in a database and maps a row at a time, columnar reads them into pandas frames and maps a batch at a time with all of it in memory, default=sqlite",
+    )
+    argparser.add_argument(
+        "--work_dir",
+        default=None,
+        type=str,
+        help="optional directory for the staging database, default is the input directory or the zip file's directory",
+    )
+    argparser.add_argument(
+        "-r",
+        "--rebuild",
+        dest="rebuild",
+        action="store_true",
+        default=False,
+        help="reload every csv file rather than reusing the staging database",
+    )
+    argparser.add_argument(
+        "--load_workers",
+        type=int,
+        default=None,
+        help="number of worker processes to load the csv files with, each into a database of its own that is merged into the staging database, default is one per cpu",
+    )
+    argparser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes to map with, default=1",
+    )
+    argparser.add_argument(
+        "-s",
+        "--shard_output",
+        dest="shard_output",
+        action="store_true",
+        default=False,
+        help="with --workers, keep each node_id range in its own numbered output file rather than merging them",
+    )
+    argparser.add_argument(
+        "-n",
+        "--name_cache_size",
+        type=int,
+        default=100000,
+        help="number of officer names to remember the person or company classification of, default=100000, 0 to disable",
+    )
+    argparser.add_argument(
+        "-N",
+        "--name_cache_file",
+        default=os.getenv("name_cache_file".upper(), None),
+        type=str,
+        help="optional file to prewarm the name cache from and save it to for the next run",
+    )
+    argparser.add_argument(
+        "-S",
+        "--serializer",
+        choices=["auto", "orjson", "json"],
+        default="json",
+        help="json encoder for the output, defaults to json which reproduces earlier output byte for byte, orjson is faster but compact and not \\u escaped, auto uses orjson if installed",
+    )
+    argparser.add_argument(
+        "-F",
+        "--flush_interval",
+        type=float,
+        default=None,
+        help="optional seconds between output writes, by default output is written in 4MB batches",
+    )
+    argparser.add_argument(
+        "-c",
+        "--compression",
+        choices=["none", "gzip", "zstd"],
+        default=None,
+        help="compress the output, by default chosen from the output file extension (.gz or .zst)",
+    )
+    argparser.add_argument(
+        "-D",
+        "--delta_from",
+        default=None,
+        type=str,
+        help="only write the records added or changed since this previous output file, manifest or .hashes.db, and list the deleted ones",
+    )
+    argparser.add_argument(
+        "-H",
+        "--save_hashes",
+        action="store_true",
+        default=False,
+        help="save the record hashes for a later --delta_from run, always done in delta mode",
+    )
+    argparser.add_argument(
+        "--split_records",
+        type=int,
+        default=None,
+        help="optionally roll over to a new numbered output file after this many records",
+    )
+    argparser.add_argument(
+        "--split_bytes",
+        type=int,
+        default=None,
+        help="optionally roll over to a new numbered output file before this many (uncompressed) bytes",
+    )
+    argparser.add_argument(
+        "--checkpoint_interval",
+        type=float,
+        default=60,
+        help="seconds between checkpoints a stopped run can be resumed from, default=60, 0 turns them off",
+    )
+    argparser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="carry on from the checkpoint left by an interrupted run with the same options",
+    )
+    argparser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="optional file to write a cProfile report of the run to, sorted by cumulative and own time",
+    )
+    argparser.add_argument(
+        "--max_memory",
+        type=int,
+        default=None,
+        help="optional memory budget in MB for the whole run, workers included, caches and batch sizes are fitted to it and fewer workers used if it is too small for them",
+    )
+    argparser.add_argument(
+        "--check",
+        action="store_true",
+        default=False,
+        help="only check the input files, the output location and what the staging database can reuse, then exit",
+    )
     args = argparser.parse_args()
+
+    # --when the records go to stdout everything else goes to stderr
+    if args.output_file == "-":
+        sys.stdout = sys.stderr
+
+    # --profile the whole run, the worker processes are not included
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    perfStats = PerformanceStats()
     inputPath = args.input_path
     outputFileName = args.output_file
     logFile = args.log_file
+    statsLevel = args.stats_level or ("full" if logFile else "off")
     include_address_nodes = args.include_address_nodes
+    workDir = args.work_dir
+    rebuildDatabase = args.rebuild
+    nameCacheSize = max(0, args.name_cache_size)
+    nameCacheFile = args.name_cache_file
+    serializerName = args.serializer
+    flushInterval = args.flush_interval
+    splitRecords = args.split_records if (args.split_records or 0) > 0 else None
+    splitBytes = args.split_bytes if (args.split_bytes or 0) > 0 else None
+    workerCount = max(1, args.workers)
+    loadWorkerCount = max(1, args.load_workers or os.cpu_count() or 1)
+    maxMemoryMB = args.max_memory if (args.max_memory or 0) > 0 else None
+    engineName = args.engine
+
+    # --a memory budget only goes so many ways
+    if maxMemoryMB:
+        processLimit = MemoryBudget.processLimit(maxMemoryMB, peakRssMB() or 0)
+        if processLimit < 1:
+            print("")
+            print(
+                "Please allow at least %s MB with --max_memory"
+                % int((peakRssMB() or 0) + MemoryBudget.minShareMB + 1)
+            )
+            print("")
+            sys.exit(1)
+        if workerCount > 1 and workerCount + 1 > processLimit:
+            workerCount = max(1, processLimit - 1)
+            print(
+                "--workers lowered to %s to stay within %s MB"
+                % (workerCount, maxMemoryMB)
+            )
+        if loadWorkerCount > 1 and loadWorkerCount + 1 > processLimit:
+            loadWorkerCount = max(1, processLimit - 1)
+    deltaFrom = args.delta_from
+    saveHashes = args.save_hashes or bool(deltaFrom)
+    shardOutput = args.shard_output and workerCount > 1
+    checkpointInterval = max(0, args.checkpoint_interval)
 
     if not (inputPath):
         print("")
@@ -450,21 +3528,116 @@ if __name__ == "__main__":
         print("")
         sys.exit(1)
 
+    if not os.path.exists(inputPath):
+        print("")
+        print("Input path %s does not exist" % inputPath)
+        print("")
+        sys.exit(1)
+
+    # --the release zip can be read in place rather than unzipped first
+    inputZip = None
+    if os.path.isfile(inputPath):
+        import zipfile
+
+        try:
+            inputZip = zipfile.ZipFile(inputPath)
+        except (IOError, zipfile.BadZipFile) as err:
+            print("")
+            print("Could not open %s as a zip file" % inputPath)
+            print(" %s" % err)
+            print("")
+            sys.exit(1)
+    if not workDir:
+        # --a zip in the current directory has no directory name of its own
+        workDir = os.path.dirname(os.path.abspath(inputPath)) if inputZip else inputPath
+    if not os.path.isdir(workDir):
+        print("")
+        print("Work directory %s does not exist" % workDir)
+        print("")
+        sys.exit(1)
+
     if not (outputFileName):
         print("")
         print("Please supply an output file name.")
         print("")
         sys.exit(1)
 
-    # --open output file
-    try:
-        outputFileHandle = open(outputFileName, "w", encoding="utf-8")
-    except IOError as err:
+    # --compression comes from the flag or the output file extension
+    compressionName = outputCompression(outputFileName, args.compression)
+    streamOutput = isStreamOutput(outputFileName)
+    if compressionName == "zstd" and not zstandard:
         print("")
-        print("Could not open output file %s for writing" % outputFileName)
-        print(" %s" % err)
+        print("zstd compression requires zstandard (pip3 install zstandard)")
+        print("")
+        sys.exit(1)
+    if shardOutput and (splitRecords or splitBytes):
+        print("")
+        print("Please choose either --shard_output or --split_records/--split_bytes.")
+        print("")
+        sys.exit(1)
+    if shardOutput and saveHashes:
+        print("")
+        print("Please choose either --shard_output or --delta_from/--save_hashes.")
+        print("")
+        sys.exit(1)
+    if streamOutput and (shardOutput or splitRecords or splitBytes):
+        print("")
+        print("Please write split or sharded output to files rather than a pipe.")
+        print("")
+        sys.exit(1)
+    if outputFileName == "-" and saveHashes:
+        print("")
+        print(
+            "Please stream to a named pipe rather than - with --delta_from/--save_hashes."
+        )
+        print("")
+        sys.exit(1)
+    # --only the leaks and node types asked for are staged and mapped
+    ingestFilter = None
+    if args.sources or args.node_types:
+        ingestFilter = {
+            "sources": sorted(
+                {
+                    x.strip().lower()
+                    for x in (args.sources or "").split(",")
+                    if x.strip()
+                }
+            ),
+            "node_types": sorted(
+                {
+                    x.strip().lower()
+                    for x in (args.node_types or "").split(",")
+                    if x.strip()
+                }
+            ),
+            "excluded_links": args.excluded_links,
+        }
+        unknownTypes = set(ingestFilter["node_types"]) - set(nodeTypePrecedence)
+        if unknownTypes:
+            print("")
+            print(
+                "Unknown node type %s, choose from %s"
+                % (", ".join(sorted(unknownTypes)), ", ".join(nodeTypePrecedence))
+            )
+            print("")
+            sys.exit(1)
+    if engineName == "columnar":
+        if not importlib.util.find_spec("pandas"):
+            print("")
+            print("The columnar engine requires pandas (pip3 install pandas)")
+            print("")
+            sys.exit(1)
+        if workerCount > 1 or args.resume:
+            print("")
+            print("Please map with the sqlite engine to use --workers or --resume.")
+            print("")
+            sys.exit(1)
+    if deltaFrom and not os.path.exists(deltaFrom):
+        print("")
+        print("Previous output %s does not exist" % deltaFrom)
         print("")
         sys.exit(1)
+    shardManifest = []
 
     # --register the expected files
     inputFiles = []
@@ -504,42 +3677,420 @@ if __name__ == "__main__":
             inputFiles[i]["nodeDatabase"] + "_" + inputFiles[i]["nodeType"]
         )
 
-    # --open database connection and load from csv if first time
-    dbname = (
-        inputPath + (os.path.sep if inputPath[-1:] != os.path.sep else "") + "icij2.db"
+    # --the columnar engine holds all of the csv files in memory at once
+    if maxMemoryMB and engineName == "columnar":
+        columnarMB = int(
+            columnarMemoryFactor * inputCsvBytes() / 1048576 + (peakRssMB() or 0)
+        )
+        if columnarMB > maxMemoryMB:
+            print(
+                "the columnar engine needs about %s MB for these files, mapping with the sqlite engine to stay within %s MB"
+                % (columnarMB, maxMemoryMB)
+            )
+            engineName = "sqlite"
+
+    # --checkpoints are only taken when mapping in this process straight into one
+    # --uncompressed file, which can be cut back to the last one and appended to
+    checkpoint = None
+    checkpointData = None
+    resumeAt = None
+    canCheckpoint = (
+        engineName == "sqlite"
+        and workerCount == 1
+        and not compressionName
+        and not streamOutput
+        and not (splitRecords or splitBytes or saveHashes)
     )
-    dbExists = os.path.exists(dbname)
-    if dbExists:
-        os.remove(dbname)
-    conn = sqlite3.connect(dbname)
-    csv2db()
+    if canCheckpoint and (checkpointInterval or args.resume):
+        checkpoint = MappingCheckpoint(
+            checkpointFileName(outputFileName),
+            checkpointInterval,
+            {
+                "output_file": os.path.abspath(outputFileName),
+                "serializer": serializerName,
+                "include_address_nodes": include_address_nodes,
+                "stats_level": statsLevel,
+            },
+        )
+    if args.resume:
+        try:
+            if not checkpoint:
+                raise ValueError(
+                    "only a single process run into an uncompressed, unsplit file (not a pipe) without --delta_from/--save_hashes can be resumed"
+                )
+            checkpointData = checkpoint.load()
+            if os.path.getsize(outputFileName) < checkpointData["output_bytes"]:
+                raise ValueError(
+                    "%s is shorter than when it was taken" % outputFileName
+                )
+        except (IOError, ValueError, KeyError) as err:
+            print("")
+            print(
+                "Could not resume from checkpoint %s"
+                % checkpointFileName(outputFileName)
+            )
+            print(" %s" % err)
+            print("")
+            sys.exit(1)
+        resumeAt = (checkpointData["output_bytes"], checkpointData["output_records"])
+    elif (
+        not args.check
+        and outputFileName != "-"
+        and os.path.exists(checkpointFileName(outputFileName))
+    ):
+        os.remove(checkpointFileName(outputFileName))  # --left by an earlier run
+
+    # --pick the json serializer
+    try:
+        serializer = getSerializer(serializerName)
+    except ImportError as err:
+        print("")
+        print("Serializer %s is not available: %s" % (serializerName, err))
+        print("")
+        sys.exit(1)
+
+    # --a check stops here, before anything is loaded, mapped or written
+    if args.check:
+        sys.exit(0 if checkRun() else 1)
+    loadBaseLibrary()
+
+    # --what is already held is the base each process starts from, the budget is
+    # --shared out for the mapping and again for the loading while it runs
+    if maxMemoryMB:
+        processCount = workerCount + 1 if workerCount > 1 else 1
+        memoryBudget = MemoryBudget(maxMemoryMB, peakRssMB() or 0, processCount)
+        if memoryBudget.shareMB < MemoryBudget.minShareMB / 2:
+            print("")
+            print(
+                "Please allow more than %s MB with --max_memory, %s MB is in use before loading"
+                % (maxMemoryMB, memoryBudget.baseMB)
+            )
+            print("")
+            sys.exit(1)
+        nameCacheSize = min(nameCacheSize, memoryBudget.nameCacheSize)
+
+    # --in delta mode each record's hash is compared with the previous release's,
+    # --hashing the previous output first if that is what was given
+    recordIndex = None
+    previousHashDb = None
+    hashStartTime = time.time()
+    if saveHashes:
+        hashSerializerName = serializerName
+        if serializerName == "auto":
+            hashSerializerName = "orjson" if orjson else "json"
+        previousHashDb = deltaFrom
+        try:
+            if deltaFrom and not deltaFrom.endswith(".db"):
+                print("")
+                print("hashing %s ..." % deltaFrom)
+                previousHashDb = os.path.join(workDir, "icij_previous.hashes.db")
+                hashCount = hashOutputFile(
+                    deltaFrom, previousHashDb, serializer, hashSerializerName
+                )
+                print(
+                    " %s records hashed in %s seconds"
+                    % (hashCount, round(time.time() - hashStartTime, 1))
+                )
+                perfStats.addPhase("previous hashes", time.time() - hashStartTime)
+            recordIndex = RecordHashIndex(
+                hashFileName(outputFileName), hashSerializerName, previousHashDb
+            )
+            if memoryBudget:
+                memoryBudget.configure(recordIndex.conn)
+        except (IOError, ValueError, KeyError, sqlite3.DatabaseError) as err:
+            print("")
+            print("Could not read the previous output %s" % deltaFrom)
+            print(" %s" % err)
+            print("")
+            sys.exit(1)
+
+    # --open output file (shards are opened by the workers), a named pipe waits
+    # --here until something opens it for reading
+    if streamOutput and outputFileName != "-":
+        print("")
+        print("waiting for a reader of %s ..." % outputFileName)
+    try:
+        if shardOutput:
+            outputWriter = None
+            outputDir = os.path.dirname(os.path.abspath(outputFileName))
+            if not os.access(outputDir, os.W_OK):
+                raise IOError("%s is not a writable directory" % outputDir)
+        else:
+            outputWriter = OutputWriter(
+                outputFileName,
+                serializer,
+                compressionName,
+                splitRecords=splitRecords,
+                splitBytes=splitBytes,
+                flushInterval=flushInterval,
+                recordIndex=recordIndex,
+                resumeAt=resumeAt,
+                streaming=streamOutput,
+            )
+    except IOError as err:
+        print("")
+        print("Could not open output file %s for writing" % outputFileName)
+        print(" %s" % err)
+        print("")
+        sys.exit(1)
+
+    # --the columnar engine reads the csv files into memory rather than staging them
+    conn = None
+    if engineName == "columnar":
+        stagingStartTime = time.time()
+        try:
+            columnarTables = loadColumnarTables()
+        except (IOError, ValueError, KeyError) as err:
+            print("")
+            print("Could not read the csv files into the columnar engine")
+            print(" %s" % err)
+            print("")
+            sys.exit(1)
+        if inputZip:
+            inputZip.close()
+        perfStats.addPhase("loading", time.time() - stagingStartTime)
+    else:
+        # --open database connection and load from csv if first time
+        dbname = os.path.join(workDir, "icij2.db")
+        dbExists = os.path.exists(dbname)
+        if dbExists and rebuildDatabase:
+            os.remove(dbname)
+        conn = sqlite3.connect(dbname)
+        try:
+            conn.execute("select count(*) from sqlite_master").fetchone()
+        except sqlite3.DatabaseError as err:
+            print("")
+            print("Staging database %s is unreadable, rebuilding it" % dbname)
+            print(" %s" % err)
+            print("")
+            conn.close()
+            os.remove(dbname)
+            conn = sqlite3.connect(dbname)
+
+        # --the staging database is rebuilt from the csv files if lost, so skip the
+        # --rollback journal and the fsyncs while loading it
+        conn.execute("pragma journal_mode = off")
+        conn.execute("pragma synchronous = off")
+        if memoryBudget:
+            memoryBudget.configure(conn)
+        csv.field_size_limit(2**31 - 1)
+        stagingStartTime = time.time()
+        csv2db()
+        if inputZip:
+            inputZip.close()
+        perfStats.addPhase("staging", time.time() - stagingStartTime)
+
+        # --a checkpoint only holds for the files it was taken from
+        if checkpoint:
+            checkpoint.sources = getManifestEntry("icij_edges_resolved")["file_hash"]
+        if checkpointData and checkpointData["sources"] != checkpoint.sources:
+            print("")
+            print("Could not resume, the csv files have changed since the checkpoint")
+            print("")
+            sys.exit(1)
+
+    # --initialize the statistics
+    mappingStats = MappingStats(statsLevel)
+
+    # --officer names are classified as people or companies through a cache
+    nameCache = CompanyNameCache(nameCacheSize)
+    if nameCacheFile and os.path.exists(nameCacheFile):
+        print("")
+        print(
+            "%s names prewarmed from %s"
+            % (nameCache.load(nameCacheFile), nameCacheFile)
+        )
+    mappedNodeIds = NodeIdTracker()  # to support duplicate node IDs
 
-    # --initialize the statpack
-    statPack = {}
-    node_cache = {}  # to support duplicate node IDs
+    # --pick up the statistics where the checkpoint left them
+    resumeTable = None
+    if checkpointData:
+        mappingStats.restore(checkpointData["mapping_stats"])
+        baseLibrary.statPack = checkpointData["base_stats"]
+        nameCache.merge(dict(checkpointData["name_cache"], newNames=[]))
+        resumeTable = checkpointData["table"]
+        print("")
+        print(
+            "resuming at %s after %s records"
+            % (resumeTable, checkpointData["output_records"])
+        )
 
     # --process each table
-    for fileDict in inputFiles:
-        processTable(fileDict)
-        if shutDown:
-            break
+    mappingStartTime = time.time()
+    if engineName == "columnar":
+        mapColumnarTables(columnarTables)
+    elif workerCount > 1:
+        processTablesInParallel(workerCount)
+    else:
+        for fileDict in inputFiles:
+
+            # --an interrupt between tables carries on from the start of the next
+            if shutDown:
+                if checkpoint:
+                    checkpoint.save(fileDict["tableName"], None, outputWriter)
+                break
+
+            nodeRange = None
+            if resumeTable:
+                if fileDict["tableName"] != resumeTable:
+                    continue  # --mapped before the checkpoint
+                resumeTable = None
+                mappedNodeIds = NodeIdTracker(
+                    resumedNodeCounts(fileDict, checkpointData["next_node_id"])
+                )
+                if checkpointData["next_node_id"] is not None:
+                    nodeRange = (checkpointData["next_node_id"], None)
+            if processTable(fileDict, nodeRange):
+                break  # --stopped part way, at a checkpoint if one could be taken
+
+            # --the rows of this table the filters left out come before the same
+            # --node_ids in the tables after it in a full run
+            if isMappable(fileDict):
+                mappedNodeIds.recordCounts(
+                    excludedNodeCounts(
+                        [fileDict["nodeType"]], laterMappableTables(fileDict)
+                    )
+                )
+
+    if outputWriter:
+        try:
+            outputWriter.close()
+        except IOError as err:
+            print("")
+            print("Could not write to %s" % outputFileName)
+            print(" %s" % err)
+            print("")
+            shutDown = True
+        perfStats.addWriter(outputWriter)
+    perfStats.addPhase("mapping", time.time() - mappingStartTime)
+    if checkpoint and not shutDown:
+        checkpoint.remove()
+
+    # --list the records that are gone since the previous release, then keep
+    # --this release's hashes for the next one
+    deltaStartTime = time.time()
+    if recordIndex and not shutDown:
+        deleteName = deleteFileName(outputFileName)
+        try:
+            if deltaFrom:
+                deleteWriter = OutputWriter(deleteName, serializer, compressionName)
+                for recordId in recordIndex.deletedIds():
+                    deleteWriter.write({"DATA_SOURCE": "ICIJ", "RECORD_ID": recordId})
+                deleteWriter.close()
+            recordIndex.close()
+        except (IOError, sqlite3.DatabaseError) as err:
+            print("")
+            print("Could not write %s" % deleteName)
+            print(" %s" % err)
+            print("")
+            shutDown = True
+        else:
+            print("")
+            if deltaFrom:
+                print(
+                    "%s added, %s changed, %s unchanged and %s deleted records since %s"
+                    % (
+                        recordIndex.counts["ADDED"],
+                        recordIndex.counts["CHANGED"],
+                        recordIndex.counts["UNCHANGED"],
+                        recordIndex.counts["DELETED"],
+                        deltaFrom,
+                    )
+                )
+                print("Deleted records listed in %s" % deleteName)
+            print("Record hashes saved to %s" % hashFileName(outputFileName))
+    elif recordIndex:
+        recordIndex.abort()
+    if previousHashDb and previousHashDb != deltaFrom:
+        os.remove(previousHashDb)
+    if recordIndex:
+        perfStats.addPhase("deletes and hashes", time.time() - deltaStartTime)
 
-    outputFileHandle.close()
+    # --list the output files with their record counts and checksums
+    if outputWriter and (splitRecords or splitBytes):
+        shardManifest = outputWriter.manifest()
+    if shardManifest:
+        print("")
+        print(
+            "%s output files listed in %s"
+            % (len(shardManifest), writeManifest(outputFileName, shardManifest))
+        )
 
     # --write statistics file
     if logFile:
         print("")
+        statPack = mappingStats.toStatPack()
         statPack["BASE_LIBRARY"] = baseLibrary.statPack
+        statPack["NAME_CACHE"] = nameCache.statPack()
+        if recordIndex and deltaFrom:
+            statPack["DELTA"] = recordIndex.counts
+        if ingestFilter:
+            if conn:
+                excludedCounts = dict(
+                    conn.cursor().execute(
+                        "select node_type, count(*) from icij_excluded group by node_type"
+                    )
+                )
+            else:
+                excludedCounts = columnarTables["excludedCounts"]
+            statPack["FILTER"] = dict(ingestFilter, excluded_nodes=excludedCounts)
+        perfStats.addPhase("total", time.time() - procStartTime)
+        statPack["PERFORMANCE"] = perfStats.toStatPack()
         with open(logFile, "w") as outfile:
             json.dump(statPack, outfile, indent=4, sort_keys=True)
         print("Mapping stats written to %s" % logFile)
 
+    # --save the name classifications for the next run
+    if nameCacheFile and nameCacheSize > 0:
+        try:
+            nameCache.save(nameCacheFile)
+        except IOError as err:
+            print("")
+            print("Could not write name cache %s" % nameCacheFile)
+            print(" %s" % err)
+
+    if profiler:
+        import pstats
+
+        profiler.disable()
+        try:
+            with open(args.profile, "w") as profileFile:
+                for sortKey in ("cumulative", "tottime"):
+                    profileFile.write("sorted by %s\n" % sortKey)
+                    pstats.Stats(profiler, stream=profileFile).sort_stats(
+                        sortKey
+                    ).print_stats(50)
+            print("")
+            print("Profile written to %s" % args.profile)
+        except IOError as err:
+            print("")
+            print("Could not write profile %s" % args.profile)
+            print(" %s" % err)
+
+    # --the most memory this process, and the largest of its workers, held
+    if resource:
+        print("")
+        print(
+            "Peak memory %s MB%s%s"
+            % (
+                peakRssMB(),
+                (
+                    ", %s MB in the largest worker" % peakRssMB(True)
+                    if workerCount > 1 or loadWorkerCount > 1
+                    else ""
+                ),
+                ", budget %s MB" % maxMemoryMB if maxMemoryMB else "",
+            )
+        )
+
     print("")
     elapsedMins = round((time.time() - procStartTime) / 60, 1)
     if shutDown == 0:
         print("Process completed successfully in %s minutes!" % elapsedMins)
     else:
         print("Process aborted after %s minutes!" % elapsedMins)
+        if checkpoint and checkpoint.enabled and os.path.exists(checkpoint.fileName):
+            print("Run again with --resume to carry on from the last checkpoint")
     print("")
 
     sys.exit(0)
@@ -0,0 +1,124 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+repoPath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+mapperFile = os.path.join(repoPath, "src", "icij_mapper.py")
+benchmarkPath = os.path.join(repoPath, "benchmark")
+
+# --the mapper and the stand-in base_mapper are imported as plain modules
+sys.path[0:0] = [benchmarkPath, os.path.join(repoPath, "src")]
+
+# --the csv headers of the may 2022 release the mapper reads
+csvHeaders = {
+    "nodes-entities.csv": ["node_id", "name", "jurisdiction", "address", "sourceID"],
+    "nodes-intermediaries.csv": ["node_id", "name", "address", "sourceID"],
+    "nodes-officers.csv": ["node_id", "name", "sourceID"],
+    "nodes-addresses.csv": ["node_id", "address", "name", "sourceID"],
+    "nodes-others.csv": ["node_id", "name", "sourceID"],
+    "relationships.csv": (
+        "node_id_start node_id_end rel_type link start_date end_date sourceID"
+    ).split(),
+}
+
+
+# ----------------------------------------
+def writeCsvFiles(dataPath, fileRows):
+    """write the six csv files, any not in fileRows with just their header"""
+    os.makedirs(dataPath, exist_ok=True)
+    for fileName, csvHeader in csvHeaders.items():
+        with open(
+            os.path.join(dataPath, fileName), "w", encoding="utf-8", newline=""
+        ) as csvFile:
+            csvWriter = csv.writer(csvFile)
+            csvWriter.writerow(csvHeader)
+            csvWriter.writerows(fileRows.get(fileName, []))
+    return str(dataPath)
+
+
+# ----------------------------------------
+def mapperEnvironment():
+    """the environment the mapper script runs with the stand-in base_mapper in"""
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [benchmarkPath, environment.get("PYTHONPATH", "")]
+    )
+    environment["PYTHONUNBUFFERED"] = "1"
+    return environment
+
+
+# ----------------------------------------
+def runMapper(*mapperArgs, check=True, cwd=None):
+    """run the mapper script with the stand-in base_mapper"""
+    mapperRun = subprocess.run(
+        [sys.executable, mapperFile] + [str(x) for x in mapperArgs],
+        env=mapperEnvironment(),
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if check and mapperRun.returncode != 0:
+        pytest.fail("the mapper failed:\n%s%s" % (mapperRun.stdout, mapperRun.stderr))
+    return mapperRun
+
+
+# ----------------------------------------
+def engineOutputs(dataPath, outputPath):
+    """the release mapped by the staged join and by the columnar engine"""
+    for engineName in ("sqlite", "columnar"):
+        runMapper(
+            "-i",
+            dataPath,
+            "-o",
+            outputPath / ("%s.json" % engineName),
+            "-S",
+            "json",
+            "--engine",
+            engineName,
+        )
+    return (
+        (outputPath / "sqlite.json").read_bytes(),
+        (outputPath / "columnar.json").read_bytes(),
+    )
+
+
+# ----------------------------------------
+def generateData(dataPath, nodeCount, *generatorArgs, cwd=None):
+    """a synthetic release from the benchmark's generator"""
+    subprocess.run(
+        [sys.executable, os.path.join(benchmarkPath, "generate_icij_data.py")]
+        + ["-o", str(dataPath), "-n", str(nodeCount)]
+        + list(generatorArgs),
+        cwd=cwd,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+# ----------------------------------------
+def readOutput(fileName):
+    with open(fileName, "r", encoding="utf-8") as outputFile:
+        return [json.loads(x) for x in outputFile]
+
+
+# ----------------------------------------
+@pytest.fixture(scope="session")
+def generatedData(tmp_path_factory):
+    """a small synthetic release from the benchmark's generator"""
+    dataPath = tmp_path_factory.mktemp("generated")
+    generateData(dataPath, 3000)
+    return dataPath
+
+
+# ----------------------------------------
+@pytest.fixture(scope="session")
+def generatedOutput(generatedData, tmp_path_factory):
+    """the generated release mapped once by a plain single process run"""
+    outputFile = tmp_path_factory.mktemp("reference") / "icij.json"
+    runMapper("-i", generatedData, "-o", outputFile, "-S", "json")
+    return outputFile
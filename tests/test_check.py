@@ -0,0 +1,16 @@
+from conftest import runMapper
+
+
+# ----------------------------------------
+def test_check_reports_the_lookup_tables(tmp_path, generatedData):
+    mapperArgs = ["-i", generatedData, "-o", tmp_path / "icij.json"]
+    mapperArgs += ["--work_dir", tmp_path]
+    runMapper(*mapperArgs)
+
+    checkRun = runMapper(*mapperArgs, "--check")
+    assert " icij_node_directory: reuse\n" in checkRun.stdout
+    assert " icij_edges_resolved: reuse\n" in checkRun.stdout
+
+    checkRun = runMapper(*mapperArgs, "--sources", "Panama Papers", "--check")
+    assert " icij_node_directory: rebuild\n" in checkRun.stdout
+    assert " icij_edges_resolved: rebuild\n" in checkRun.stdout
@@ -0,0 +1,21 @@
+import pytest
+from icij_compare import readRecords
+
+
+# ----------------------------------------
+def test_keyed_lines_read_like_plain_ones(tmp_path):
+    (tmp_path / "plain.json").write_bytes(b'{"RECORD_ID": "1"}\n{"RECORD_ID": "2"}\n')
+    (tmp_path / "keyed.json").write_bytes(
+        b'1\t{"RECORD_ID": "1"}\n2\t{"RECORD_ID": "2"}\n'
+    )
+    assert [x[0:2] for x in readRecords(str(tmp_path / "keyed.json"))] == [
+        x[0:2] for x in readRecords(str(tmp_path / "plain.json"))
+    ]
+
+
+# ----------------------------------------
+def test_line_without_a_record_names_the_file_and_line(tmp_path):
+    fileName = str(tmp_path / "icij.json")
+    (tmp_path / "icij.json").write_bytes(b'{"RECORD_ID": "1"}\n\nnot a record\n')
+    with pytest.raises(ValueError, match="icij.json line 3 "):
+        list(readRecords(fileName))
@@ -0,0 +1,61 @@
+import pytest
+from conftest import readOutput, runMapper, writeCsvFiles
+
+previousRows = {
+    "nodes-entities.csv": [
+        ["1", "ACME HOLDINGS LTD", "BVI", "", "Panama Papers"],
+        ["2", "BETA TRADING SA", "PAN", "", "Panama Papers"],
+        ["3", "GAMMA NOMINEES LTD", "BVI", "", "Panama Papers"],
+    ],
+    "nodes-officers.csv": [["10", "JOHN SMITH", "Panama Papers"]],
+    "relationships.csv": [
+        ["10", "1", "officer_of", "shareholder of", "", "", "Panama Papers"]
+    ],
+}
+
+# --2 is renamed, 3 is gone and 4 is new, 1 and officer 10 are the same
+currentRows = {
+    "nodes-entities.csv": [
+        ["1", "ACME HOLDINGS LTD", "BVI", "", "Panama Papers"],
+        ["2", "BETA TRADING SA (IN LIQUIDATION)", "PAN", "", "Panama Papers"],
+        ["4", "DELTA INVESTMENTS INC", "PAN", "", "Panama Papers"],
+    ],
+    "nodes-officers.csv": [["10", "JOHN SMITH", "Panama Papers"]],
+    "relationships.csv": [
+        ["10", "1", "officer_of", "shareholder of", "", "", "Panama Papers"]
+    ],
+}
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "engineArgs",
+    [pytest.param([], id="single"), pytest.param(["-w", "2"], id="workers")],
+)
+def test_delta_counts_and_files(tmp_path, engineArgs):
+    previousPath = writeCsvFiles(tmp_path / "previous", previousRows)
+    currentPath = writeCsvFiles(tmp_path / "current", currentRows)
+    runMapper("-i", previousPath, "-o", tmp_path / "previous.json", "-S", "json", "-H")
+
+    for deltaFrom in ("previous.json", "previous.hashes.db"):
+        deltaRun = runMapper(
+            "-i",
+            currentPath,
+            "-o",
+            tmp_path / "delta.json",
+            "-S",
+            "json",
+            "-D",
+            tmp_path / deltaFrom,
+            *engineArgs,
+        )
+        assert (
+            "1 added, 1 changed, 2 unchanged and 1 deleted records" in deltaRun.stdout
+        )
+        assert sorted(x["RECORD_ID"] for x in readOutput(tmp_path / "delta.json")) == [
+            "2",
+            "4",
+        ]
+        assert readOutput(tmp_path / "delta.deletes.json") == [
+            {"DATA_SOURCE": "ICIJ", "RECORD_ID": "3"}
+        ]
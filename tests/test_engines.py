@@ -0,0 +1,56 @@
+import pytest
+from conftest import engineOutputs, runMapper, writeCsvFiles
+
+# --entity 20 is in its file twice and 21 is an entity and an officer, so the
+# --directory holds 20 twice and its edges are mapped twice
+repeatedIdRows = {
+    "nodes-entities.csv": [
+        ["20", "ACME HOLDINGS LTD", "BVI", "", "Panama Papers"],
+        ["20", "ACME HOLDINGS LTD", "BVI", "", "Panama Papers"],
+        ["21", "BETA TRADING SA", "PAN", "", "Panama Papers"],
+    ],
+    "nodes-officers.csv": [
+        ["10", "JOHN SMITH", "Panama Papers"],
+        ["21", "BETA TRADING SA", "Panama Papers"],
+    ],
+    "relationships.csv": [
+        ["10", "20", "officer_of", "shareholder of", "", "", "Panama Papers"],
+        ["20", "10", "officer_of", "shareholder of", "", "", "Panama Papers"],
+        ["21", "10", "officer_of", "shareholder of", "", "", "Panama Papers"],
+    ],
+}
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "engineArgs",
+    [
+        pytest.param(["--engine", "columnar"], id="columnar"),
+        pytest.param(["-w", "2"], id="workers"),
+    ],
+)
+def test_engines_match_the_single_process_sqlite_run(
+    tmp_path, generatedData, generatedOutput, engineArgs
+):
+    if "columnar" in engineArgs:
+        pytest.importorskip("pandas")
+    runMapper(
+        "-i",
+        generatedData,
+        "-o",
+        tmp_path / "icij.json",
+        "-S",
+        "json",
+        "--work_dir",
+        tmp_path,
+        *engineArgs,
+    )
+    assert (tmp_path / "icij.json").read_bytes() == generatedOutput.read_bytes()
+
+
+# ----------------------------------------
+def test_columnar_engine_repeats_edges_like_the_staged_join(tmp_path):
+    pytest.importorskip("pandas")
+    dataPath = writeCsvFiles(tmp_path / "data", repeatedIdRows)
+    sqliteOutput, columnarOutput = engineOutputs(dataPath, tmp_path)
+    assert sqliteOutput == columnarOutput
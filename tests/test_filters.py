@@ -0,0 +1,68 @@
+import pytest
+from conftest import readOutput, runMapper, writeCsvFiles
+
+# --node 81093627 is an entity in one leak and an intermediary in another, so a
+# --full run maps the intermediary as 81093627-1
+duplicateIdRows = {
+    "nodes-entities.csv": [
+        ["81093627", "ACME HOLDINGS LTD", "BVI", "", "Offshore Leaks"],
+        ["81093700", "BETA TRADING SA", "PAN", "", "Panama Papers"],
+    ],
+    "nodes-intermediaries.csv": [
+        ["", "UNNUMBERED AGENT", "", "Offshore Leaks"],
+        ["81093627", "ACME HOLDINGS LTD", "", "Panama Papers"],
+    ],
+    "nodes-officers.csv": [
+        ["", "UNNUMBERED OFFICER", "Panama Papers"],
+        ["10", "JOHN SMITH", "Panama Papers"],
+    ],
+    "relationships.csv": [
+        ["10", "81093627", "officer_of", "shareholder of", "", "", "Panama Papers"],
+        [
+            "81093627",
+            "81093700",
+            "intermediary_of",
+            "intermediary of",
+            "",
+            "",
+            "Panama Papers",
+        ],
+    ],
+}
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "engineArgs",
+    [
+        pytest.param([], id="sqlite"),
+        pytest.param(["-w", "2"], id="workers"),
+        pytest.param(["--load_workers", "2"], id="load_workers"),
+        pytest.param(["--engine", "columnar"], id="columnar"),
+    ],
+)
+def test_sources_run_matches_full_run_records(tmp_path, engineArgs):
+    if "columnar" in engineArgs:
+        pytest.importorskip("pandas")
+    dataPath = writeCsvFiles(tmp_path / "data", duplicateIdRows)
+    runMapper("-i", dataPath, "-o", tmp_path / "full.json", "-S", "json")
+    runMapper(
+        "-i",
+        dataPath,
+        "-o",
+        tmp_path / "panama.json",
+        "-S",
+        "json",
+        "--sources",
+        "Panama Papers",
+        *engineArgs,
+    )
+
+    fullRecords = [
+        x
+        for x in readOutput(tmp_path / "full.json")
+        if x["ICIJ_SOURCE"] == "Panama Papers"
+    ]
+    panamaRecords = readOutput(tmp_path / "panama.json")
+    assert "81093627-1" in [x["RECORD_ID"] for x in panamaRecords]
+    assert panamaRecords == fullRecords
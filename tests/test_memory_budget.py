@@ -0,0 +1,47 @@
+import json
+
+import icij_mapper
+import pytest
+from conftest import runMapper
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "budgetArgs",
+    [
+        pytest.param(["--max_memory", "128"], id="single"),
+        pytest.param(["--max_memory", "384", "-w", "2"], id="workers"),
+    ],
+)
+def test_small_budget_shrinks_caches_not_output(
+    tmp_path, generatedData, generatedOutput, budgetArgs
+):
+    statsFile = tmp_path / "stats.json"
+    outputFile = tmp_path / "icij.json"
+    runMapper(
+        "-i",
+        generatedData,
+        "-o",
+        outputFile,
+        "-S",
+        "json",
+        "-l",
+        statsFile,
+        *budgetArgs,
+    )
+    assert outputFile.read_bytes() == generatedOutput.read_bytes()
+
+    with open(statsFile, "r", encoding="utf-8") as statsHandle:
+        statPack = json.load(statsHandle)
+    budgetStats = statPack["PERFORMANCE"]["MEMORY_BUDGET"]
+    processCount = 3 if "-w" in budgetArgs else 1
+    assert budgetStats["processes"] == processCount
+    expectedBudget = icij_mapper.MemoryBudget(
+        int(budgetArgs[1]), budgetStats["base_mb"], processCount
+    )
+    assert dict(budgetStats, trims=0) == expectedBudget.statPack()
+
+    # --each cache is held to its part of the share rather than its default
+    assert budgetStats["name_cache_size"] < 100000
+    assert statPack["NAME_CACHE"]["max_size"] == budgetStats["name_cache_size"]
+    assert budgetStats["output_queue_depth"] < icij_mapper.OutputWriter.queueDepth
@@ -0,0 +1,31 @@
+import base_mapper
+import icij_mapper
+import pytest
+
+
+# ----------------------------------------
+@pytest.fixture
+def nameCache(monkeypatch):
+    monkeypatch.setattr(icij_mapper, "baseLibrary", base_mapper.base_library())
+    return icij_mapper.CompanyNameCache(100)
+
+
+# ----------------------------------------
+def test_single_process_keeps_no_new_names(nameCache):
+    for nameNumber in range(1000):
+        nameCache.isCompanyName("NAME %s LTD" % nameNumber)
+    assert len(nameCache.names) == 100
+    assert nameCache.newNames == []
+
+
+# ----------------------------------------
+def test_worker_hands_back_new_names_within_its_trimmed_size(nameCache):
+    nameCache.keepNewNames = True
+    for nameNumber in range(1000):
+        nameCache.isCompanyName("NAME %s LTD" % nameNumber)
+    assert len(nameCache.newNames) == 1000
+    nameCache.trim(50)
+    assert len(nameCache.names) == 50
+    assert nameCache.newNames[0] == ("NAME 950 LTD", True)
+    assert len(nameCache.drain()["newNames"]) == 50
+    assert nameCache.newNames == []
@@ -0,0 +1,50 @@
+import pytest
+from conftest import engineOutputs, readOutput, runMapper, writeCsvFiles
+
+# --entity 20 has a blank node_id row ahead of it, officer 10 points at it and
+# --at address 30
+blankIdRows = {
+    "nodes-entities.csv": [
+        ["", "NO ID HOLDINGS LTD", "BVI", "", "Panama Papers"],
+        ["20", "ACME HOLDINGS LTD", "BVI", "", "Panama Papers"],
+    ],
+    "nodes-officers.csv": [["10", "JOHN SMITH", "Panama Papers"]],
+    "nodes-addresses.csv": [["30", "1 MAIN STREET, ROAD TOWN", "", "Panama Papers"]],
+    "relationships.csv": [
+        ["10", "20", "officer_of", "shareholder of", "", "", "Panama Papers"],
+        [
+            "10",
+            "30",
+            "registered_address",
+            "registered address",
+            "",
+            "",
+            "Panama Papers",
+        ],
+    ],
+}
+
+
+# ----------------------------------------
+def test_blank_node_id_does_not_hide_later_node_types(tmp_path):
+    dataPath = writeCsvFiles(tmp_path / "data", blankIdRows)
+    runMapper("-i", dataPath, "-o", tmp_path / "icij.json", "-S", "json")
+    records = {x["RECORD_ID"]: x for x in readOutput(tmp_path / "icij.json")}
+
+    officer = records["10"]
+    assert [x["REL_POINTER_KEY"] for x in officer["RELATIONSHIPS"]] == [20]
+    assert officer["GROUP_ASSOCIATIONS"] == [
+        {"GROUP_ASSOCIATION_ORG_NAME": "ACME HOLDINGS LTD"}
+    ]
+    assert {
+        "ADDR_TYPE": "REGISTERED",
+        "ADDR_FULL": "1 MAIN STREET, ROAD TOWN",
+    } in officer["ADDRESSES"]
+
+
+# ----------------------------------------
+def test_blank_node_id_maps_the_same_in_both_engines(tmp_path):
+    pytest.importorskip("pandas")
+    dataPath = writeCsvFiles(tmp_path / "data", blankIdRows)
+    sqliteOutput, columnarOutput = engineOutputs(dataPath, tmp_path)
+    assert sqliteOutput == columnarOutput
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+from icij_mapper import NodeIdTracker
+
+
+# ----------------------------------------
+def dictRecordIds(nodeIds):
+    """the RECORD_IDs from the dict of str(node_id) counts NodeIdTracker replaced"""
+    nodeCache = {}
+    recordIds = []
+    for nodeId in nodeIds:
+        nodeId = str(nodeId)
+        if nodeId in nodeCache:
+            nodeCache[nodeId] += 1
+            recordIds.append(f"{nodeId}-{nodeCache[nodeId]}")
+        else:
+            nodeCache[nodeId] = 0
+            recordIds.append(nodeId)
+    return recordIds
+
+
+# ----------------------------------------
+def randomNodeIds(rng, idCount):
+    """mostly ascending integers from a few pages, with repeats, blanks and strings"""
+    nodeIds = []
+    nodeId = 0
+    for _ in range(idCount):
+        nodeId += rng.choice([1, 1, 1, 2, 7, 70000])
+        nodeIds.append(nodeId)
+    nodeIds += rng.sample(nodeIds, idCount // 20)
+    nodeIds += [str(x) for x in rng.sample(nodeIds, idCount // 50)]
+    nodeIds += [
+        None,
+        None,
+        "",
+        "",
+        -1,
+        -1,
+        "-1",
+        "007",
+        "7",
+        "abc",
+        "abc",
+        2**40,
+        2**40,
+        1.5,
+    ]
+    rng.shuffle(nodeIds)
+    return nodeIds
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_the_dict_it_replaced(seed):
+    nodeIds = randomNodeIds(random.Random(seed), 20000)
+    tracker = NodeIdTracker()
+    assert [tracker.recordId(x) for x in nodeIds] == dictRecordIds(nodeIds)
+
+
+# ----------------------------------------
+def test_dense_page_becomes_a_bitmap():
+    tracker = NodeIdTracker()
+    nodeIds = list(range(10000)) + list(range(0, 10000, 3))
+    assert [tracker.recordId(x) for x in nodeIds] == dictRecordIds(nodeIds)
+    assert isinstance(tracker.pages[0], bytearray)
+
+
+# ----------------------------------------
+def test_prior_counts_continue_the_suffixes():
+    tracker = NodeIdTracker([(5, 1), ("abc", 1), (None, 1), (5, 1)])
+    assert tracker.recordId(5) == "5-2"
+    assert tracker.recordId("5") == "5-3"
+    assert tracker.recordId("abc") == "abc-1"
+    assert tracker.recordId(None) == "None-1"
+    assert tracker.recordId(6) == "6"
@@ -0,0 +1,64 @@
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+from conftest import runMapper
+
+
+# ----------------------------------------
+def readCompressed(fileName):
+    if fileName.endswith(".zst"):
+        zstandard = pytest.importorskip("zstandard")
+        with open(fileName, "rb") as zstFile:
+            return zstandard.ZstdDecompressor().stream_reader(zstFile).read()
+    with gzip.open(fileName, "rb") as gzFile:
+        return gzFile.read()
+
+
+# ----------------------------------------
+@pytest.mark.parametrize("fileExt", [".gz", ".zst"])
+@pytest.mark.parametrize(
+    "splitArgs",
+    [
+        pytest.param(["--split_records", "1000"], id="records"),
+        pytest.param(["--split_bytes", "400000"], id="bytes"),
+    ],
+)
+def test_split_shards_match_unsplit_output(
+    tmp_path, generatedData, generatedOutput, fileExt, splitArgs
+):
+    if fileExt == ".zst":
+        pytest.importorskip("zstandard")
+    outputFile = str(tmp_path / ("icij.json" + fileExt))
+    runMapper("-i", generatedData, "-o", outputFile, "-S", "json", *splitArgs)
+
+    # --numbered shards take the output's place, in order and with its extension
+    shardFiles = sorted(x for x in os.listdir(tmp_path) if x.endswith(fileExt))
+    assert len(shardFiles) > 1
+    assert shardFiles == [
+        "icij-%05d.json%s" % (x + 1, fileExt) for x in range(len(shardFiles))
+    ]
+    shardData = [readCompressed(str(tmp_path / x)) for x in shardFiles]
+    with open(generatedOutput, "rb") as unsplitFile:
+        assert b"".join(shardData) == unsplitFile.read()
+    for shardBytes in shardData:
+        assert shardBytes.endswith(b"\n")
+        if splitArgs[0] == "--split_bytes":
+            assert len(shardBytes) <= int(splitArgs[1])
+    if splitArgs[0] == "--split_records":
+        assert [x.count(b"\n") for x in shardData[0:-1]] == [1000] * (
+            len(shardData) - 1
+        )
+
+    with open(tmp_path / "icij.manifest.json", "r", encoding="utf-8") as manifestFile:
+        manifestData = json.load(manifestFile)
+    assert manifestData["records"] == sum(x.count(b"\n") for x in shardData)
+    assert [x["file"] for x in manifestData["files"]] == shardFiles
+    for fileEntry, shardBytes in zip(manifestData["files"], shardData):
+        with open(tmp_path / fileEntry["file"], "rb") as shardFile:
+            fileBytes = shardFile.read()
+        assert fileEntry["records"] == shardBytes.count(b"\n")
+        assert fileEntry["bytes"] == len(fileBytes)
+        assert fileEntry["sha256"] == hashlib.sha256(fileBytes).hexdigest()
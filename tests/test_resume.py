@@ -0,0 +1,71 @@
+import signal
+import subprocess
+import sys
+
+from conftest import generateData, mapperEnvironment, mapperFile, runMapper
+
+
+# ----------------------------------------
+def test_resumed_run_matches_an_uninterrupted_one(tmp_path):
+    dataPath = tmp_path / "data"
+    generateData(dataPath, 40000)
+    runMapper("-i", dataPath, "-o", tmp_path / "full.json", "-S", "json")
+
+    # --interrupt the run once it reports its first progress
+    mapperArgs = ["-i", str(dataPath), "-o", str(tmp_path / "icij.json"), "-S", "json"]
+    with subprocess.Popen(
+        [sys.executable, mapperFile] + mapperArgs,
+        env=mapperEnvironment(),
+        stdout=subprocess.PIPE,
+        text=True,
+    ) as mapperProcess:
+        for line in mapperProcess.stdout:
+            if line.startswith(" 10000 "):
+                mapperProcess.send_signal(signal.SIGINT)
+                break
+        mapperProcess.communicate()
+    assert (tmp_path / "icij.checkpoint.json").exists()
+    assert (tmp_path / "icij.json").stat().st_size < (
+        tmp_path / "full.json"
+    ).stat().st_size
+
+    runMapper(*mapperArgs, "--resume")
+    assert not (tmp_path / "icij.checkpoint.json").exists()
+    assert (tmp_path / "icij.json").read_bytes() == (
+        tmp_path / "full.json"
+    ).read_bytes()
+
+
+# --interrupts the mapper just as it finishes mapping the intermediaries
+boundaryLauncher = """
+import os, runpy, signal, sys
+
+def interruptAfterTable(frame, event, arg):
+    if event == "return" and frame.f_code.co_name == "mapNodeRows":
+        if frame.f_locals.get("tableName") == "icij_intermediary":
+            sys.setprofile(None)
+            os.kill(os.getpid(), signal.SIGINT)
+
+sys.argv = sys.argv[1:]
+sys.setprofile(interruptAfterTable)
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+# ----------------------------------------
+def test_interrupt_between_tables_can_be_resumed(
+    tmp_path, generatedData, generatedOutput
+):
+    mapperArgs = ["-i", str(generatedData), "-o", str(tmp_path / "icij.json")]
+    mapperArgs += ["-S", "json", "--work_dir", str(tmp_path)]
+    subprocess.run(
+        [sys.executable, "-c", boundaryLauncher, mapperFile] + mapperArgs,
+        env=mapperEnvironment(),
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    assert (tmp_path / "icij.checkpoint.json").exists()
+    assert (tmp_path / "icij.json").stat().st_size < generatedOutput.stat().st_size
+
+    runMapper(*mapperArgs, "--resume")
+    assert (tmp_path / "icij.json").read_bytes() == generatedOutput.read_bytes()
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from conftest import runMapper, writeCsvFiles
+
+statsRows = {
+    "nodes-entities.csv": [
+        ["1", "ACME HOLDINGS LTD", "BVI", "1 MAIN STREET, TORTOLA", "Panama Papers"],
+        ["2", "BETA TRADING SA", "PAN", "", "Panama Papers"],
+    ],
+    "nodes-intermediaries.csv": [["20", "MOSSACK FONSECA", "", "Panama Papers"]],
+    "nodes-officers.csv": [
+        ["10", "JOHN SMITH", "Panama Papers"],
+        ["11", "JANE DOE", "Paradise Papers"],
+    ],
+    "nodes-addresses.csv": [["30", "2 HIGH STREET, LONDON", "", "Panama Papers"]],
+    "relationships.csv": [
+        ["10", "1", "officer_of", "shareholder of", "", "", "Panama Papers"],
+        ["11", "1", "officer_of", "director of", "", "", "Panama Papers"],
+        ["20", "2", "intermediary_of", "intermediary of", "", "", "Panama Papers"],
+        ["10", "30", "registered_address", "registered", "", "", "Panama Papers"],
+    ],
+}
+
+# --the -l statistics the mapper wrote for statsRows before MappingStats, as
+# --{category: {attribute: (count, examples)}}
+baselineStats = {
+    "ENTITY": {
+        "ADDR_FULL": (1, ["1 MAIN STREET, TORTOLA"]),
+        "ADDR_TYPE": (1, ["BUSINESS"]),
+        "COUNTRY_OF_ASSOCIATION": (2, ["BVI", "PAN"]),
+        "DATA_SOURCE": (2, ["ICIJ"]),
+        "ICIJ_SOURCE": (2, ["Panama Papers"]),
+        "Jurisdiction": (2, ["BVI", "PAN"]),
+        "NODE_TYPE": (2, ["ENTITY"]),
+        "PRIMARY_NAME_ORG": (2, ["ACME HOLDINGS LTD", "BETA TRADING SA"]),
+        "RECORD_ID": (2, ["1", "2"]),
+        "RECORD_TYPE": (2, ["ORGANIZATION"]),
+        "REL_ANCHOR_DOMAIN": (2, ["ICIJ_ID"]),
+        "REL_ANCHOR_KEY": (2, ["1", "2"]),
+    },
+    "INTERMEDIARY": {
+        "DATA_SOURCE": (1, ["ICIJ"]),
+        "ICIJ_SOURCE": (1, ["Panama Papers"]),
+        "NODE_TYPE": (1, ["INTERMEDIARY"]),
+        "PRIMARY_NAME_ORG": (1, ["MOSSACK FONSECA"]),
+        "RECORD_ID": (1, ["20"]),
+        "RECORD_TYPE": (1, ["ORGANIZATION"]),
+        "REL_ANCHOR_DOMAIN": (1, ["ICIJ_ID"]),
+        "REL_ANCHOR_KEY": (1, ["20"]),
+        "REL_POINTER_DOMAIN": (1, ["ICIJ_ID"]),
+        "REL_POINTER_KEY": (1, [2]),
+        "REL_POINTER_ROLE": (1, ["intermediary of"]),
+    },
+    "OFFICER": {
+        "ADDR_FULL": (1, ["2 HIGH STREET, LONDON"]),
+        "ADDR_TYPE": (1, ["REGISTERED"]),
+        "DATA_SOURCE": (2, ["ICIJ"]),
+        "GROUP_ASSOCIATION_ORG_NAME": (2, ["ACME HOLDINGS LTD"]),
+        "ICIJ_SOURCE": (2, ["Panama Papers", "Paradise Papers"]),
+        "NODE_TYPE": (2, ["OFFICER"]),
+        "PRIMARY_NAME_FULL": (2, ["JANE DOE", "JOHN SMITH"]),
+        "RECORD_ID": (2, ["10", "11"]),
+        "RECORD_TYPE": (2, ["PERSON"]),
+        "REL_ANCHOR_DOMAIN": (2, ["ICIJ_ID"]),
+        "REL_ANCHOR_KEY": (2, ["10", "11"]),
+        "REL_POINTER_DOMAIN": (2, ["ICIJ_ID"]),
+        "REL_POINTER_KEY": (2, [1]),
+        "REL_POINTER_ROLE": (2, ["director of", "shareholder of"]),
+    },
+}
+baselineCounts = {
+    "BASE_LIBRARY": {"IS_COMPANY_CALLS": 2},
+    "NODE_TYPE": {
+        "ENTITY": {"count": 2},
+        "INTERMEDIARY": {"count": 1},
+        "OFFICER": {"count": 2},
+    },
+    "SOURCE": {"Panama Papers": {"count": 4}, "Paradise Papers": {"count": 1}},
+}
+
+
+# ----------------------------------------
+@pytest.mark.parametrize(
+    "engineArgs",
+    [pytest.param([], id="single"), pytest.param(["-w", "2"], id="workers")],
+)
+def test_full_stats_keep_baseline_layout(tmp_path, engineArgs):
+    dataPath = writeCsvFiles(tmp_path / "data", statsRows)
+    statsFile = tmp_path / "stats.json"
+    runMapper(
+        "-i",
+        dataPath,
+        "-o",
+        tmp_path / "icij.json",
+        "-S",
+        "json",
+        "-l",
+        statsFile,
+        *engineArgs,
+    )
+    with open(statsFile, "r", encoding="utf-8") as statsHandle:
+        statPack = json.load(statsHandle)
+
+    # --the name cache and performance sections are added, the rest is as it was
+    baselineKeys = set(baselineStats) | set(baselineCounts)
+    assert set(statPack) - {"NAME_CACHE", "PERFORMANCE"} == baselineKeys
+    for category, categoryStats in baselineCounts.items():
+        assert statPack[category] == categoryStats
+    for category, attributeStats in baselineStats.items():
+        assert sorted(statPack[category]) == sorted(attributeStats)
+        for attribute, (count, examples) in attributeStats.items():
+            assert statPack[category][attribute]["count"] == count
+            assert sorted(statPack[category][attribute]["examples"]) == examples
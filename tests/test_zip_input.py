@@ -0,0 +1,12 @@
+from conftest import generateData, readOutput, runMapper
+
+
+# ----------------------------------------
+def test_zip_in_the_current_directory(tmp_path, generatedOutput):
+    generateData("data", 3000, "-z", "icij.zip", cwd=tmp_path)
+    checkRun = runMapper("-i", "icij.zip", "-o", "icij.json", "--check", cwd=tmp_path)
+    assert "Ready to run" in checkRun.stdout
+
+    runMapper("-i", "icij.zip", "-o", "icij.json", "-S", "json", cwd=tmp_path)
+    assert (tmp_path / "icij2.db").exists()
+    assert readOutput(tmp_path / "icij.json") == readOutput(generatedOutput)